@@ -0,0 +1,265 @@
+"""Benchmarks of the TinyDB stores against RDFLib's Memory store.
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.benchmark --sizes 1000 10000 --output results.json
+
+Results are written as JSON: the environment, the settings and, for each
+store and size, the median time in seconds of each operation.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import rdflib
+from rdflib import Graph, Literal, Namespace, RDF, URIRef, XSD
+
+import rdflib_tinydb
+
+EX = Namespace("https://example.com/")
+SDO = Namespace("https://schema.org/")
+
+# Store name and the configuration passed to Graph.open(), with "{path}"
+# replaced by a database path in a temporary directory.
+STORES = {
+    "Memory": ("Memory", None),
+    "TinyDBMemory": ("TinyDBMemory", None),
+    "TinyDB": ("TinyDB", {"path": "{path}"}),
+    "TinyDB-log": (
+        "TinyDB",
+        {"path": "{path}", "storage": "log", "storage_options": {}},
+    ),
+    "TinyDB-binary": ("TinyDB", {"path": "{path}", "storage": "binary"}),
+}
+
+QUERIES = {
+    "star": """
+        SELECT ?person ?name ?age WHERE {
+            ?person a <https://schema.org/Person> ;
+                <https://schema.org/name> ?name ;
+                <https://schema.org/age> ?age .
+        }
+    """,
+    "chain": """
+        SELECT ?person ?friend ?organization WHERE {
+            ?person <https://schema.org/knows> ?friend .
+            ?friend <https://schema.org/worksFor> ?organization .
+            ?organization <https://schema.org/name> "Organization 1" .
+        }
+    """,
+    "filter": """
+        SELECT ?person WHERE {
+            ?person <https://schema.org/age> ?age .
+            FILTER (?age > 60)
+        }
+    """,
+    "count": """
+        SELECT ?organization (COUNT(?person) AS ?employees) WHERE {
+            ?person <https://schema.org/worksFor> ?organization .
+        }
+        GROUP BY ?organization
+    """,
+    "ask": "ASK { ?person <https://schema.org/knows> ?friend }",
+}
+
+Triple = Tuple[URIRef, URIRef, Any]
+
+
+def generate(size: int, seed: int = 0) -> List[Triple]:
+    """Generate a deterministic dataset of people and organizations.
+
+    :param size: Number of triples.
+    :param seed: Seed of the random number generator.
+    """
+    rng = random.Random(seed)
+    people = size // 7 + 1
+    organizations = max(people // 50, 1)
+    triples = []
+    for i in range(organizations):
+        organization = EX[f"organization-{i}"]
+        triples.append((organization, RDF.type, SDO.Organization))
+        triples.append((organization, SDO.name, Literal(f"Organization {i}")))
+    for i in range(people):
+        person = EX[f"person-{i}"]
+        triples.append((person, RDF.type, SDO.Person))
+        triples.append((person, SDO.name, Literal(f"Person {i}", lang="en")))
+        triples.append(
+            (person, SDO.age, Literal(rng.randint(18, 80), datatype=XSD.integer))
+        )
+        triples.append(
+            (person, SDO.worksFor, EX[f"organization-{rng.randrange(organizations)}"])
+        )
+        for _ in range(3):
+            triples.append((person, SDO.knows, EX[f"person-{rng.randrange(people)}"]))
+    return triples[:size]
+
+
+def patterns(triples: Sequence[Triple], seed: int = 0) -> Dict[str, Tuple]:
+    """Get a triple pattern of each of the eight shapes, bound from a triple
+    of the dataset."""
+    s, p, o = random.Random(seed).choice(
+        [triple for triple in triples if triple[1] == SDO.worksFor]
+    )
+    return {
+        "spo": (s, p, o),
+        "sp?": (s, p, None),
+        "s?o": (s, None, o),
+        "s??": (s, None, None),
+        "?po": (None, p, o),
+        "?p?": (None, p, None),
+        "??o": (None, None, o),
+        "???": (None, None, None),
+    }
+
+
+def run(
+    sizes: Sequence[int],
+    stores: Sequence[str] = tuple(STORES),
+    repeat: int = 5,
+    adds: int = 100,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Run the benchmarks.
+
+    :param sizes: Number of triples of each dataset.
+    :param stores: Names of the stores to benchmark, keys of STORES.
+    :param repeat: Number of runs of each read operation.
+    :param adds: Number of triples added one at a time after the bulk load.
+    :param seed: Seed of the data generator.
+    :return: The results, as described in the module docstring.
+    """
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rdflib": rdflib.__version__,
+            "rdflib_tinydb": rdflib_tinydb.__version__,
+        },
+        "settings": {
+            "sizes": list(sizes),
+            "stores": list(stores),
+            "repeat": repeat,
+            "adds": adds,
+            "seed": seed,
+        },
+        "results": [],
+    }
+    for size in sizes:
+        triples = generate(size, seed)
+        for name in stores:
+            with tempfile.TemporaryDirectory() as directory:
+                timings = _benchmark_store(
+                    name, Path(directory) / "db.json", triples, repeat, adds, seed
+                )
+            results["results"].append({"store": name, "size": size, **timings})
+    return results
+
+
+def _benchmark_store(
+    name: str,
+    path: Path,
+    triples: List[Triple],
+    repeat: int,
+    adds: int,
+    seed: int,
+) -> Dict[str, Any]:
+    plugin, configuration = STORES[name]
+    if configuration is not None:
+        configuration = json.loads(
+            json.dumps(configuration).replace("{path}", path.as_posix())
+        )
+    graph = Graph(store=plugin)
+    if configuration is not None or plugin != "Memory":
+        graph.open(configuration)
+
+    timings: Dict[str, Any] = {}
+    try:
+        timings["load"] = _time(lambda: graph.addN((*t, graph) for t in triples))
+
+        extra = [
+            (EX[f"extra-{i}"], SDO.name, Literal(f"Extra {i}")) for i in range(adds)
+        ]
+        seconds = _time(lambda: [graph.add(triple) for triple in extra])
+        timings["add"] = seconds / max(adds, 1)
+
+        timings["len"] = _median(repeat, lambda: len(graph))
+        timings["triples"] = {
+            shape: _median(repeat, lambda: sum(1 for _ in graph.triples(pattern)))
+            for shape, pattern in patterns(triples, seed).items()
+        }
+        timings["sparql"] = {
+            query_name: _median(repeat, lambda: len(list(graph.query(query))))
+            for query_name, query in QUERIES.items()
+        }
+    finally:
+        graph.close()
+    return timings
+
+
+def _time(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _median(repeat: int, function: Callable[[], Any]) -> float:
+    return statistics.median(_time(function) for _ in range(repeat))
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000],
+        help="numbers of triples, from 1000 to 1000000 (default: 1000 10000)",
+    )
+    parser.add_argument(
+        "--stores",
+        nargs="+",
+        choices=list(STORES),
+        default=list(STORES),
+        help="stores to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="runs of each read (default: 5)"
+    )
+    parser.add_argument(
+        "--adds",
+        type=int,
+        default=100,
+        help="triples added one at a time (default: 100)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="data seed (default: 0)")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="file to write the JSON results to (default: stdout)",
+    )
+    arguments = parser.parse_args(argv)
+
+    results = run(
+        arguments.sizes,
+        arguments.stores,
+        arguments.repeat,
+        arguments.adds,
+        arguments.seed,
+    )
+    output = json.dumps(results, indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        arguments.output.write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,3 +1,11 @@
+from rdflib.plugins.sparql import CUSTOM_EVALS
+
 from rdflib_tinydb.store import TinyDBStore, TinyDBMemoryStore
+from rdflib_tinydb.sharded import TinyDBShardedStore
+from rdflib_tinydb.instrumentation import Instrumentation
+from rdflib_tinydb.storages import LogStorage
+from rdflib_tinydb.sparql import evaluate
+
+CUSTOM_EVALS["rdflib_tinydb"] = evaluate
 
 __version__ = "0.1.0"
@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+# Default number of threads running the blocking work of the async API.
+ASYNC_WORKERS = 4
+
+# Number of triples atriples() reads from the store per executor call.
+ASYNC_CHUNK_SIZE = 256
+
+
+class AsyncStoreMixin:
+    """Async counterparts of the store methods for asyncio applications.
+
+    The blocking work runs in a thread pool of ``async_workers`` threads,
+    where the store's readers-writer lock lets reads run in parallel.
+    atriples() streams its matches back in chunks. Concurrent aadd(),
+    aaddN() and aremove() calls are coalesced: while a batch of writes is
+    being applied, new ones queue up and are applied together next, in
+    one bulk_load() and so with one storage write. The write queue
+    belongs to the event loop that uses it, so use the async API from a
+    single event loop.
+    """
+
+    _async_workers: int = ASYNC_WORKERS
+    _executor: Optional[ThreadPoolExecutor] = None
+    # Writes waiting for the next batch, each a list of operations and the
+    # future resolved once they are applied, and the task applying them.
+    _write_queue: List[Tuple[List[Tuple], asyncio.Future]] = None
+    _write_task: Optional[asyncio.Task] = None
+
+    async def atriples(
+        self, triple_pattern: Tuple, context=None, chunk_size: int = ASYNC_CHUNK_SIZE
+    ) -> AsyncIterator[Tuple]:
+        """Async iterator over triples(), read in chunks off the event loop."""
+        iterator = self.triples(triple_pattern, context)
+        while True:
+            chunk = await self._run(lambda: list(islice(iterator, chunk_size)))
+            for result in chunk:
+                yield result
+            if len(chunk) < chunk_size:
+                return
+
+    async def alen(self, context=None) -> int:
+        return await self._run(self.__len__, context)
+
+    async def aadd(self, triple: Tuple, context=None, quoted: bool = False):
+        """Add a triple in the next batch of writes and wait until it is."""
+        await self._write([("add", triple, context, quoted)])
+
+    async def aaddN(self, quads: Iterable[Tuple]):
+        await self._write([("add", (s, p, o), c, False) for s, p, o, c in quads])
+
+    async def aremove(self, triple_pattern: Tuple, context=None):
+        await self._write([("remove", triple_pattern, context)])
+
+    async def _run(self, function, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._async_workers, thread_name_prefix="rdflib-tinydb"
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    async def _write(self, operations: List[Tuple]):
+        future = asyncio.get_running_loop().create_future()
+        if self._write_queue is None:
+            self._write_queue = []
+        self._write_queue.append((operations, future))
+        if self._write_task is None:
+            self._write_task = asyncio.ensure_future(self._apply_write_queue())
+        await future
+
+    async def _apply_write_queue(self):
+        try:
+            while self._write_queue:
+                batch, self._write_queue = self._write_queue, []
+                try:
+                    errors = await self._run(
+                        self._apply_writes, [operations for operations, _ in batch]
+                    )
+                except Exception as error:
+                    errors = [error] * len(batch)
+                for (_, future), error in zip(batch, errors):
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+        finally:
+            self._write_task = None
+
+    def _apply_writes(self, batch: List[List[Tuple]]) -> List[Optional[Exception]]:
+        """Apply a batch of writes with one commit.
+
+        :return: For each write, None or the error that rejected it.
+        """
+        errors = []
+        with self.bulk_load():
+            for operations in batch:
+                try:
+                    for operation in operations:
+                        if operation[0] == "add":
+                            self._check_quad(*operation[1:])
+                    for operation, *arguments in operations:
+                        getattr(self, operation)(*arguments)
+                except Exception as error:
+                    errors.append(error)
+                else:
+                    errors.append(None)
+        return errors
+
+    def _check_quad(self, triple: Tuple, context, quoted: bool):
+        """Raise the error add() would, before anything of a write is applied."""
+        if quoted:
+            raise ValueError("TinyDBStore is not formula-aware.")
+        for node in triple:
+            self._store_key(node)
+        if context is not None:
+            self._store_key(getattr(context, "identifier", context))
+
+    def _shutdown_executor(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
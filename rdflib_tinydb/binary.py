@@ -0,0 +1,500 @@
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Optional, Set, Tuple
+
+from rdflib_tinydb.index import Key, Triple, TripleIndex, TriplePattern
+from rdflib_tinydb.terms import TermDictionary
+
+# Layout of a binary store file. All integers are little-endian.
+#
+#   header      magic, then generation, highest term ID, number of terms,
+#               heap size, number of triples, quads and contexts, and the
+#               number of distinct subjects, predicates and objects.
+#   offsets     (highest term ID + 2) uint64 offsets into the heap. Term i
+#               is heap[offsets[i]:offsets[i + 1]], empty if there is none.
+#   heap        each term key as a UTF-8 JSON array.
+#   key order   uint32 term IDs sorted by their heap bytes, for lookups.
+#   spo/pos/osp uint32 triple records, sorted, one permutation each.
+#   spoc        uint32 quad records (triple and context), sorted.
+#   contexts    uint64 (context, number of triples) pairs.
+_MAGIC = b"RDFTDB\x00\x01"
+_HEADER = struct.Struct("<8s10Q")
+_OFFSET = struct.Struct("<Q")
+_TERM_ID = struct.Struct("<I")
+_TRIPLE = struct.Struct("<3I")
+_QUAD = struct.Struct("<4I")
+_CONTEXT = struct.Struct("<2Q")
+
+# Number of records unpacked at a time when iterating a range.
+_CHUNK_SIZE = 4096
+
+
+class BinaryFile:
+    """Read-only, memory-mapped view of a binary store file.
+
+    Nothing is read on open beyond the header. Terms are found by binary
+    search over the key order and triples by binary search over the sorted
+    permutation matching the pattern, so only the pages a lookup touches are
+    read from disk.
+    """
+
+    def __init__(self, path: str):
+        """Map a binary store file written by write_binary().
+
+        :param path: Path to the file.
+        """
+        self.path = os.fspath(path)
+        with open(self.path, "rb") as handle:
+            self._buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, *fields = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'"{self.path}" is not a binary store file.')
+        (
+            self.generation,
+            self.max_term_id,
+            self.term_count,
+            heap_size,
+            self.triple_count,
+            quad_count,
+            context_count,
+            self.subjects,
+            self.predicates,
+            self.objects,
+        ) = fields
+
+        offset = _HEADER.size
+        self._offsets = _Records(self._buffer, offset, self.max_term_id + 2, _OFFSET)
+        offset += self._offsets.size
+        self._heap = offset
+        offset += heap_size
+        self._key_order = _Records(self._buffer, offset, self.term_count, _TERM_ID)
+        offset += self._key_order.size
+        self._permutations = {}
+        for name in ("spo", "pos", "osp"):
+            records = _Records(self._buffer, offset, self.triple_count, _TRIPLE)
+            self._permutations[name] = records
+            offset += records.size
+        self._quads = _Records(self._buffer, offset, quad_count, _QUAD)
+        offset += self._quads.size
+        self.context_counts: Dict[int, int] = dict(
+            _CONTEXT.iter_unpack(
+                self._buffer[offset : offset + context_count * _CONTEXT.size]
+            )
+        )
+
+    def close(self):
+        """Unmap the file. Windows does not allow replacing it while mapped."""
+        self._buffer.close()
+
+    def lookup(self, key: Key) -> Optional[int]:
+        """Get the ID of a term, or None if the file does not hold it."""
+        target = _encode_key(key)
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            term_id = self._key_order[middle][0]
+            data = self._term_bytes(term_id)
+            if data < target:
+                low = middle + 1
+            elif data > target:
+                high = middle
+            else:
+                return term_id
+        return None
+
+    def decode(self, term_id: int) -> Optional[Key]:
+        """Get the key of a term, or None if the file does not hold it."""
+        if not 0 < term_id <= self.max_term_id:
+            return None
+        data = self._term_bytes(term_id)
+        if not data:
+            return None
+        return tuple(json.loads(data))
+
+    def items(self) -> Iterator[Tuple[int, Key]]:
+        """Yield the (term ID, key) pairs of the file."""
+        for term_id in range(1, self.max_term_id + 1):
+            key = self.decode(term_id)
+            if key is not None:
+                yield term_id, key
+
+    def triples(self, triple_pattern: TriplePattern) -> Iterator[Triple]:
+        """Yield the triples matching the pattern. None is a wildcard."""
+        name, prefix = _permutation(triple_pattern)
+        records = self._permutations[name]
+        low, high = records.range(prefix)
+        if name == "spo":
+            yield from records.iterate(low, high)
+        elif name == "pos":
+            for p, o, s in records.iterate(low, high):
+                yield s, p, o
+        else:
+            for o, s, p in records.iterate(low, high):
+                yield s, p, o
+
+    def count(self, triple_pattern: TriplePattern) -> int:
+        """Get the number of triples matching the pattern."""
+        name, prefix = _permutation(triple_pattern)
+        low, high = self._permutations[name].range(prefix)
+        return high - low
+
+    def contexts(self, triple: Triple) -> FrozenSet[int]:
+        """Get the contexts holding the triple."""
+        low, high = self._quads.range(triple)
+        return frozenset(quad[3] for quad in self._quads.iterate(low, high))
+
+    def predicate_counts(self) -> Dict[int, int]:
+        """Get the number of triples of each predicate."""
+        records = self._permutations["pos"]
+        counts = {}
+        low = 0
+        while low < len(records):
+            p = records[low][0]
+            high = bisect_left(records, (p + 1,), low)
+            counts[p] = high - low
+            low = high
+        return counts
+
+    def _term_bytes(self, term_id: int) -> bytes:
+        start = self._heap + self._offsets[term_id][0]
+        end = self._heap + self._offsets[term_id + 1][0]
+        return self._buffer[start:end]
+
+
+class BinaryTermDictionary(TermDictionary):
+    """Term dictionary over the terms of a binary store file and the terms
+    added since it was written."""
+
+    def __init__(self, base: BinaryFile):
+        super().__init__()
+        self._base = base
+        self._next_id = base.max_term_id + 1
+
+    def __len__(self) -> int:
+        return self._base.term_count + len(self._ids)
+
+    def lookup(self, key: Key) -> Optional[int]:
+        term_id = self._ids.get(key)
+        if term_id is None:
+            return self._base.lookup(key)
+        return term_id
+
+    def decode(self, term_id: int) -> Key:
+        key = self._keys.get(term_id)
+        if key is None:
+            key = self._base.decode(term_id)
+            if key is None:
+                raise KeyError(term_id)
+        return key
+
+    def items(self) -> Iterator[Tuple[int, Key]]:
+        yield from self._base.items()
+        yield from super().items()
+
+
+class BinaryTripleIndex:
+    """Triple index over a binary store file and the changes since it was
+    written, with the same interface as TripleIndex.
+
+    Quads added since the file was written are held in a TripleIndex and
+    quads removed from the file as a dict of triple to removed contexts.
+    Both are expected to stay small: compaction folds them into a new file.
+    """
+
+    def __init__(self, base: BinaryFile):
+        self._base = base
+        self._added = TripleIndex()
+        self._removed: Dict[Triple, Set[Key]] = {}
+        self._len = base.triple_count
+        self._context_counts = dict(base.context_counts)
+        # Terms of the changed triples in each position, whose statistics
+        # may differ from the file's.
+        self._changed_terms: Tuple[Set[Key], Set[Key], Set[Key]] = (
+            set(),
+            set(),
+            set(),
+        )
+        self._stats: Optional[Tuple[int, int, int, Dict[Key, int]]] = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, triple: Triple) -> bool:
+        return triple in self._added or bool(self._base_contexts(triple))
+
+    def count(self, context: Optional[Key] = None) -> int:
+        if context is None:
+            return self._len
+        return self._context_counts.get(context, 0)
+
+    def cardinality(
+        self, triple_pattern: TriplePattern, context: Optional[Key] = None
+    ) -> int:
+        if context is not None:
+            count = self.count(context)
+            if triple_pattern == (None, None, None):
+                return count
+            if count != self._len:
+                return sum(1 for _ in self.triples(triple_pattern, context))
+
+        count = self._base.count(triple_pattern)
+        for triple in self._removed:
+            if _matches(triple, triple_pattern) and not self._base_contexts(triple):
+                count -= 1
+        for triple in self._added.triples(triple_pattern):
+            if not self._base_contexts(triple):
+                count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        if self._stats is None:
+            distinct = []
+            for position, terms in enumerate(self._changed_terms):
+                count = (
+                    self._base.subjects,
+                    self._base.predicates,
+                    self._base.objects,
+                )[position]
+                for term in terms:
+                    pattern = tuple(term if i == position else None for i in range(3))
+                    count += (self.cardinality(pattern) > 0) - (
+                        self._base.count(pattern) > 0
+                    )
+                distinct.append(count)
+            predicate_counts = self._base.predicate_counts()
+            for p in self._changed_terms[1]:
+                count = self.cardinality((None, p, None))
+                if count:
+                    predicate_counts[p] = count
+                else:
+                    predicate_counts.pop(p, None)
+            self._stats = (*distinct, predicate_counts)
+
+        subjects, predicates, objects, predicate_counts = self._stats
+        return {
+            "triples": self._len,
+            "subjects": subjects,
+            "predicates": predicates,
+            "objects": objects,
+            "predicate_counts": dict(predicate_counts),
+            "context_counts": dict(self._context_counts),
+        }
+
+    def distinct(self, position: int) -> int:
+        return self.stats()[("subjects", "predicates", "objects")[position]]
+
+    def add(self, triple: Triple, context: Key) -> bool:
+        if context in self.triple_contexts(triple):
+            return False
+        visible = triple in self
+        removed = self._removed.get(triple)
+        if removed and context in removed:
+            removed.discard(context)
+            if not removed:
+                del self._removed[triple]
+        else:
+            self._added.add(triple, context)
+        self._changed(triple, context, 1, visible)
+        return True
+
+    def remove(self, triple: Triple, context: Key) -> bool:
+        if context in self._added.triple_contexts(triple):
+            self._added.remove(triple, context)
+        elif context in self._base_contexts(triple):
+            self._removed.setdefault(triple, set()).add(context)
+        else:
+            return False
+        self._changed(triple, context, -1, True)
+        return True
+
+    def add_context(self, context: Key) -> bool:
+        if context in self._context_counts:
+            return False
+        self._context_counts[context] = 0
+        return True
+
+    def has_context(self, context: Key) -> bool:
+        return context in self._context_counts
+
+    def remove_context(self, context: Key):
+        for triple in list(self.triples((None, None, None), context)):
+            self.remove(triple, context)
+        self._context_counts.pop(context, None)
+        self._added.remove_context(context)
+
+    def contexts(self, triple: Optional[Triple] = None) -> Iterator[Key]:
+        if triple is None:
+            yield from list(self._context_counts)
+        else:
+            yield from self.triple_contexts(triple)
+
+    def triple_contexts(self, triple: Triple) -> FrozenSet[Key]:
+        return self._base_contexts(triple) | self._added.triple_contexts(triple)
+
+    def triples(
+        self, triple_pattern: TriplePattern, context: Optional[Key] = None
+    ) -> Iterator[Triple]:
+        # Every triple of the file is in the context if it is the only
+        # context of the file holding triples.
+        whole_file = context is None or all(
+            c == context or not count for c, count in self._base.context_counts.items()
+        )
+        for triple in self._base.triples(triple_pattern):
+            if not whole_file or triple in self._removed:
+                contexts = self._base_contexts(triple)
+                if not contexts or (context is not None and context not in contexts):
+                    continue
+            yield triple
+
+        for triple in self._added.triples(triple_pattern, context):
+            # Triples also in the file were yielded above.
+            if context is None and self._base_contexts(triple):
+                continue
+            yield triple
+
+    def _base_contexts(self, triple: Triple) -> FrozenSet[Key]:
+        """Get the contexts of the file holding the triple, less removals."""
+        contexts = self._base.contexts(triple)
+        removed = self._removed.get(triple)
+        if removed:
+            return contexts - removed
+        return contexts
+
+    def _changed(self, triple: Triple, context: Key, amount: int, visible: bool):
+        self._context_counts[context] = self._context_counts.get(context, 0) + amount
+        if visible != (triple in self):
+            self._len += amount
+        for terms, term in zip(self._changed_terms, triple):
+            terms.add(term)
+        self._stats = None
+
+
+def write_binary(
+    path: str,
+    generation: int,
+    terms: Iterable[Tuple[int, Key]],
+    quads: Iterable[Tuple[int, int, int, int]],
+    context_counts: Dict[int, int],
+):
+    """Write a binary store file, replacing any file at the path atomically.
+
+    :param path: Path to the file.
+    :param generation: Number identifying this version of the file.
+    :param terms: (term ID, key) pairs. Term IDs must fit in 32 bits.
+    :param quads: (s, p, o, context) term ID quads.
+    :param context_counts: Number of triples in each context, including the
+        empty ones.
+    """
+    encoded = {term_id: _encode_key(key) for term_id, key in terms}
+    max_term_id = max(encoded, default=0)
+    offsets = []
+    position = 0
+    for term_id in range(max_term_id + 2):
+        offsets.append(position)
+        position += len(encoded.get(term_id, b""))
+    heap = b"".join(encoded[term_id] for term_id in sorted(encoded))
+    key_order = sorted(encoded, key=encoded.__getitem__)
+
+    quads = sorted(set(quads))
+    spo = sorted({quad[:3] for quad in quads})
+    pos = sorted((p, o, s) for s, p, o in spo)
+    osp = sorted((o, s, p) for s, p, o in spo)
+
+    temporary_path = os.fspath(path) + ".tmp"
+    with open(temporary_path, "wb") as handle:
+        handle.write(
+            _HEADER.pack(
+                _MAGIC,
+                generation,
+                max_term_id,
+                len(encoded),
+                len(heap),
+                len(spo),
+                len(quads),
+                len(context_counts),
+                len({s for s, _, _ in spo}),
+                len({p for _, p, _ in spo}),
+                len({o for _, _, o in spo}),
+            )
+        )
+        handle.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        handle.write(heap)
+        handle.write(b"".join(_TERM_ID.pack(term_id) for term_id in key_order))
+        for records in (spo, pos, osp):
+            handle.write(b"".join(_TRIPLE.pack(*record) for record in records))
+        handle.write(b"".join(_QUAD.pack(*quad) for quad in quads))
+        handle.write(
+            b"".join(_CONTEXT.pack(*item) for item in sorted(context_counts.items()))
+        )
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary_path, path)
+
+
+class _Records:
+    """Sequence of fixed-width records in a buffer, in sorted order."""
+
+    def __init__(self, buffer, offset: int, count: int, record: struct.Struct):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+        self._record = record
+        self.size = count * record.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Tuple[int, ...]:
+        return self._record.unpack_from(
+            self._buffer, self._offset + index * self._record.size
+        )
+
+    def range(self, prefix: Tuple[int, ...]) -> Tuple[int, int]:
+        """Get the start and end indexes of the records starting with prefix."""
+        if not prefix:
+            return 0, self._count
+        low = bisect_left(self, prefix)
+        high = bisect_left(self, prefix[:-1] + (prefix[-1] + 1,), low)
+        return low, high
+
+    def iterate(self, start: int, end: int) -> Iterator[Tuple[int, ...]]:
+        size = self._record.size
+        for chunk in range(start, end, _CHUNK_SIZE):
+            chunk_end = min(chunk + _CHUNK_SIZE, end)
+            yield from self._record.iter_unpack(
+                self._buffer[
+                    self._offset + chunk * size : self._offset + chunk_end * size
+                ]
+            )
+
+
+def _permutation(triple_pattern: TriplePattern) -> Tuple[str, Tuple[int, ...]]:
+    """Get the permutation and record prefix answering a triple pattern."""
+    s, p, o = triple_pattern
+    if s is not None:
+        if p is not None:
+            return "spo", (s, p) if o is None else (s, p, o)
+        if o is not None:
+            return "osp", (o, s)
+        return "spo", (s,)
+    if p is not None:
+        return "pos", (p,) if o is None else (p, o)
+    if o is not None:
+        return "osp", (o,)
+    return "spo", ()
+
+
+def _matches(triple: Triple, triple_pattern: TriplePattern) -> bool:
+    return all(
+        term is None or term == value for term, value in zip(triple_pattern, triple)
+    )
+
+
+def _encode_key(key: Key) -> bytes:
+    return json.dumps(list(key), ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
@@ -0,0 +1,361 @@
+import weakref
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+)
+
+Key = Hashable
+Triple = Tuple[Key, Key, Key]
+TriplePattern = Tuple[Optional[Key], Optional[Key], Optional[Key]]
+
+_NO_CONTEXTS: FrozenSet[Key] = frozenset()
+
+# Collections up to this size are copied when iterated, which is cheaper
+# than tracking a cursor over them.
+_COPY_SIZE = 8
+
+
+class TripleIndex:
+    """In-memory subject, predicate and object indexes over quads.
+
+    Triples are held in three nested dicts (s -> p -> o, p -> o -> {s} and
+    o -> s -> {p}) so every triple pattern shape is answered by dict lookups
+    instead of a scan. The spo index maps each triple to the frozenset of
+    contexts (graphs) holding it; equal sets are shared between triples.
+    Each context also keeps the set of its triples, so counting and listing
+    a graph does not need a scan. Keys may be any hashable value.
+
+    Per subject, predicate and object triple counts are maintained so the
+    number of matches of any pattern is known without iterating them.
+
+    triples() and contexts() iterate the live indexes, so they do no more
+    work than the consumer pulls. Before the indexes change, every open
+    iteration copies the keys it has not reached yet and carries on over
+    the copy, so callers may change the index while iterating it.
+    """
+
+    def __init__(self):
+        self._spo: Dict[Key, Dict[Key, Dict[Key, FrozenSet[Key]]]] = {}
+        self._pos: Dict[Key, Dict[Key, Set[Key]]] = {}
+        self._osp: Dict[Key, Dict[Key, Set[Key]]] = {}
+        self._contexts: Dict[Key, Set[Triple]] = {}
+        self._context_sets: Dict[FrozenSet[Key], FrozenSet[Key]] = {}
+        self._subject_counts: Dict[Key, int] = {}
+        self._predicate_counts: Dict[Key, int] = {}
+        self._object_counts: Dict[Key, int] = {}
+        self._len = 0
+        self._cursors: "weakref.WeakSet[_Cursor]" = weakref.WeakSet()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the state of the index as plain data, e.g. for marshal."""
+        return {
+            "spo": self._spo,
+            "pos": self._pos,
+            "osp": self._osp,
+            "contexts": self._contexts,
+            "context_sets": self._context_sets,
+            "subject_counts": self._subject_counts,
+            "predicate_counts": self._predicate_counts,
+            "object_counts": self._object_counts,
+            "len": self._len,
+        }
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> "TripleIndex":
+        """Create an index from the state returned by snapshot()."""
+        index = cls()
+        index._spo = state["spo"]
+        index._pos = state["pos"]
+        index._osp = state["osp"]
+        index._contexts = state["contexts"]
+        index._context_sets = state["context_sets"]
+        index._subject_counts = state["subject_counts"]
+        index._predicate_counts = state["predicate_counts"]
+        index._object_counts = state["object_counts"]
+        index._len = state["len"]
+        return index
+
+    def __len__(self) -> int:
+        """Get the number of distinct triples across all contexts."""
+        return self._len
+
+    def __contains__(self, triple: Triple) -> bool:
+        s, p, o = triple
+        return o in self._spo.get(s, {}).get(p, ())
+
+    def count(self, context: Optional[Key] = None) -> int:
+        """Get the number of triples in a context, or in all of them if None."""
+        if context is None:
+            return self._len
+        return len(self._contexts.get(context, ()))
+
+    def cardinality(
+        self, triple_pattern: TriplePattern, context: Optional[Key] = None
+    ) -> int:
+        """Get the number of triples matching the pattern.
+
+        :param context: Only count triples in this context. Counting a
+            pattern with bound terms in one of several contexts iterates
+            its matches; every other count is read from the indexes.
+        """
+        if context is not None:
+            count = self.count(context)
+            if triple_pattern == (None, None, None):
+                return count
+            if count != self._len:
+                return sum(1 for _ in self.triples(triple_pattern, context))
+
+        s, p, o = triple_pattern
+        if s is not None:
+            if p is not None:
+                if o is not None:
+                    return int((s, p, o) in self)
+                return len(self._spo.get(s, {}).get(p, ()))
+            if o is not None:
+                return len(self._osp.get(o, {}).get(s, ()))
+            return self._subject_counts.get(s, 0)
+        if p is not None:
+            if o is not None:
+                return len(self._pos.get(p, {}).get(o, ()))
+            return self._predicate_counts.get(p, 0)
+        if o is not None:
+            return self._object_counts.get(o, 0)
+        return self._len
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of triples and of distinct terms in each position,
+        and the number of triples of each predicate and in each context."""
+        return {
+            "triples": self._len,
+            "subjects": len(self._spo),
+            "predicates": len(self._pos),
+            "objects": len(self._osp),
+            "predicate_counts": dict(self._predicate_counts),
+            "context_counts": {
+                context: len(triples) for context, triples in self._contexts.items()
+            },
+        }
+
+    def distinct(self, position: int) -> int:
+        """Get the number of distinct subjects (0), predicates (1) or objects (2)."""
+        return len((self._spo, self._pos, self._osp)[position])
+
+    def add(self, triple: Triple, context: Key) -> bool:
+        """Add a triple to a context.
+
+        :return: True if the triple was not already in the context.
+        """
+        self._detach_cursors()
+        s, p, o = triple
+        objects = self._spo.setdefault(s, {}).setdefault(p, {})
+        contexts = objects.get(o)
+        if contexts is None:
+            self._pos.setdefault(p, {}).setdefault(o, set()).add(s)
+            self._osp.setdefault(o, {}).setdefault(s, set()).add(p)
+            _increment(self._subject_counts, s, 1)
+            _increment(self._predicate_counts, p, 1)
+            _increment(self._object_counts, o, 1)
+            self._len += 1
+            contexts = _NO_CONTEXTS
+        elif context in contexts:
+            return False
+
+        objects[o] = self._intern(contexts | {context})
+        self._contexts.setdefault(context, set()).add(triple)
+        return True
+
+    def remove(self, triple: Triple, context: Key) -> bool:
+        """Remove a triple from a context.
+
+        The context itself is kept, even when left empty.
+
+        :return: True if the triple was in the context.
+        """
+        s, p, o = triple
+        contexts = self.triple_contexts(triple)
+        if context not in contexts:
+            return False
+
+        self._detach_cursors()
+        self._contexts[context].discard(triple)
+        contexts = contexts - {context}
+        if contexts:
+            self._spo[s][p][o] = self._intern(contexts)
+        else:
+            _discard(self._spo, s, p, o)
+            _discard(self._pos, p, o, s)
+            _discard(self._osp, o, s, p)
+            _increment(self._subject_counts, s, -1)
+            _increment(self._predicate_counts, p, -1)
+            _increment(self._object_counts, o, -1)
+            self._len -= 1
+        return True
+
+    def add_context(self, context: Key) -> bool:
+        """Register a context, which may be empty.
+
+        :return: True if the context was not known yet.
+        """
+        if context in self._contexts:
+            return False
+        self._detach_cursors()
+        self._contexts[context] = set()
+        return True
+
+    def has_context(self, context: Key) -> bool:
+        """Whether the context is known, even if empty."""
+        return context in self._contexts
+
+    def remove_context(self, context: Key):
+        """Forget a context and remove all of its triples."""
+        for triple in list(self._contexts.get(context, ())):
+            self.remove(triple, context)
+        self._detach_cursors()
+        self._contexts.pop(context, None)
+
+    def contexts(self, triple: Optional[Triple] = None) -> Iterator[Key]:
+        """Yield the known contexts, or the contexts holding the triple."""
+        if triple is None:
+            yield from self._iterate(self._contexts)
+        else:
+            yield from self.triple_contexts(triple)
+
+    def triple_contexts(self, triple: Triple) -> FrozenSet[Key]:
+        s, p, o = triple
+        return self._spo.get(s, {}).get(p, {}).get(o, _NO_CONTEXTS)
+
+    def triples(
+        self, triple_pattern: TriplePattern, context: Optional[Key] = None
+    ) -> Iterator[Triple]:
+        """Yield the triples matching the pattern. None is a wildcard.
+
+        :param context: Only match triples in this context. None matches
+            triples in any context.
+        """
+        if context is None:
+            yield from self._triples(triple_pattern)
+        elif triple_pattern == (None, None, None):
+            yield from self._iterate(self._contexts.get(context, ()))
+        else:
+            for triple in self._triples(triple_pattern):
+                if context in self.triple_contexts(triple):
+                    yield triple
+
+    def _triples(self, triple_pattern: TriplePattern) -> Iterator[Triple]:
+        s, p, o = triple_pattern
+
+        if s is not None:
+            if p is not None:
+                # s, p, o
+                if o is not None:
+                    if (s, p, o) in self:
+                        yield s, p, o
+                # s, p, None
+                else:
+                    for o in self._iterate(self._spo.get(s, {}).get(p, ())):
+                        yield s, p, o
+            else:
+                # s, None, o
+                if o is not None:
+                    for p in self._iterate(self._osp.get(o, {}).get(s, ())):
+                        yield s, p, o
+                # s, None, None
+                else:
+                    predicates = self._spo.get(s, {})
+                    for p in self._iterate(predicates):
+                        for o in self._iterate(predicates.get(p, ())):
+                            yield s, p, o
+        else:
+            if p is not None:
+                # None, p, o
+                if o is not None:
+                    for s in self._iterate(self._pos.get(p, {}).get(o, ())):
+                        yield s, p, o
+                # None, p, None
+                else:
+                    objects = self._pos.get(p, {})
+                    for o in self._iterate(objects):
+                        for s in self._iterate(objects.get(o, ())):
+                            yield s, p, o
+            else:
+                # None, None, o
+                if o is not None:
+                    subjects = self._osp.get(o, {})
+                    for s in self._iterate(subjects):
+                        for p in self._iterate(subjects.get(s, ())):
+                            yield s, p, o
+                # None, None, None
+                else:
+                    for s in self._iterate(self._spo):
+                        predicates = self._spo.get(s, {})
+                        for p in self._iterate(predicates):
+                            for o in self._iterate(predicates.get(p, ())):
+                                yield s, p, o
+
+    def _iterate(self, collection: Collection[Key]) -> Iterator[Key]:
+        """Iterate a collection of the index, safe against later changes."""
+        if len(collection) <= _COPY_SIZE:
+            return iter(tuple(collection))
+        cursor = _Cursor(collection)
+        self._cursors.add(cursor)
+        return cursor
+
+    def _detach_cursors(self):
+        """Move open iterations onto copies before the index changes."""
+        if self._cursors:
+            for cursor in list(self._cursors):
+                cursor.detach()
+            self._cursors.clear()
+
+    def _intern(self, contexts: FrozenSet[Key]) -> FrozenSet[Key]:
+        """Get a shared instance of a set of contexts."""
+        return self._context_sets.setdefault(contexts, contexts)
+
+
+class _Cursor:
+    """Iterator over a live collection that can switch to a copy of the
+    items it has not reached yet."""
+
+    __slots__ = ("_items", "__weakref__")
+
+    def __init__(self, collection: Collection[Key]):
+        self._items = iter(collection)
+
+    def __iter__(self) -> "_Cursor":
+        return self
+
+    def __next__(self) -> Key:
+        return next(self._items)
+
+    def detach(self):
+        self._items = iter(list(self._items))
+
+
+def _increment(counts: Dict[Key, int], key: Key, amount: int):
+    """Add amount to counts[key], dropping keys that reach zero."""
+    count = counts.get(key, 0) + amount
+    if count:
+        counts[key] = count
+    else:
+        del counts[key]
+
+
+def _discard(index: Dict[Key, Dict[Key, Set[Key]]], a: Key, b: Key, c: Key):
+    """Remove c from index[a][b], pruning levels left empty."""
+    inner = index[a]
+    leaf = inner[b]
+    if isinstance(leaf, dict):
+        del leaf[c]
+    else:
+        leaf.discard(c)
+    if not leaf:
+        del inner[b]
+        if not inner:
+            del index[a]
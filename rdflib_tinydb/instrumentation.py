@@ -0,0 +1,129 @@
+import threading
+from bisect import bisect_left
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+from tinydb.storages import Storage
+
+# Upper bounds in seconds of the latency histogram buckets. The last bucket
+# holds everything slower.
+HISTOGRAM_BOUNDS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+
+Hook = Callable[[str, float, int, int], Any]
+
+
+class Instrumentation:
+    """Per-operation call counts, latencies and row counts of a store.
+
+    Operations are named "add", "addN", "remove", "commit", "storage.read",
+    "storage.write" and "triples" followed by the shape of the pattern,
+    e.g. "triples s?o" for a pattern with a bound subject and object. For
+    triples(), "scanned" counts the index matches visited and "yielded"
+    those returned, which differ when matches are filtered by graph.
+
+    Hooks are called with (operation, seconds, scanned, yielded) after
+    every recorded operation, e.g. to export them to a metrics system.
+    """
+
+    def __init__(self):
+        self._operations: Dict[str, Dict[str, Any]] = {}
+        self._hooks: List[Hook] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Hook):
+        """Register a callback called after every recorded operation."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook):
+        self._hooks.remove(hook)
+
+    def record(
+        self, operation: str, seconds: float, scanned: int = 0, yielded: int = 0
+    ):
+        """Record a call of an operation and call the hooks."""
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    "count": 0,
+                    "seconds": 0.0,
+                    "histogram": [0] * (len(HISTOGRAM_BOUNDS) + 1),
+                    "scanned": 0,
+                    "yielded": 0,
+                }
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["histogram"][bisect_left(HISTOGRAM_BOUNDS, seconds)] += 1
+            stats["scanned"] += scanned
+            stats["yielded"] += yielded
+        for hook in self._hooks:
+            hook(operation, seconds, scanned, yielded)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get the statistics recorded so far.
+
+        :return: A dict keyed by operation of dicts of the number of calls
+            ("count"), their total "seconds", the number of calls in each
+            latency bucket ("histogram", aligned with HISTOGRAM_BOUNDS plus
+            a last bucket for slower calls) and the total rows "scanned"
+            and "yielded".
+        """
+        with self._lock:
+            return {
+                operation: dict(stats, histogram=list(stats["histogram"]))
+                for operation, stats in self._operations.items()
+            }
+
+    def reset(self):
+        """Forget the statistics recorded so far. Hooks are kept."""
+        with self._lock:
+            self._operations.clear()
+
+
+class InstrumentedStorage(Storage):
+    """TinyDB storage timing the reads and writes of another storage."""
+
+    def __init__(
+        self,
+        storage: Callable[..., Storage],
+        instrumentation: Instrumentation,
+        *args,
+        **kwargs
+    ):
+        """Create a new instance.
+
+        :param storage: Storage class, created with the remaining arguments.
+        :param instrumentation: Where the timings are recorded.
+        """
+        self._storage = storage(*args, **kwargs)
+        self._instrumentation = instrumentation
+
+    def read(self):
+        start = perf_counter()
+        data = self._storage.read()
+        self._instrumentation.record("storage.read", perf_counter() - start)
+        return data
+
+    def write(self, data):
+        start = perf_counter()
+        self._storage.write(data)
+        self._instrumentation.record("storage.write", perf_counter() - start)
+
+    def close(self):
+        self._storage.close()
+
+    def __getattr__(self, name: str):
+        # Storage specific methods, e.g. LogStorage.compact().
+        if name == "_storage":
+            raise AttributeError(name)
+        attribute = getattr(self._storage, name)
+        if name == "apply":
+            # Incremental writes, e.g. LogStorage.apply(), are writes too.
+            return partial(self._apply, attribute)
+        return attribute
+
+    def _apply(self, apply: Callable, changes):
+        start = perf_counter()
+        apply(changes)
+        self._instrumentation.record("storage.write", perf_counter() - start)
@@ -0,0 +1,159 @@
+import threading
+from threading import get_ident
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ReadWriteLock:
+    """Lock held by any number of readers or by a single writer.
+
+    Both sides are reentrant and the writer may also read. Waiting writers
+    go before new readers, so a steady stream of reads cannot starve them.
+    A thread holding only a read lock cannot upgrade it to a write lock.
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._condition = threading.Condition(self._mutex)
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        # Read depth of each thread holding the read lock. Reads inside a
+        # write are neither counted nor tracked.
+        self._reads: Dict[int, int] = {}
+        self._read = _Guard(self.acquire_read, self.release_read)
+        self._write = _Guard(self.acquire_write, self.release_write)
+
+    def read(self) -> "_Guard":
+        """Context manager holding the read lock."""
+        return self._read
+
+    def write(self) -> "_Guard":
+        """Context manager holding the write lock."""
+        return self._write
+
+    def acquire_read(self):
+        me = get_ident()
+        depth = self._reads.get(me)
+        if depth:
+            self._reads[me] = depth + 1
+            return
+        if self._writer == me:
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        self._reads[me] = 1
+
+    def release_read(self):
+        me = get_ident()
+        depth = self._reads.get(me)
+        if depth is None:
+            return
+        if depth > 1:
+            self._reads[me] = depth - 1
+            return
+        del self._reads[me]
+        with self._condition:
+            self._readers -= 1
+            if not self._readers and self._waiting_writers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = get_ident()
+        if self._writer == me:
+            self._writer_depth += 1
+            return
+        if me in self._reads:
+            raise RuntimeError("A read lock cannot be upgraded to a write lock.")
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        self._writer_depth -= 1
+        if not self._writer_depth:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+class _Guard:
+    """Reusable context manager calling an acquire and a release function."""
+
+    __slots__ = ("_acquire", "_release")
+
+    def __init__(self, acquire: Callable[[], None], release: Callable[[], None]):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+
+class FileLock:
+    """Advisory exclusive lock on a file, shared with other processes.
+
+    Uses flock() on POSIX and msvcrt.locking() on Windows. The lock file is
+    created if needed and left in place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @property
+    def locked(self) -> bool:
+        return self._handle is not None
+
+    def acquire(self):
+        """Block until the lock is held."""
+        handle = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                # LK_LOCK gives up after 10 seconds, so keep trying.
+                while True:
+                    try:
+                        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass
+        except BaseException:
+            handle.close()
+            raise
+        self._handle = handle
+
+    def release(self):
+        handle, self._handle = self._handle, None
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        handle.close()
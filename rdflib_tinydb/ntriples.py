@@ -0,0 +1,102 @@
+import re
+from typing import List, Optional, Tuple
+
+from rdflib import Literal
+
+# Store key of a term: type, value, datatype and language.
+Key = Tuple[str, str, str, str]
+
+# Characters escaped in literals, as RDFLib's N-Triples serializer does.
+_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r"})
+
+_TERM = (
+    r'<[^>]*>|_:[^\s<>"]*[^\s<>".]'
+    r'|"(?:[^"\\]|\\.)*"(?:@[A-Za-z]+(?:-[A-Za-z0-9]+)*|\^\^<[^>]*>)?'
+)
+_STATEMENT = re.compile(
+    rf"[ \t]*({_TERM})[ \t]*({_TERM})[ \t]*({_TERM})[ \t]*({_TERM})?[ \t]*\."
+    r"[ \t]*(?:#.*)?$"
+)
+_BLANK = re.compile(r"[ \t]*(?:#.*)?$")
+_LITERAL = re.compile(r'"(.*)"(?:@(.+)|\^\^<(.*)>)?$', re.DOTALL)
+_UNESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|([tbnrf"\'\\]))')
+_CHARACTERS = {
+    "t": "\t",
+    "b": "\b",
+    "n": "\n",
+    "r": "\r",
+    "f": "\f",
+    '"': '"',
+    "'": "'",
+    "\\": "\\",
+}
+
+
+def format_term(key: Key) -> str:
+    """Get the N-Triples form of a term from its store key."""
+    term_type, value, datatype, lang = key
+    if term_type == "URIRef":
+        return f"<{value}>"
+    if term_type == "BNode":
+        return f"_:{value}"
+    value = value.translate(_ESCAPES)
+    if lang:
+        return f'"{value}"@{lang}'
+    if datatype:
+        return f'"{value}"^^<{datatype}>'
+    return f'"{value}"'
+
+
+def parse_statement(line: str) -> Optional[List[str]]:
+    """Split an N-Triples or N-Quads line into the N-Triples forms of its
+    terms, three or four.
+
+    :return: None for blank and comment lines.
+    :raises ValueError: If the line is not a statement.
+    """
+    match = _STATEMENT.match(line)
+    if match is None:
+        if _BLANK.match(line):
+            return None
+        raise ValueError(f"Invalid N-Triples statement: {line.strip()!r}.")
+    terms = list(match.groups())
+    if terms[3] is None:
+        del terms[3]
+    return terms
+
+
+def parse_term(term: str) -> Key:
+    """Get the store key of a term in N-Triples form.
+
+    Blank node labels are kept as they are. Literals with a datatype or a
+    language go through RDFLib, so they get the same normalised lexical
+    form as the ones added with add().
+    """
+    if term[0] == "<":
+        return "URIRef", _unescape(term[1:-1]), "", ""
+    if term[0] == "_":
+        return "BNode", term[2:], "", ""
+    value, lang, datatype = _LITERAL.match(term).groups()
+    value = _unescape(value)
+    if lang is None and datatype is None:
+        return "Literal", value, "", ""
+    literal = Literal(value, lang=lang, datatype=datatype and _unescape(datatype))
+    return (
+        "Literal",
+        str(literal),
+        str(literal.datatype) if literal.datatype else "",
+        literal.language or "",
+    )
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    return _UNESCAPE.sub(_unescape_match, text)
+
+
+def _unescape_match(match: re.Match) -> str:
+    code = match.group(1) or match.group(2)
+    if code is not None:
+        return chr(int(code, 16))
+    return _CHARACTERS[match.group(3)]
@@ -0,0 +1,217 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from heapq import merge
+from typing import Any, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from rdflib import Literal, XSD
+
+# Kind of the values of each range indexed datatype. Literals of one kind
+# compare by value.
+KINDS: Dict[str, str] = {
+    str(XSD[name]): "numeric"
+    for name in (
+        "integer",
+        "decimal",
+        "float",
+        "double",
+        "int",
+        "long",
+        "short",
+        "byte",
+        "nonNegativeInteger",
+        "positiveInteger",
+        "nonPositiveInteger",
+        "negativeInteger",
+        "unsignedLong",
+        "unsignedInt",
+        "unsignedShort",
+        "unsignedByte",
+    )
+}
+KINDS[str(XSD.date)] = "date"
+KINDS[str(XSD.dateTime)] = "dateTime"
+
+# Kind of dateTimes without a timezone. They do not compare by value with
+# the ones with a timezone.
+NAIVE_DATE_TIME = "dateTime-naive"
+
+
+def literal_value(datatype: str, lexical: str) -> Optional[Tuple[str, Any]]:
+    """Get the kind and value of a literal of a range indexed datatype.
+
+    dateTimes without a timezone are of the kind NAIVE_DATE_TIME.
+
+    :return: None for literals of other datatypes, ill-typed literals and NaN.
+    """
+    kind = KINDS.get(datatype)
+    if kind is None:
+        return None
+    value = Literal(lexical, datatype=datatype).value
+    if kind == "numeric":
+        if not isinstance(value, (int, float, Decimal)) or value != value:
+            return None
+    elif kind == "date":
+        if not isinstance(value, date) or isinstance(value, datetime):
+            return None
+    elif not isinstance(value, datetime):
+        return None
+    elif value.tzinfo is None:
+        kind = NAIVE_DATE_TIME
+    return kind, value
+
+
+def sort_key(kind: str, value: Any) -> float:
+    """Get a float ordered like the values of a kind.
+
+    Distinct values may share a key, e.g. large integers, so lookups by key
+    include their bounds and callers compare the values.
+    """
+    if kind == "date":
+        return float(value.toordinal())
+    if kind == "dateTime":
+        return value.timestamp()
+    if kind == NAIVE_DATE_TIME:
+        return value.replace(tzinfo=timezone.utc).timestamp()
+    try:
+        return float(value)
+    except OverflowError:
+        return float("inf") if value > 0 else float("-inf")
+
+
+class RangeIndex:
+    """Sorted index of the numeric, date and dateTime objects of each predicate.
+
+    The sort key of each range indexed literal term is kept by term ID. For
+    each predicate and kind of value, a column holds the distinct objects
+    of that kind as parallel arrays of sort keys and term IDs, searched by
+    binary search, and counts the triples with them.
+    """
+
+    def __init__(self):
+        self._terms: Dict[int, Tuple[str, float]] = {}
+        self._columns: Dict[Tuple[int, str], _Column] = {}
+        # Lookups merge changes into the arrays, possibly in several reading
+        # threads at once.
+        self._settle_lock = threading.Lock()
+
+    def __contains__(self, term_id: int) -> bool:
+        return term_id in self._terms
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the IDs of the range indexed terms."""
+        return iter(self._terms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the state of the index as plain data, e.g. for marshal."""
+        columns = {}
+        for key, column in self._columns.items():
+            column.settle()
+            columns[key] = (column.keys.tobytes(), column.ids.tobytes(), column.triples)
+        return {"terms": self._terms, "columns": columns}
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> "RangeIndex":
+        """Create an index from the state returned by snapshot()."""
+        index = cls()
+        index._terms = state["terms"]
+        for key, (keys, ids, triples) in state["columns"].items():
+            column = index._columns[key] = _Column()
+            column.keys.frombytes(keys)
+            column.ids.frombytes(ids)
+            column.triples = triples
+        return index
+
+    def add_term(self, term_id: int, datatype: str, lexical: str):
+        """Register a literal term, if it is of a range indexed datatype."""
+        if datatype not in KINDS:
+            return
+        value = literal_value(datatype, lexical)
+        if value is not None:
+            self._terms[term_id] = (value[0], sort_key(*value))
+
+    def discard_term(self, term_id: int):
+        self._terms.pop(term_id, None)
+
+    def update(self, p: int, o: int, before: int, after: int):
+        """Record that the number of triples with predicate p and the range
+        indexed object o went from before to after."""
+        kind, key = self._terms[o]
+        column = self._columns.get((p, kind))
+        if column is None:
+            column = self._columns[(p, kind)] = _Column()
+        column.triples += after - before
+        if after and not before:
+            column.add(key, o)
+        elif before and not after:
+            column.remove(o)
+
+    def count(self, p: int, kind: str) -> int:
+        """Get the number of triples of a predicate with an object of a kind."""
+        column = self._columns.get((p, kind))
+        return 0 if column is None else column.triples
+
+    def objects(
+        self,
+        p: int,
+        kind: str,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+    ) -> Sequence[int]:
+        """Get the objects of a kind of a predicate with a sort key from low
+        to high, both included, in order of key. None is unbounded."""
+        column = self._columns.get((p, kind))
+        if column is None:
+            return ()
+        with self._settle_lock:
+            column.settle()
+        start = 0 if low is None else bisect_left(column.keys, low)
+        end = len(column.keys) if high is None else bisect_right(column.keys, high)
+        return column.ids[start:end]
+
+
+class _Column:
+    """Objects of one predicate and kind, as sort keys and term IDs sorted
+    by key. Changes are merged into the arrays on the next lookup."""
+
+    __slots__ = ("keys", "ids", "added", "removed", "triples")
+
+    def __init__(self):
+        self.keys = array("d")
+        self.ids = array("q")
+        # Sort keys of the objects added since the arrays were merged.
+        self.added: Dict[int, float] = {}
+        # Term IDs in the arrays that are no longer objects.
+        self.removed: Set[int] = set()
+        self.triples = 0
+
+    def add(self, key: float, term_id: int):
+        if term_id in self.removed:
+            self.removed.discard(term_id)
+        else:
+            self.added[term_id] = key
+
+    def remove(self, term_id: int):
+        if self.added.pop(term_id, None) is None:
+            self.removed.add(term_id)
+
+    def settle(self):
+        if not self.added and not self.removed:
+            return
+        entries = merge(
+            (
+                (key, term_id)
+                for key, term_id in zip(self.keys, self.ids)
+                if term_id not in self.removed
+            ),
+            sorted((key, term_id) for term_id, key in self.added.items()),
+        )
+        self.keys = array("d")
+        self.ids = array("q")
+        for key, term_id in entries:
+            self.keys.append(key)
+            self.ids.append(term_id)
+        self.added.clear()
+        self.removed.clear()
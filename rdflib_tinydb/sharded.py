@@ -0,0 +1,336 @@
+import json
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from rdflib import BNode, Graph, Literal, URIRef, store
+from rdflib.store import Store
+
+from rdflib_tinydb.store import (
+    TinyDBMemoryStore,
+    TinyDBStore,
+    _BaseTinyDBStore,
+    _parse_configuration,
+)
+
+# Default number of shards of a new sharded store.
+SHARDS = 4
+
+# Name of the file recording the number of shards in a store's directory.
+_MANIFEST = "shards.json"
+
+# Patterns matching fewer triples than this across shards are read from the
+# shards in turn, as reading them in parallel would cost more than it saves.
+_FAN_OUT_THRESHOLD = 1000
+
+# Number of matches a shard's reader thread hands over at a time, and the
+# number of batches that may wait to be consumed.
+_FAN_OUT_BATCH_SIZE = 256
+_FAN_OUT_QUEUE_SIZE = 16
+
+
+class TinyDBShardedStore(Store):
+    """RDFLib store partitioning triples across TinyDB stores by subject.
+
+    Each triple is kept in the shard picked by a hash of its subject, so
+    patterns with a bound subject are answered by one shard. Other patterns
+    are read from every shard, in parallel threads for larger results, and
+    the matches are yielded as they arrive. Writes only touch the files of
+    the shards they change. Graphs span shards. Transactions are per shard:
+    commit() commits each shard in turn.
+    """
+
+    context_aware: bool = True
+    formula_aware: bool = False
+    transaction_aware: bool = True
+    graph_aware: bool = True
+
+    _shards: List[_BaseTinyDBStore] = ()
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(self, configuration=None, identifier=None):
+        self.__namespace = {}
+        self.__prefix = {}
+        super(TinyDBShardedStore, self).__init__(configuration, identifier)
+
+    def open(
+        self, configuration: Union[None, str, Mapping[str, Any]], create: bool = False
+    ) -> Optional[int]:
+        """Open the shards.
+
+        :param configuration: Path to the directory of the shards, or a
+            mapping with the keys "path" (None keeps the shards in memory),
+            "shards" (the number of shards of a new store, default 4) and
+            the settings of TinyDBStore.open(), used for every shard. Shard
+            i is kept in "shard-i.json" in the directory, and the number of
+            shards in "shards.json".
+        """
+        configuration = _parse_configuration(configuration)
+        path = configuration.pop("path", None)
+        shards = configuration.pop("shards", None)
+        if path is None:
+            self._shards = [TinyDBMemoryStore() for _ in range(shards or SHARDS)]
+            for shard in self._shards:
+                shard.open(configuration)
+            return store.VALID_STORE
+
+        path = os.fspath(path)
+        manifest = os.path.join(path, _MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest) as handle:
+                count = json.load(handle)["shards"]
+            if shards is not None and shards != count:
+                raise ValueError(f'"{path}" has {count} shards, not {shards}.')
+        else:
+            count = shards or SHARDS
+            os.makedirs(path, exist_ok=True)
+            with open(manifest, "w") as handle:
+                json.dump({"shards": count}, handle)
+
+        self._shards = []
+        for i in range(count):
+            shard = TinyDBStore()
+            shard.open({**configuration, "path": os.path.join(path, f"shard-{i}.json")})
+            self._shards.append(shard)
+        return store.VALID_STORE
+
+    def close(self, commit_pending_transaction: bool = False):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        for shard in self._shards:
+            shard.close(commit_pending_transaction)
+        self._shards = ()
+
+    def gc(self):
+        pass
+
+    def destroy(self, configuration: Union[str, None]):
+        raise NotImplementedError(
+            "TinyDBShardedStore.destroy() is not implemented yet."
+        )
+
+    @property
+    def shards(self) -> List[_BaseTinyDBStore]:
+        """The stores holding the shards, e.g. to compact them."""
+        return list(self._shards)
+
+    def _shard(self, subject: Union[URIRef, BNode, Literal]) -> _BaseTinyDBStore:
+        """Get the shard of the triples of a subject."""
+        # crc32() rather than hash(), which differs between processes.
+        return self._shards[zlib.crc32(str(subject).encode()) % len(self._shards)]
+
+    def commit(self):
+        for shard in self._shards:
+            shard.commit()
+
+    def rollback(self):
+        for shard in self._shards:
+            shard.rollback()
+
+    def add(
+        self,
+        triple: Tuple[Union[URIRef, BNode], URIRef, Union[URIRef, BNode, Literal]],
+        context: Union[str, URIRef, Graph],
+        quoted: bool = False,
+    ):
+        self._shard(triple[0]).add(triple, context, quoted)
+
+    def addN(self, quads: Iterable[Tuple]):
+        """Add quads, with one write per shard, to the shards in parallel."""
+        batches: Dict[int, List[Tuple]] = {}
+        for quad in quads:
+            batches.setdefault(id(self._shard(quad[0])), []).append(quad)
+        shards = [shard for shard in self._shards if id(shard) in batches]
+        self._map(lambda shard: shard.addN(batches[id(shard)]), shards)
+
+    def remove(
+        self,
+        triple_pattern: Tuple[
+            Union[URIRef, BNode, None],
+            Union[URIRef, None],
+            Union[URIRef, BNode, Literal, None],
+        ],
+        context=None,
+    ):
+        self._map(
+            lambda shard: shard.remove(triple_pattern, context),
+            self._route(triple_pattern),
+        )
+
+    def _route(self, triple_pattern: Tuple) -> List[_BaseTinyDBStore]:
+        """Get the shards that may hold matches of a triple pattern."""
+        if triple_pattern[0] is not None:
+            return [self._shard(triple_pattern[0])]
+        return list(self._shards)
+
+    def _map(self, function: Callable[[_BaseTinyDBStore], Any], shards: List):
+        """Call a function on each shard, in parallel threads if several."""
+        if len(shards) <= 1:
+            for shard in shards:
+                function(shard)
+            return
+        # list() waits for every call and raises the first error.
+        list(self._pool().map(function, shards))
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(self._shards), thread_name_prefix="rdflib-tinydb-shard"
+            )
+        return self._executor
+
+    def triples(
+        self,
+        triple_pattern: Tuple[
+            Union[URIRef, BNode, None],
+            Union[URIRef, None],
+            Union[URIRef, BNode, Literal, None],
+        ],
+        context=None,
+    ):
+        """Yield the triples matching the pattern and their graphs.
+
+        Patterns with an unbound subject matching many triples are read
+        from every shard in parallel, each shard in its own thread, and the
+        matches of all shards are yielded as they arrive.
+        """
+        shards = self._route(triple_pattern)
+        if len(shards) > 1 and (
+            sum(shard.cardinality(triple_pattern) for shard in shards)
+            >= _FAN_OUT_THRESHOLD
+        ):
+            matches = _fan_out(
+                lambda shard: self._shard_triples(shard, triple_pattern, context),
+                shards,
+            )
+        else:
+            matches = (
+                match
+                for shard in shards
+                for match in self._shard_triples(shard, triple_pattern, context)
+            )
+        for triple, graphs in matches:
+            yield triple, (Graph(store=self, identifier=graph) for graph in graphs)
+
+    def _shard_triples(
+        self, shard: _BaseTinyDBStore, triple_pattern: Tuple, context
+    ) -> Iterator[Tuple]:
+        # The graphs are read in the shard's thread, under its lock.
+        for triple, graphs in shard.triples(triple_pattern, context):
+            yield triple, [graph.identifier for graph in graphs]
+
+    def __len__(self, context: Union[None, URIRef, BNode, Graph] = None) -> int:
+        return sum(shard.__len__(context) for shard in self._shards)
+
+    def cardinality(
+        self,
+        triple_pattern: Tuple[
+            Union[URIRef, BNode, None],
+            Union[URIRef, None],
+            Union[URIRef, BNode, Literal, None],
+        ],
+        context: Union[None, URIRef, BNode, Graph] = None,
+    ) -> int:
+        """Get the number of triples matching a pattern without decoding them."""
+        return sum(
+            shard.cardinality(triple_pattern, context)
+            for shard in self._route(triple_pattern)
+        )
+
+    def contexts(self, triple=None) -> Iterator[Graph]:
+        """Yield the graphs in the store, or the graphs holding the triple."""
+        shards = self._shards if triple is None else self._route(triple)
+        seen = set()
+        for shard in shards:
+            for graph in shard.contexts(triple):
+                if graph.identifier not in seen:
+                    seen.add(graph.identifier)
+                    yield Graph(store=self, identifier=graph.identifier)
+
+    def add_graph(self, graph: Graph):
+        self._shard(graph.identifier).add_graph(graph)
+
+    def remove_graph(self, graph: Graph):
+        self._map(lambda shard: shard.remove_graph(graph), list(self._shards))
+
+    def bind(self, prefix, namespace):
+        self.__prefix[namespace] = prefix
+        self.__namespace[prefix] = namespace
+
+    def namespace(self, prefix):
+        return self.__namespace.get(prefix, None)
+
+    def prefix(self, namespace):
+        return self.__prefix.get(namespace, None)
+
+    def namespaces(self):
+        for prefix, namespace in self.__namespace.items():
+            yield prefix, namespace
+
+
+def _fan_out(function: Callable[[Any], Iterator], shards: List) -> Iterator:
+    """Yield the items of function(shard) for every shard, each shard read
+    by its own thread, in the order they arrive.
+
+    Dedicated threads rather than a pool: a caller may read another pattern
+    while iterating, as RDFLib's SPARQL joins do, and must not wait for
+    threads blocked on its own unread results.
+    """
+    batches: queue.Queue = queue.Queue(_FAN_OUT_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read(shard):
+        iterator = function(shard)
+        try:
+            while not stop.is_set():
+                batch = list(islice(iterator, _FAN_OUT_BATCH_SIZE))
+                if not batch:
+                    break
+                put((batch, None))
+        except BaseException as error:
+            put((None, error))
+        finally:
+            iterator.close()
+            put((None, None))
+
+    threads = [
+        threading.Thread(target=read, args=(shard,), daemon=True) for shard in shards
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        running = len(threads)
+        while running:
+            batch, error = batches.get()
+            if error is not None:
+                raise error
+            if batch is None:
+                running -= 1
+            else:
+                yield from batch
+    finally:
+        stop.set()
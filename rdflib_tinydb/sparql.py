@@ -0,0 +1,397 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from rdflib import BNode, ConjunctiveGraph, Literal, Variable
+from rdflib.paths import Path
+from rdflib.plugins.sparql.evalutils import _ebv
+from rdflib.plugins.sparql.sparql import FrozenBindings, QueryContext
+
+from rdflib_tinydb.index import TripleIndex
+from rdflib_tinydb.ranges import literal_value, sort_key
+from rdflib_tinydb.store import _BaseTinyDBStore
+
+# A triple pattern in term ID space: each position is either a term ID or an
+# unbound variable.
+Pattern = Tuple[Union[int, Variable, BNode], ...]
+
+# A test of a variable against a constant that a filter requires: "contains"
+# or "strstarts" a string, or a comparison operator and a value.
+Constraint = Tuple[Variable, str, Literal]
+
+# Characters with a special meaning in SPARQL regular expressions.
+_REGEX_SPECIAL = set(".^$*+?{}[]()|\\")
+
+# Comparison operators, and their equivalent with the operands swapped.
+_COMPARISONS = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "=": "="}
+
+
+def evaluate(ctx: QueryContext, part) -> Iterator[FrozenBindings]:
+    """Evaluate basic graph patterns over a TinyDB store natively.
+
+    Registered in rdflib's CUSTOM_EVALS. Patterns are matched in term ID
+    space with index lookups, in an order chosen from the index statistics,
+    and only the solutions are decoded. Filters over a BGP that test a
+    variable with CONTAINS, STRSTARTS or a plain REGEX, with the store's
+    text index, or compare it to a numeric, date or dateTime value, with
+    its range index, also restrict the variable to the terms the index
+    finds. Anything else, and BGPs over other stores or with property
+    paths, is left to rdflib's own evaluator.
+    """
+    if part.name == "Filter" and part.p.name == "BGP":
+        store = _native_store(ctx, part.p)
+        constraints = [] if store is None else _constraints(store, part.expr)
+        if not constraints:
+            raise NotImplementedError()
+        return _evaluate_filter(ctx, store, part, constraints)
+    if part.name != "BGP":
+        raise NotImplementedError()
+    store = _native_store(ctx, part)
+    if store is None:
+        raise NotImplementedError()
+    return _evaluate_bgp(ctx, store, part.triples)
+
+
+def _native_store(ctx: QueryContext, bgp) -> Optional[_BaseTinyDBStore]:
+    """Get the TinyDB store to evaluate a BGP over, or None if it cannot be."""
+    store = getattr(ctx.graph, "store", None)
+    if not isinstance(store, _BaseTinyDBStore):
+        return None
+    if any(isinstance(node, Path) for triple in bgp.triples for node in triple):
+        return None
+    return store
+
+
+def _constraints(store: _BaseTinyDBStore, expr) -> List[Constraint]:
+    """Get the tests of variables that a filter expression requires and
+    that the store's indexes can narrow down."""
+    name = getattr(expr, "name", None)
+    if name == "ConditionalAndExpression":
+        constraints = _constraints(store, expr.expr)
+        for other in expr.other:
+            constraints.extend(_constraints(store, other))
+        return constraints
+    if name == "RelationalExpression":
+        if store._range_index is None or expr.op not in _COMPARISONS:
+            return []
+        variable, operator, value = expr.expr, expr.op, expr.other
+        if isinstance(value, Variable):
+            variable, operator, value = value, _COMPARISONS[operator], variable
+    elif store._text_index is None:
+        return []
+    elif name in ("Builtin_CONTAINS", "Builtin_STRSTARTS"):
+        variable, operator, value = expr.arg1, name[8:].lower(), expr.arg2
+    elif name == "Builtin_REGEX" and not expr.flags:
+        variable, operator, value = expr.text, "contains", expr.pattern
+        if isinstance(value, Literal):
+            if value.startswith("^"):
+                operator, value = "strstarts", Literal(value[1:])
+            if _REGEX_SPECIAL.intersection(value):
+                return []
+    else:
+        return []
+    if isinstance(variable, Variable) and isinstance(value, Literal):
+        return [(variable, operator, value)]
+    return []
+
+
+def _evaluate_filter(
+    ctx: QueryContext,
+    store: _BaseTinyDBStore,
+    part,
+    constraints: Sequence[Constraint],
+) -> Iterator[FrozenBindings]:
+    # The constraints only prune the BGP's solutions: as in rdflib's
+    # evalFilter(), the whole filter still decides which ones pass.
+    for solution in _evaluate_bgp(ctx, store, part.p.triples, constraints):
+        if _ebv(
+            part.expr,
+            (
+                solution
+                if part.no_isolated_scope
+                else solution.forget(ctx, _except=part._vars)
+            ),
+        ):
+            yield solution
+
+
+def _evaluate_bgp(
+    ctx: QueryContext,
+    store: _BaseTinyDBStore,
+    triples: List[Tuple],
+    constraints: Sequence[Constraint] = (),
+) -> Iterator[FrozenBindings]:
+    graph = ctx.graph
+    if isinstance(graph, ConjunctiveGraph):
+        context = None if graph.default_union else graph.default_context
+    else:
+        context = graph
+    with store._lock.read():
+        c = store._lookup_context(context)
+        if c is False:
+            return
+
+        patterns = []
+        for triple in triples:
+            pattern = _resolve(ctx, store, triple)
+            if pattern is None:
+                return
+            patterns.append(pattern)
+        candidates = _candidates(store, patterns, constraints)
+        patterns = _plan(store._index, patterns, candidates)
+
+    # Solutions are found and decoded in batches under the store's read lock.
+    solutions = store._read_batches(
+        {variable: store._decode(term_id) for variable, term_id in bindings.items()}
+        for bindings in _join(store._index, patterns, c, candidates)
+    )
+    for bindings in solutions:
+        solution = ctx.push()
+        for variable, term in bindings.items():
+            solution[variable] = term
+        yield solution.solution()
+
+
+def _resolve(
+    ctx: QueryContext, store: _BaseTinyDBStore, triple: Tuple
+) -> Optional[Pattern]:
+    """Get the term ID pattern of a triple, substituting bound variables.
+
+    :return: None if a term was never stored, as nothing can match.
+    """
+    pattern = []
+    for node in triple:
+        # Unbound variables and blank nodes are None in the context.
+        value = ctx[node]
+        if value is None:
+            pattern.append(node)
+            continue
+        term_id = store._lookup(value)
+        if term_id is None:
+            return None
+        pattern.append(term_id)
+    return tuple(pattern)
+
+
+def _candidates(
+    store: _BaseTinyDBStore,
+    patterns: List[Pattern],
+    constraints: Sequence[Constraint],
+) -> Dict[Variable, Set[int]]:
+    """Get the term IDs each constrained variable of the patterns may take."""
+    candidates: Dict[Variable, Set[int]] = {}
+    for variable, operator, value in constraints:
+        if operator in ("contains", "strstarts"):
+            terms = _text_candidates(store, patterns, variable, operator, value)
+        else:
+            terms = _range_candidates(store, patterns, variable, operator, value)
+        if terms is None:
+            continue
+        if variable in candidates:
+            terms &= candidates[variable]
+        candidates[variable] = terms
+    return candidates
+
+
+def _text_candidates(
+    store: _BaseTinyDBStore,
+    patterns: List[Pattern],
+    variable: Variable,
+    operator: str,
+    value: Literal,
+) -> Optional[Set[int]]:
+    """Get the literals whose value contains, or starts with, a string.
+
+    :return: None if the text index would give more candidates than the
+        variable's patterns have matches, leaving the test to the filter.
+    """
+    matches = [
+        store._index.cardinality(_constants(pattern))
+        for pattern in patterns
+        if variable in pattern
+    ]
+    if not matches:
+        return None
+    prefix = operator == "strstarts"
+    found = store._text_index.candidates(str(value), prefix)
+    if len(found) > min(matches):
+        return None
+    return set(store._search_ids(str(value), prefix, found))
+
+
+def _range_candidates(
+    store: _BaseTinyDBStore,
+    patterns: List[Pattern],
+    variable: Variable,
+    operator: str,
+    value: Literal,
+) -> Optional[Set[int]]:
+    """Get the objects of the variable's predicates that may compare to a
+    numeric, date or dateTime value as the operator requires.
+
+    Only predicates whose objects are all of the value's kind narrow the
+    variable down: rdflib orders literals of different kinds by datatype.
+
+    :return: None if no pattern has the variable as the object of such a
+        predicate.
+    """
+    bound = literal_value(str(value.datatype), str(value))
+    if bound is None:
+        return None
+    kind = bound[0]
+    key = sort_key(*bound)
+    low = None if operator in ("<", "<=") else key
+    high = None if operator in (">", ">=") else key
+    terms = None
+    for pattern in patterns:
+        p = pattern[1]
+        if pattern[2] != variable or not isinstance(p, int):
+            continue
+        if store._range_index.count(p, kind) != store._index.cardinality(
+            (None, p, None)
+        ):
+            continue
+        objects = set(store._range_index.objects(p, kind, low, high))
+        terms = objects if terms is None else terms & objects
+    return terms
+
+
+def _constants(pattern: Pattern) -> Tuple[Optional[int], ...]:
+    return tuple(term if isinstance(term, int) else None for term in pattern)
+
+
+def _plan(
+    index: TripleIndex,
+    patterns: List[Pattern],
+    candidates: Dict[Variable, Set[int]],
+) -> List[Pattern]:
+    """Order patterns greedily, cheapest first given the variables bound so far."""
+    remaining = list(patterns)
+    ordered = []
+    bound: Set = set()
+    while remaining:
+        pattern = min(
+            remaining, key=lambda pattern: _cost(index, pattern, bound, candidates)
+        )
+        remaining.remove(pattern)
+        ordered.append(pattern)
+        bound.update(term for term in pattern if not isinstance(term, int))
+    return ordered
+
+
+def _cost(
+    index: TripleIndex,
+    pattern: Pattern,
+    bound: Set,
+    candidates: Dict[Variable, Set[int]],
+) -> Tuple[bool, float]:
+    """Estimate the number of matches of a pattern per solution so far.
+
+    Each variable bound by an earlier pattern divides the matches of the
+    pattern's constants by the number of distinct terms in its position.
+    A variable restricted to candidate terms caps them at one per candidate.
+    Patterns sharing no variable with the earlier ones sort last, as they
+    multiply the solutions.
+    """
+    estimate = index.cardinality(_constants(pattern))
+    joined = False
+    for position, term in enumerate(pattern):
+        if isinstance(term, int):
+            continue
+        if term in bound:
+            estimate /= max(index.distinct(position), 1)
+            joined = True
+        elif term in candidates:
+            estimate = min(estimate, len(candidates[term]))
+    return bool(bound) and not joined and estimate > 1, estimate
+
+
+def _join(
+    index: TripleIndex,
+    patterns: List[Pattern],
+    context: Optional[int],
+    candidates: Dict[Variable, Set[int]],
+) -> Iterator[Dict]:
+    """Yield the variable bindings matching all patterns, as term IDs.
+
+    Index nested-loop join: each solution of the patterns before is
+    substituted into the next pattern, which is then an index lookup.
+    A pattern sharing no variable with the patterns before is looked up
+    only once, and its bindings are combined with every solution. Joins on
+    shared variables are not hash joins: the substituted lookup is already
+    a hash lookup in the index, where a hash join would first have to find
+    all of the pattern's matches. Variables with candidate terms only bind
+    to those.
+    """
+    # The bindings of each pattern after the first sharing no variable with
+    # the patterns before it, once found.
+    cross: Dict[int, Optional[List[Dict]]] = {}
+    bound: Set = set()
+    for depth, pattern in enumerate(patterns):
+        if depth and bound.isdisjoint(pattern):
+            cross[depth] = None
+        bound.update(term for term in pattern if not isinstance(term, int))
+
+    def extend(depth: int, bindings: Dict) -> Iterator[Dict]:
+        if depth == len(patterns):
+            yield bindings
+            return
+        pattern = patterns[depth]
+        if depth in cross:
+            found = cross[depth]
+            if found is None:
+                found = cross[depth] = list(
+                    _bind(index, pattern, {}, context, candidates)
+                )
+            for other in found:
+                yield from extend(depth + 1, {**bindings, **other})
+            return
+        for extended in _bind(index, pattern, bindings, context, candidates):
+            yield from extend(depth + 1, extended)
+
+    yield from extend(0, {})
+
+
+def _bind(
+    index: TripleIndex,
+    pattern: Pattern,
+    bindings: Dict,
+    context: Optional[int],
+    candidates: Dict[Variable, Set[int]],
+) -> Iterator[Dict]:
+    """Yield the bindings extended with each match of a pattern."""
+    lookup = tuple(
+        term if isinstance(term, int) else bindings.get(term) for term in pattern
+    )
+    for triple in _matches(index, pattern, lookup, context, candidates):
+        extended = dict(bindings)
+        for term, term_id in zip(pattern, triple):
+            if isinstance(term, int):
+                continue
+            # A variable repeated within the pattern must match itself.
+            if extended.setdefault(term, term_id) != term_id:
+                break
+            if term in candidates and term_id not in candidates[term]:
+                break
+        else:
+            yield extended
+
+
+def _matches(
+    index: TripleIndex,
+    pattern: Pattern,
+    lookup: Tuple[Optional[int], ...],
+    context: Optional[int],
+    candidates: Dict[Variable, Set[int]],
+) -> Iterator[Tuple[int, int, int]]:
+    """Yield the triples matching a lookup, looking them up once per
+    candidate term of an unbound variable if it has fewer candidates than
+    the lookup has matches."""
+    for position, term in enumerate(pattern):
+        if lookup[position] is not None or term not in candidates:
+            continue
+        terms = candidates[term]
+        if len(terms) < index.cardinality(lookup):
+            for term_id in terms:
+                substituted = lookup[:position] + (term_id,) + lookup[position + 1 :]
+                yield from index.triples(substituted, context)
+            return
+    yield from index.triples(lookup, context)
@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Any
+
+from tinydb.storages import Storage, touch
+
+
+class LogStorage(Storage):
+    """Append-only TinyDB storage.
+
+    The database lives in memory. Every write() appends only the documents
+    that changed since the previous write to a JSON lines log beside the
+    snapshot file. On open the log is replayed on top of the snapshot.
+
+    write() still compares every table TinyDB changed with its previous
+    state. apply() takes the changes themselves, so its cost grows with
+    the size of the change rather than the size of the database. read()
+    returns views of the tables that copy documents only as they are read.
+
+    compact() folds the log into a new snapshot. It runs automatically once
+    ``compaction_threshold`` documents have been logged, in a background
+    thread unless ``background_compaction`` is False. The snapshot uses the
+    same layout as TinyDB's JSONStorage.
+
+    Each log line maps table names to ``{doc_id: document}`` changes, where
+    a null document is a removal and a null table is a dropped table.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        create_dirs: bool = False,
+        encoding: Optional[str] = None,
+        compaction_threshold: Optional[int] = 10000,
+        background_compaction: bool = True,
+        **kwargs,
+    ):
+        """Create a new instance.
+
+        :param path: Path to the JSON snapshot file. The log is kept at
+            ``path + ".log"``.
+        :param create_dirs: Whether to create all missing parent directories.
+        :param encoding: Encoding of the snapshot and log files.
+        :param compaction_threshold: Number of logged document changes that
+            triggers a compaction. None disables automatic compaction.
+        :param background_compaction: Whether automatic compaction runs in a
+            background thread.
+        :param kwargs: Keyword arguments passed to json.dumps() when writing
+            the snapshot.
+        """
+        super().__init__()
+        self._path = os.fspath(path)
+        self._log_path = self._path + ".log"
+        self._old_log_path = self._path + ".log.old"
+        self._encoding = encoding
+        self._compaction_threshold = compaction_threshold
+        self._background_compaction = background_compaction
+        self.kwargs = kwargs
+
+        touch(self._path, create_dirs=create_dirs)
+
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self._data = self._load()
+        self._logged = 0
+        self._log = open(self._log_path, "a", encoding=encoding)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Read the snapshot and replay the logs left by earlier sessions."""
+        with open(self._path, encoding=self._encoding) as handle:
+            content = handle.read()
+        data = json.loads(content) if content else {}
+
+        # A compaction that did not finish leaves its log rotated out.
+        # Replaying it is safe either way as log entries are idempotent.
+        for path in (self._old_log_path, self._log_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding=self._encoding) as handle:
+                for line in handle:
+                    if line.strip():
+                        _apply(data, json.loads(line))
+        return data
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            if not self._data:
+                return None
+            return {name: _TableView(table) for name, table in self._data.items()}
+
+    def write(self, data: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            self._append(_diff(self._data, data))
+
+    def apply(self, changes: Dict[str, Optional[Dict[str, Any]]]):
+        """Write changes to the database without reading it.
+
+        :param changes: Maps table names to ``{doc_id: document}`` changes,
+            where a None document removes the document, or to None to drop
+            the table. The documents are copied.
+        """
+        changes = {
+            name: (
+                None
+                if table_changes is None
+                else {
+                    doc_id: None if document is None else dict(document)
+                    for doc_id, document in table_changes.items()
+                }
+            )
+            for name, table_changes in changes.items()
+        }
+        self._append(changes)
+
+    def _append(self, changes: Dict):
+        """Log changes, apply them to the data and compact if due."""
+        with self._lock:
+            if not changes:
+                return
+            self._log.write(json.dumps(changes) + "\n")
+            self._log.flush()
+            _apply(self._data, changes)
+            self._logged += sum(
+                1 if table is None else len(table) for table in changes.values()
+            )
+            if (
+                self._compaction_threshold is None
+                or self._logged < self._compaction_threshold
+                or self._compaction is not None
+            ):
+                return
+            if self._background_compaction:
+                self._compaction = threading.Thread(target=self.compact, daemon=True)
+
+        if self._background_compaction:
+            self._compaction.start()
+        else:
+            self.compact()
+
+    def compact(self):
+        """Write the current state to the snapshot file and discard the log."""
+        with self._compacting:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            # Documents are replaced rather than changed, so copying the
+            # tables is enough to serialise them without holding the lock.
+            data = {name: dict(table) for name, table in self._data.items()}
+            self._log.close()
+            if os.path.exists(self._old_log_path):
+                # An earlier compaction failed; keep its entries until the
+                # new snapshot is in place.
+                with open(self._old_log_path, "a", encoding=self._encoding) as old:
+                    with open(self._log_path, encoding=self._encoding) as log:
+                        old.write(log.read())
+                os.remove(self._log_path)
+            else:
+                os.replace(self._log_path, self._old_log_path)
+            self._log = open(self._log_path, "a", encoding=self._encoding)
+            self._logged = 0
+
+        try:
+            temporary_path = self._path + ".tmp"
+            with open(temporary_path, "w", encoding=self._encoding) as handle:
+                json.dump(data, handle, **self.kwargs)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temporary_path, self._path)
+            os.remove(self._old_log_path)
+        finally:
+            with self._lock:
+                if self._compaction is threading.current_thread():
+                    self._compaction = None
+
+    def close(self):
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+        self._log.close()
+
+
+class _TableView(Mapping):
+    """Read-only view of a table of a LogStorage, handing out copies of its
+    documents so TinyDB can update them in place."""
+
+    __slots__ = ("table",)
+
+    def __init__(self, table: Dict[str, Any]):
+        self.table = table
+
+    def __getitem__(self, doc_id: str) -> Dict[str, Any]:
+        return dict(self.table[doc_id])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.table)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+
+def _diff(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Dict:
+    """Get the log entry that turns old into new."""
+    changes = {}
+    for name in old.keys() - new.keys():
+        changes[name] = None
+    for name, table in new.items():
+        old_table = old.get(name, {})
+        if isinstance(table, _TableView) and table.table is old_table:
+            # Returned by read() and not replaced since.
+            continue
+        table_changes = {
+            doc_id: document
+            for doc_id, document in table.items()
+            if old_table.get(doc_id) != document
+        }
+        for doc_id in old_table.keys() - table.keys():
+            table_changes[doc_id] = None
+        if table_changes or name not in old:
+            changes[name] = table_changes
+    return changes
+
+
+def _apply(data: Dict[str, Dict[str, Any]], changes: Dict):
+    """Replay a log entry on data in place."""
+    for name, table_changes in changes.items():
+        if table_changes is None:
+            data.pop(name, None)
+            continue
+        table = data.setdefault(name, {})
+        for doc_id, document in table_changes.items():
+            if document is None:
+                table.pop(doc_id, None)
+            else:
+                table[doc_id] = document
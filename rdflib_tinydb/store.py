@@ -1,25 +1,195 @@
+import io
+import marshal
+import os
 from abc import ABC, abstractmethod
-from typing import Union, Dict, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial, wraps
+from itertools import chain, islice
+from pathlib import Path
+from time import perf_counter
+from typing import (
+    IO,
+    Callable,
+    Union,
+    Dict,
+    Optional,
+    Tuple,
+    List,
+    Iterable,
+    Iterator,
+    Mapping,
+    Any,
+)
 
-from rdflib import URIRef, BNode, Literal, store, Graph
+from rdflib import URIRef, BNode, Literal, XSD, store, Graph
+from rdflib.graph import ConjunctiveGraph, DATASET_DEFAULT_GRAPH_ID
 from rdflib.store import Store
-from tinydb import TinyDB, Query
+from tinydb import TinyDB
 from tinydb.table import Table, Document
-from tinydb.storages import MemoryStorage
+from tinydb.storages import MemoryStorage, JSONStorage
 
+from rdflib_tinydb.aio import AsyncStoreMixin, ASYNC_WORKERS
+from rdflib_tinydb.binary import (
+    BinaryFile,
+    BinaryTermDictionary,
+    BinaryTripleIndex,
+    write_binary,
+)
+from rdflib_tinydb.index import TripleIndex
+from rdflib_tinydb.instrumentation import Instrumentation, InstrumentedStorage
+from rdflib_tinydb.locks import FileLock, ReadWriteLock
+from rdflib_tinydb.ntriples import format_term, parse_statement, parse_term
+from rdflib_tinydb.ranges import RangeIndex, literal_value, sort_key
+from rdflib_tinydb.storages import LogStorage
+from rdflib_tinydb.terms import TermDictionary
+from rdflib_tinydb.text import TextIndex
 
-class _BaseTinyDBStore(Store, ABC):
+# Version of the layout of the TinyDB tables, stored in the meta table.
+#   1: spo/pos/osp documents holding full store terms (no meta table).
+#   2: terms table of store terms, spo/pos/osp documents holding term IDs.
+#   3: terms table of store terms, one triples table holding term IDs.
+#   4: as 3, with the context of each triple and a graphs table.
+_FORMAT_VERSION = 4
+
+# TinyDB storages selectable by name with the "storage" configuration key.
+_STORAGES = {"json": JSONStorage, "log": LogStorage}
+
+# Version of the layout of index snapshot files.
+_SNAPSHOT_VERSION = 2
+
+# Default number of terms held by each of the encode and decode caches.
+_TERM_CACHE_SIZE = 10000
+
+# Largest number of matches read from the indexes per hold of the read lock.
+_READ_BATCH_SIZE = 64
+
+# Number of lines dump() writes at a time and load() reads at a time.
+_DUMP_BATCH_SIZE = 1000
+_LOAD_BATCH_SIZE = 10000
+
+# N-Triples and N-Quads format names of dump(), as RDFLib names them.
+_QUAD_FORMATS = {"nt": False, "ntriples": False, "nquads": True}
+
+
+def _timed(operation: str) -> Callable:
+    """Record the calls of a store method when instrumentation is enabled."""
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            instrumentation = self._instrumentation
+            if instrumentation is None:
+                return method(self, *args, **kwargs)
+            start = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                instrumentation.record(operation, perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _reads(method: Callable) -> Callable:
+    """Run a store method holding the read lock."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _writes(method: Callable) -> Callable:
+    """Run a store method holding the write lock, and the file lock if enabled."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._begin_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._end_write()
+
+    return wrapper
+
+
+class _BaseTinyDBStore(AsyncStoreMixin, Store, ABC):
     # Base store settings.
-    context_aware: bool = False
+    context_aware: bool = True
     formula_aware: bool = False
-    transaction_aware: bool = False
-    graph_aware: bool = False
+    transaction_aware: bool = True
+    graph_aware: bool = True
 
     # TinyDB store
     _store: TinyDB = None
-    _spo: Table = None
-    _pos: Table = None
-    _osp: Table = None
+    _meta: Table = None
+    _terms: Table = None
+    _triples: Table = None
+    _graphs: Table = None
+    # With the binary storage, the memory-mapped file holding the store as
+    # of the last compaction. The terms and triples tables then only hold
+    # what was added since, and the removed table the quads removed from it.
+    _base: BinaryFile = None
+    _removed: Table = None
+
+    # In-memory term dictionary and SPO/POS/OSP indexes over term IDs, built
+    # on open(). Each triple is stored once per context in the triples table
+    # and each graph, keyed by the term ID of its identifier, in the graphs
+    # table.
+    _term_dictionary: TermDictionary = None
+    _index: TripleIndex = None
+    # Trigram index of the values of the literal terms, and sorted index of
+    # the numeric, date and dateTime objects of each predicate, if enabled
+    # on open().
+    _text_index: Optional[TextIndex] = None
+    _range_index: Optional[RangeIndex] = None
+
+    # LRU caches of store keys to RDFLib terms and of IRIs and blank nodes
+    # to store keys, created on open().
+    _decode_key: Callable = None
+    _encode_key: Callable = None
+
+    # Write-behind cache of changes not committed yet, keyed by table name
+    # then document ID. A None document removes the document.
+    _pending: Dict[str, Dict[int, Optional[Dict]]] = None
+    # Document ID of each (s, p, o, context) quad in the triples table.
+    _quad_ids: Dict[Tuple[int, int, int, int], int] = None
+    # Index changes since the last commit, undone on rollback(). Either
+    # ("add", "remove" or "remove_base", triple, context, document ID) or
+    # ("add_graph" or "remove_graph", context).
+    _undo: List[Tuple] = None
+    _next_triple_id: int = 1
+    _next_removed_id: int = 1
+    # Number of commits that changed the store, kept in the meta table.
+    _changes: int = 0
+    _autocommit: bool = True
+    _bulk_load_depth: int = 0
+
+    # Snapshot of the in-memory indexes written on close().
+    _snapshot_path: Optional[str] = None
+    _snapshot_stale: bool = True
+    # The storage files, and their size and modification time when last
+    # loaded or written by this store.
+    _storage_files: List[str] = ()
+    _storage_state: List = None
+
+    # Settings the store was opened with.
+    _configuration: Dict[str, Any] = None
+
+    # Readers-writer lock of the in-memory state, and the lock of the
+    # database files shared with other processes if enabled on open(). The
+    # file lock is held from the first write of a transaction to its end.
+    _lock: ReadWriteLock = None
+    _file_lock: Optional[FileLock] = None
+    _write_depth: int = 0
+
+    # Statistics of the store operations, if enabled on open().
+    _instrumentation: Optional[Instrumentation] = None
 
     # Prefixes and namespaces
     _namespace: dict
@@ -34,6 +204,7 @@ class _BaseTinyDBStore(Store, ABC):
         # TODO: namespace and prefix should be saved in the store.
         self.__namespace = {}
         self.__prefix = {}
+        self._lock = ReadWriteLock()
         super(_BaseTinyDBStore, self).__init__(configuration, identifier)
 
     @abstractmethod
@@ -41,9 +212,519 @@ class _BaseTinyDBStore(Store, ABC):
         """Create TinyDB database with indices tables."""
         pass
 
+    def _instrument(self, configuration: Dict[str, Any]):
+        """Enable instrumentation if configured.
+
+        :param configuration: Store settings. "instrumentation" is True or an
+            Instrumentation to record to, e.g. one shared by several stores.
+        """
+        instrumentation = configuration.get("instrumentation")
+        if instrumentation is True:
+            instrumentation = Instrumentation()
+        self._instrumentation = instrumentation or None
+
+    def _timed_storage(self, storage: Callable) -> Callable:
+        """Get the TinyDB storage class to use, timed if instrumentation is
+        enabled."""
+        if self._instrumentation is None:
+            return storage
+        return partial(InstrumentedStorage, storage, self._instrumentation)
+
+    @property
+    def instrumentation(self) -> Optional[Instrumentation]:
+        """The statistics of the store operations, or None if not enabled."""
+        return self._instrumentation
+
+    def _open_tables(
+        self, configuration: Dict[str, Any], base: Optional[BinaryFile] = None
+    ):
+        """Open the TinyDB tables and build the in-memory indexes from them.
+
+        :param configuration: Store settings. "autocommit" (default True)
+            commits every write straight away. When False, writes are held
+            in memory until commit() or rollback(). "term_cache_size"
+            (default 10000) bounds the caches of encoded and decoded terms;
+            None leaves them unbounded and 0 disables them. "async_workers"
+            (default 4) is the number of threads of the async API.
+            "text_index" (default False) indexes the values of literals for
+            search() and SPARQL string filters. "range_index" (default
+            False) indexes numeric, date and dateTime objects for
+            value_range() and SPARQL comparison filters. "blank_graphs"
+            (default "default") makes a blank node name the default graph
+            unless a graph was registered under it, e.g. with add_graph().
+            A Graph opened without an identifier gets a new blank node each
+            time, and so reads and writes the default graph, as it did
+            before the store was context-aware. "named" keeps every blank
+            node graph apart.
+        :param base: Binary file holding the store as of the last
+            compaction, with the TinyDB tables holding the changes since.
+        """
+        self._meta = self._store.table("meta")
+        self._terms = self._store.table("terms")
+        self._triples = self._store.table("triples")
+        self._graphs = self._store.table("graphs")
+        self._pending = {"terms": {}, "triples": {}, "graphs": {}}
+        if base is not None:
+            self._removed = self._store.table("removed")
+            self._pending["removed"] = {}
+        self._undo = []
+        self._autocommit = configuration.get("autocommit", True)
+        self._async_workers = configuration.get("async_workers", ASYNC_WORKERS)
+        cache_size = configuration.get("term_cache_size", _TERM_CACHE_SIZE)
+        self._decode_key = lru_cache(maxsize=cache_size)(_convert_key_to_rdflib_term)
+        self._encode_key = lru_cache(maxsize=cache_size)(_convert_node_to_store_key)
+        self._text_index = TextIndex() if configuration.get("text_index") else None
+        self._range_index = RangeIndex() if configuration.get("range_index") else None
+        blank_graphs = configuration.get("blank_graphs", "default")
+        if blank_graphs not in ("default", "named"):
+            raise ValueError(
+                f'Expected "default" or "named" blank graphs. Got "{blank_graphs}".'
+            )
+        self._blank_graphs_default = blank_graphs == "default"
+        self._snapshot_stale = True
+        if self._snapshot_path is not None and self._load_snapshot():
+            self._storage_state = self._storage_signature()
+            return
+
+        meta = self._meta.get(doc_id=1)
+        if meta is None:
+            version = 1 if len(self._store.table("spo")) else _FORMAT_VERSION
+            self._meta.insert(Document({"version": version}, doc_id=1))
+        else:
+            version = meta["version"]
+        if version == 1:
+            self._migrate_from_v1()
+            version = 2
+        if version == 2:
+            self._migrate_from_v2()
+            version = 3
+        if version == 3:
+            self._migrate_from_v3()
+            version = 4
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported TinyDB store format version {version}.")
+        self._changes = self._meta.get(doc_id=1).get("changes", 0)
+
+        if base is not None:
+            generation = self._meta.get(doc_id=1).get("base", 0)
+            if generation > base.generation:
+                raise ValueError(f'"{base.path}" is older than the TinyDB database.')
+            if generation < base.generation:
+                # A compaction wrote the file but did not get to clear the
+                # changes it folded in.
+                for table in (self._terms, self._triples, self._removed):
+                    table.truncate()
+                self._meta.update({"base": base.generation}, doc_ids=[1])
+        self._load_indexes(base)
+        self._storage_state = self._storage_signature()
+
+    def _load_indexes(self, base: Optional[BinaryFile]):
+        """Build the term dictionary and indexes from the binary file, if
+        any, and the TinyDB tables."""
+        self._base = base
+        if base is None:
+            self._term_dictionary = TermDictionary()
+            self._index = TripleIndex()
+        else:
+            self._term_dictionary = BinaryTermDictionary(base)
+            self._index = BinaryTripleIndex(base)
+        for document in self._terms:
+            self._term_dictionary.load(document.doc_id, _convert_to_store_key(document))
+        if self._text_index is not None:
+            self._build_text_index()
+
+        for document in self._graphs:
+            self._index.add_context(document.doc_id)
+        self._next_removed_id = 1
+        if base is not None:
+            # Removals are replayed first: a quad removed from the file and
+            # added again is also in the triples table.
+            for document in self._removed:
+                quad = (document["s"], document["p"], document["o"], document["c"])
+                self._index.remove(quad[:3], quad[3])
+                self._next_removed_id = max(self._next_removed_id, document.doc_id + 1)
+        self._quad_ids = {}
+        self._next_triple_id = 1
+        for document in self._triples:
+            quad = (document["s"], document["p"], document["o"], document["c"])
+            self._index.add(quad[:3], quad[3])
+            self._quad_ids[quad] = document.doc_id
+            self._next_triple_id = max(self._next_triple_id, document.doc_id + 1)
+        if base is not None:
+            # Graphs removed since the file was written are still in it.
+            graphs = {document.doc_id for document in self._graphs}
+            for c in set(self._index.contexts()) - graphs:
+                self._index.remove_context(c)
+        if self._range_index is not None:
+            self._build_range_index()
+
+    def _migrate_from_v1(self):
+        """Rewrite full store terms in the spo/pos/osp tables as term IDs."""
+        term_dictionary = TermDictionary()
+        terms = []
+        triples = set()
+        for document in self._store.table("spo"):
+            triple = []
+            for term in (document["s"], document["p"], document["o"]):
+                term = _convert_v1_term(term)
+                term_id, created = term_dictionary.add(_convert_to_store_key(term))
+                if created:
+                    terms.append(Document(term, doc_id=term_id))
+                triple.append(term_id)
+            triples.add(tuple(triple))
+
+        documents = [{"s": s, "p": p, "o": o} for s, p, o in triples]
+        self._terms.insert_multiple(terms)
+        for name in ("spo", "pos", "osp"):
+            table = self._store.table(name)
+            table.truncate()
+            table.insert_multiple(documents)
+        self._meta.update({"version": 2}, doc_ids=[1])
+
+    def _migrate_from_v2(self):
+        """Keep a single copy of each triple, dropping the pos and osp tables."""
+        self._triples.insert_multiple(
+            {"s": document["s"], "p": document["p"], "o": document["o"]}
+            for document in self._store.table("spo")
+        )
+        for name in ("spo", "pos", "osp"):
+            self._store.drop_table(name)
+        self._meta.update({"version": 3}, doc_ids=[1])
+
+    def _migrate_from_v3(self):
+        """Put the triples of a store written before contexts in the default graph."""
+        term_dictionary = TermDictionary()
+        for document in self._terms:
+            term_dictionary.load(document.doc_id, _convert_to_store_key(document))
+        term = _convert_to_store_term(DATASET_DEFAULT_GRAPH_ID)
+        context, created = term_dictionary.add(_convert_to_store_key(term))
+        if created:
+            self._terms.insert(Document(term, doc_id=context))
+
+        if len(self._triples):
+            self._triples.update({"c": context})
+            self._graphs.insert(Document({}, doc_id=context))
+        self._meta.update({"version": 4}, doc_ids=[1])
+
+    def _load_snapshot(self) -> bool:
+        """Load the indexes from the snapshot file if it is up to date.
+
+        It is up to date if the storage files have the size and modification
+        time recorded in it or, failing that, if the change counter in the
+        meta table has not moved since it was written.
+
+        :return: Whether the snapshot was loaded.
+        """
+        try:
+            # marshal.load() reads a file in many small reads; read it whole.
+            with open(self._snapshot_path, "rb") as handle:
+                snapshot = marshal.loads(handle.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        if not isinstance(snapshot, dict) or snapshot.get("version") != (
+            _SNAPSHOT_VERSION,
+            _FORMAT_VERSION,
+        ):
+            return False
+        if snapshot["files"] != self._storage_signature():
+            meta = self._meta.get(doc_id=1)
+            if (
+                meta is None
+                or meta.get("version") != _FORMAT_VERSION
+                or meta.get("changes", 0) != snapshot["changes"]
+            ):
+                return False
+        else:
+            self._snapshot_stale = False
+
+        self._changes = snapshot["changes"]
+        self._term_dictionary = TermDictionary.restore(snapshot["terms"])
+        self._index = TripleIndex.restore(snapshot["index"])
+        self._quad_ids = snapshot["quad_ids"]
+        self._next_triple_id = snapshot["next_triple_id"]
+        if self._text_index is not None:
+            if snapshot.get("text") is None:
+                self._build_text_index()
+                self._snapshot_stale = True
+            else:
+                self._text_index = TextIndex.restore(snapshot["text"])
+        if self._range_index is not None:
+            if snapshot.get("ranges") is None:
+                self._build_range_index()
+                self._snapshot_stale = True
+            else:
+                self._range_index = RangeIndex.restore(snapshot["ranges"])
+        return True
+
+    def _build_text_index(self):
+        self._text_index = TextIndex()
+        for term_id, key in self._term_dictionary.items():
+            if key[0] == "Literal":
+                self._text_index.add(term_id, key[1])
+
+    def _build_range_index(self):
+        self._range_index = RangeIndex()
+        for term_id, key in self._term_dictionary.items():
+            if key[0] == "Literal":
+                self._range_index.add_term(term_id, key[2], key[1])
+        for o in list(self._range_index):
+            counts: Dict[int, int] = {}
+            for _, p, _ in self._index.triples((None, None, o)):
+                counts[p] = counts.get(p, 0) + 1
+            for p, count in counts.items():
+                self._range_index.update(p, o, 0, count)
+
+    def _write_snapshot(self):
+        """Write the indexes to the snapshot file, replacing it atomically."""
+        snapshot = {
+            "version": (_SNAPSHOT_VERSION, _FORMAT_VERSION),
+            "files": self._storage_signature(),
+            "changes": self._changes,
+            "terms": self._term_dictionary.snapshot(),
+            "index": self._index.snapshot(),
+            "quad_ids": self._quad_ids,
+            "next_triple_id": self._next_triple_id,
+            "text": None if self._text_index is None else self._text_index.snapshot(),
+            "ranges": (
+                None if self._range_index is None else self._range_index.snapshot()
+            ),
+        }
+        temporary_path = self._snapshot_path + ".tmp"
+        with open(temporary_path, "wb") as handle:
+            handle.write(marshal.dumps(snapshot))
+        os.replace(temporary_path, self._snapshot_path)
+
+    def _storage_signature(self) -> List:
+        """Get the size and modification time of each storage file."""
+        signature = []
+        for path in self._storage_files:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_size, stat.st_mtime_ns))
+        return signature
+
+    @_timed("commit")
+    @_writes
+    def commit(self):
+        """Write the pending changes to storage with a single write."""
+        if any(self._pending.values()):
+            tables = {
+                name: {str(doc_id): document for doc_id, document in changes.items()}
+                for name, changes in self._pending.items()
+                if changes
+            }
+            # The pending changes are kept until they are written, so a
+            # failed write can be retried by the next commit.
+            self._write_tables(tables, {"changes": self._changes + 1})
+            self._changes += 1
+            self._snapshot_stale = True
+            for changes in self._pending.values():
+                changes.clear()
+            self._storage_state = self._storage_signature()
+        self._undo.clear()
+
+    def _write_tables(
+        self, changes: Dict[str, Optional[Dict[str, Any]]], meta: Dict[str, Any]
+    ):
+        """Write changes to the TinyDB tables with a single storage write.
+
+        Storages with an apply() method, e.g. LogStorage, are given just the
+        changes. Others are read and written whole.
+
+        :param changes: Maps table names to {doc_id: document} changes,
+            where a None document removes the document, or to None to clear
+            the table.
+        :param meta: Fields to set in the meta document.
+        """
+        storage = self._store.storage
+        apply = getattr(storage, "apply", None)
+        if apply is not None:
+            document = dict(self._meta.get(doc_id=1))
+            document.update(meta)
+            apply({**changes, "meta": {"1": document}})
+        else:
+            tables = storage.read() or {}
+            tables["meta"]["1"].update(meta)
+            for name, table_changes in changes.items():
+                if table_changes is None:
+                    tables[name] = {}
+                    continue
+                table = tables.setdefault(name, {})
+                for doc_id, document in table_changes.items():
+                    if document is None:
+                        table.pop(doc_id, None)
+                    else:
+                        table[doc_id] = document
+            storage.write(tables)
+        for name in ("meta", *changes):
+            self._store.table(name).clear_cache()
+
+    @_writes
+    def rollback(self):
+        """Discard the pending changes and revert the in-memory indexes."""
+        for operation, *arguments in reversed(self._undo):
+            if operation == "add":
+                triple, context, doc_id = arguments
+                self._index_remove(triple, context)
+                del self._quad_ids[triple + (context,)]
+            elif operation == "remove":
+                triple, context, doc_id = arguments
+                self._index_add(triple, context)
+                self._quad_ids[triple + (context,)] = doc_id
+            elif operation == "remove_base":
+                triple, context, doc_id = arguments
+                self._index_add(triple, context)
+            elif operation == "add_graph":
+                self._index.remove_context(*arguments)
+            else:
+                self._index.add_context(*arguments)
+        for term_id, term in self._pending["terms"].items():
+            self._term_dictionary.discard(term_id)
+            if self._text_index is not None and term["type"] == "Literal":
+                self._text_index.discard(term_id, term["value"])
+            if self._range_index is not None:
+                self._range_index.discard_term(term_id)
+        for changes in self._pending.values():
+            changes.clear()
+        self._undo.clear()
+
+    @contextmanager
+    def bulk_load(self):
+        """Buffer writes until the outermost bulk_load() block exits.
+
+        Triples added inside the block are indexed, and so visible to
+        triples(), straight away. Their documents are written to storage in
+        one batch on exit instead of one write per triple. Without
+        autocommit, the batch is left for commit().
+        """
+        with self._writing():
+            self._bulk_load_depth += 1
+            try:
+                yield self
+            finally:
+                self._bulk_load_depth -= 1
+                if not self._bulk_load_depth and self._autocommit:
+                    self.commit()
+
+    @contextmanager
+    def _merging(self) -> Iterator[None]:
+        """Hold the write lock for the whole of a write made of many
+        additions, e.g. an import.
+
+        With autocommit, and outside bulk_load(), the additions are written
+        to storage in one batch at the end, or rolled back if any of them,
+        or the commit, fails.
+        """
+        with self._writing():
+            transaction = self._autocommit and not self._bulk_load_depth
+            self._bulk_load_depth += 1
+            try:
+                try:
+                    yield
+                finally:
+                    self._bulk_load_depth -= 1
+                if transaction:
+                    self.commit()
+            except BaseException:
+                if transaction:
+                    self.rollback()
+                raise
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Hold the write lock and, if enabled, the file lock."""
+        self._begin_write()
+        try:
+            yield
+        finally:
+            self._end_write()
+
+    def _begin_write(self):
+        """Take the write lock and, if enabled, the file lock.
+
+        The store is reloaded first if another process changed its files
+        while this one did not hold the file lock.
+        """
+        self._lock.acquire_write()
+        file_lock = self._file_lock
+        if file_lock is not None and not file_lock.locked:
+            try:
+                file_lock.acquire()
+                try:
+                    self._refresh_if_changed()
+                except BaseException:
+                    file_lock.release()
+                    raise
+            except BaseException:
+                self._lock.release_write()
+                raise
+        self._write_depth += 1
+
+    def _end_write(self):
+        """Release what _begin_write() took, keeping the file lock until the
+        transaction ends."""
+        self._write_depth -= 1
+        file_lock = self._file_lock
+        if (
+            not self._write_depth
+            and file_lock is not None
+            and file_lock.locked
+            and not self._undo
+        ):
+            file_lock.release()
+        self._lock.release_write()
+
+    def refresh(self):
+        """Reload the store if another process changed its files.
+
+        With "file_lock", writes already do this before they start.
+        """
+        with self._writing():
+            self._refresh_if_changed()
+
+    def _refresh_if_changed(self):
+        if self._storage_signature() == self._storage_state:
+            return
+        if self._undo:
+            raise ValueError("Commit or roll back the transaction before reloading.")
+        # The old binary file, if any, stays mapped for readers still using
+        # it, and is unmapped once they are gone.
+        self._store.close()
+        self._connect()
+
+    def _connect(self):
+        """Open the TinyDB database and load the indexes."""
+        raise NotImplementedError()
+
     def close(self, commit_pending_transaction: bool = False):
-        if self._store is not None:
-            del self._store
+        # Before taking the lock, which the executor's work may be waiting for.
+        self._shutdown_executor()
+        with self._lock.write():
+            if self._store is not None:
+                if self._undo or any(self._pending.values()):
+                    if commit_pending_transaction:
+                        self.commit()
+                    else:
+                        self.rollback()
+                self._store.close()
+                del self._store
+                if self._snapshot_path is not None and self._snapshot_stale:
+                    # Another process may have changed the files since.
+                    if self._file_lock is None or (
+                        self._storage_signature() == self._storage_state
+                    ):
+                        self._write_snapshot()
+            if self._file_lock is not None and self._file_lock.locked:
+                self._file_lock.release()
+            if self._base is not None:
+                self._base.close()
+            self._term_dictionary = None
+            self._index = None
+            self._quad_ids = None
+            self._base = None
 
     def gc(self):
         pass
@@ -52,6 +733,8 @@ class _BaseTinyDBStore(Store, ABC):
         """Delete the TinyDB database file."""
         raise NotImplementedError("TinyDBStore.destroy() is not implemented yet.")
 
+    @_timed("add")
+    @_writes
     def add(
         self,
         triple: Tuple[Union[URIRef, BNode], URIRef, Union[URIRef, BNode, Literal]],
@@ -61,37 +744,231 @@ class _BaseTinyDBStore(Store, ABC):
         if quoted:
             raise ValueError("TinyDBStore is not formula-aware.")
 
-        # TODO: Make store context-aware.
+        # Only add statement to the context if it is not already there.
+        s, p, o = (self._encode(node) for node in triple)
+        c = self._add_context(context)
+        if self._add_quad((s, p, o), c):
+            if self._autocommit and not self._bulk_load_depth:
+                self.commit()
 
-        s, p, o = triple
+            super(_BaseTinyDBStore, self).add(triple, context)
+
+    def _add_quad(self, triple: Tuple[int, int, int], c: int) -> bool:
+        """Index a triple in a context and queue its document.
+
+        :return: True if the triple was not already in the context.
+        """
+        if not self._index_add(triple, c):
+            return False
+        doc_id = self._next_triple_id
+        self._next_triple_id += 1
+        self._quad_ids[triple + (c,)] = doc_id
+        self._undo.append(("add", triple, c, doc_id))
+        self._pending["triples"][doc_id] = dict(zip("spoc", triple + (c,)))
+        return True
+
+    def _index_add(self, triple: Tuple[int, int, int], c: int) -> bool:
+        """Add a triple in a context to the indexes.
+
+        :return: True if the triple was not already in the context.
+        """
+        if self._range_index is None or triple[2] not in self._range_index:
+            return self._index.add(triple, c)
+        pattern = (None,) + triple[1:]
+        before = self._index.cardinality(pattern)
+        added = self._index.add(triple, c)
+        self._range_index.update(*triple[1:], before, self._index.cardinality(pattern))
+        return added
 
-        s_type = _convert_to_store_term(s)
-        p_type = _convert_to_store_term(p)
-        o_type = _convert_to_store_term(o)
+    def _index_remove(self, triple: Tuple[int, int, int], c: int):
+        """Remove a triple in a context from the indexes."""
+        if self._range_index is None or triple[2] not in self._range_index:
+            self._index.remove(triple, c)
+            return
+        pattern = (None,) + triple[1:]
+        before = self._index.cardinality(pattern)
+        self._index.remove(triple, c)
+        self._range_index.update(*triple[1:], before, self._index.cardinality(pattern))
 
-        # Only add statement to store if it does not already exist.
-        statement_exists = self._spo.contains(
-            (Query().s == _convert_to_store_term(s))
-            & (Query().p == _convert_to_store_term(p))
-            & (Query().o == _convert_to_store_term(o))
+    @_timed("addN")
+    def addN(self, quads: Iterable[Tuple]):
+        with self.bulk_load():
+            super(_BaseTinyDBStore, self).addN(quads)
+
+    def import_files(
+        self,
+        paths: Iterable[Union[str, os.PathLike]],
+        format: Optional[str] = None,
+        context: Union[None, URIRef, BNode, Graph] = None,
+        workers: Optional[int] = None,
+    ) -> int:
+        """Parse RDF files in worker processes and add their triples.
+
+        Workers send back the distinct terms of each file and its quads as
+        positions in them. Terms are then encoded once per file and the
+        quads indexed. The write lock is held for the whole import. With
+        autocommit, everything is written to storage in one batch at the
+        end, or nothing if a file fails to parse. No TripleAddedEvent is
+        dispatched.
+
+        :param paths: Paths of the files.
+        :param format: RDFLib parser name. If None, it is guessed from each
+            file name.
+        :param context: Graph of the triples of files without named graphs,
+            and of the default graph of the others. If None, the default
+            graph.
+        :param workers: Number of worker processes. None uses one per CPU
+            and 1 parses in this process.
+        :return: The number of triples added to a graph they were not in.
+        """
+        added = 0
+        with self._merging():
+            for terms, quads in _parse_files(paths, format, workers or os.cpu_count()):
+                term_ids = [self._add_term(key) for key in terms]
+                default = self._add_context(context)
+                for s, p, o, g in quads:
+                    if g is None:
+                        c = default
+                    else:
+                        c = term_ids[g]
+                        self._add_context_id(c)
+                    triple = (term_ids[s], term_ids[p], term_ids[o])
+                    added += self._add_quad(triple, c)
+        return added
+
+    def dump(
+        self,
+        fileobj: IO,
+        format: str = "nt",
+        context: Union[None, URIRef, BNode, Graph] = None,
+    ) -> int:
+        """Write the store as N-Triples or N-Quads, straight from the stored
+        terms, without creating RDFLib terms.
+
+        Statements are read from the indexes in batches and written as they
+        are, so memory use does not grow with the store.
+
+        :param fileobj: Text or binary file object. Binary ones get UTF-8.
+        :param format: "nt" (or "ntriples") writes each distinct triple
+            once. "nquads" writes each triple once per graph, without a
+            graph for the default graph.
+        :param context: Only write the statements in this graph.
+        :return: The number of statements written.
+        """
+        if format not in _QUAD_FORMATS:
+            raise ValueError(f'Expected "nt" or "nquads". Got "{format}".')
+        binary = isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase))
+
+        with self._lock.read():
+            c = self._lookup_context(context)
+            default = self._lookup(DATASET_DEFAULT_GRAPH_ID)
+        if c is False:
+            return 0
+        index = self._index
+        # Term IDs are never reused while the store is open, so they can key
+        # the cache.
+        term = lru_cache(maxsize=_TERM_CACHE_SIZE)(
+            lambda term_id: format_term(self._term_dictionary.decode(term_id))
         )
-        if not statement_exists:
-            self._spo.insert(
-                {str(s): {str(p): str(o)}, "s": s_type, "p": p_type, "o": o_type}
-            )
-            self._pos.insert(
-                {str(p): {str(o): str(s)}, "s": s_type, "p": p_type, "o": o_type}
-            )
-            self._osp.insert(
-                {str(o): {str(s): str(p)}, "s": s_type, "p": p_type, "o": o_type}
-            )
 
-            super(_BaseTinyDBStore, self).add(triple, context)
+        def lines() -> Iterator[str]:
+            for triple in index.triples((None, None, None), c):
+                statement = f"{term(triple[0])} {term(triple[1])} {term(triple[2])}"
+                if not _QUAD_FORMATS[format]:
+                    yield statement + " .\n"
+                    continue
+                for triple_context in (
+                    (c,) if c is not None else index.triple_contexts(triple)
+                ):
+                    if triple_context == default:
+                        yield statement + " .\n"
+                    else:
+                        yield f"{statement} {term(triple_context)} .\n"
 
-    def remove(self, triple, context=None):
-        raise NotImplementedError()
+        count = 0
+        batch = []
+        for line in chain(self._read_batches(lines()), [None]):
+            if line is not None:
+                batch.append(line)
+                if len(batch) < _DUMP_BATCH_SIZE:
+                    continue
+            text = "".join(batch)
+            fileobj.write(text.encode("utf-8") if binary else text)
+            count += len(batch)
+            batch.clear()
+        return count
 
-    def triples(
+    def load(
+        self,
+        fileobj: IO,
+        context: Union[None, URIRef, BNode, Graph] = None,
+    ) -> int:
+        """Add the statements of an N-Triples or N-Quads file, read straight
+        into stored terms, without creating RDFLib terms.
+
+        Lines are read and parsed in batches, each then added. The write
+        lock is held for the whole load. Blank nodes get new labels, unique
+        to this load, as RDFLib's parsers give them. With autocommit,
+        everything is written to storage in one batch at the end, or
+        nothing if a line is invalid. No TripleAddedEvent is dispatched.
+
+        :param fileobj: Text or binary file object. Binary ones are read as
+            UTF-8.
+        :param context: Graph of the triples, and of the N-Quads statements
+            without a graph. If None, the default graph.
+        :return: The number of triples added to a graph they were not in.
+        """
+        # N-Triples forms of terms to their store keys.
+        keys = lru_cache(maxsize=_TERM_CACHE_SIZE)(parse_term)
+        bnodes: Dict[str, str] = {}
+        lines = iter(fileobj)
+        line_number = 0
+        added = 0
+        with self._merging():
+            while True:
+                chunk = list(islice(lines, _LOAD_BATCH_SIZE))
+                if not chunk:
+                    break
+                batch = []
+                for line in chunk:
+                    line_number += 1
+                    if isinstance(line, bytes):
+                        line = line.decode("utf-8")
+                    try:
+                        statement = parse_statement(line)
+                        if statement is not None:
+                            batch.append(
+                                [
+                                    self._load_key(keys(term), bnodes)
+                                    for term in statement
+                                ]
+                            )
+                    except ValueError as error:
+                        raise ValueError(f"Line {line_number}: {error}") from error
+                default = self._add_context(context)
+                for statement in batch:
+                    term_ids = [self._add_term(key) for key in statement]
+                    if len(term_ids) == 3:
+                        c = default
+                    else:
+                        c = term_ids[3]
+                        self._add_context_id(c)
+                    added += self._add_quad(tuple(term_ids[:3]), c)
+        return added
+
+    @staticmethod
+    def _load_key(key: Tuple[str, str, str, str], bnodes: Dict[str, str]) -> Tuple:
+        """Give a blank node key the label its label has in this load."""
+        if key[0] != "BNode":
+            return key
+        label = bnodes.get(key[1])
+        if label is None:
+            label = bnodes[key[1]] = str(BNode())
+        return "BNode", label, "", ""
+
+    @_timed("remove")
+    @_writes
+    def remove(
         self,
         triple_pattern: Tuple[
             Union[URIRef, BNode, None],
@@ -100,57 +977,452 @@ class _BaseTinyDBStore(Store, ABC):
         ],
         context=None,
     ):
-        s, p, o = triple_pattern
-
-        if s is not None:
-            if p is not None:
-                # s, p, o
-                if o is not None:
-                    documents = self._spo.search(Query()[str(s)][str(p)] == str(o))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
-                # s, p, None
+        """Remove the triples matching the pattern. None is a wildcard.
+
+        Matches are found through the indexes and removed with one storage
+        write, or left pending until commit() without autocommit.
+
+        :param context: Remove the triples from this graph only. If None,
+            remove them from every graph.
+        """
+        pattern = self._lookup_pattern(triple_pattern)
+        c = self._lookup_context(context)
+        if pattern is None or c is False:
+            return
+
+        for triple in list(self._index.triples(pattern, c)):
+            contexts = [c] if c is not None else self._index.triple_contexts(triple)
+            for triple_context in contexts:
+                self._index_remove(triple, triple_context)
+                quad = triple + (triple_context,)
+                doc_id = self._quad_ids.pop(quad, None)
+                if doc_id is not None:
+                    self._undo.append(("remove", triple, triple_context, doc_id))
+                    self._pending["triples"][doc_id] = None
                 else:
-                    documents = self._spo.search(Query()[str(s)][str(p)].matches(".*"))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
+                    # The quad is in the binary file.
+                    doc_id = self._next_removed_id
+                    self._next_removed_id += 1
+                    self._undo.append(("remove_base", triple, triple_context, doc_id))
+                    self._pending["removed"][doc_id] = dict(zip("spoc", quad))
+            super(_BaseTinyDBStore, self).remove(
+                tuple(self._decode(term_id) for term_id in triple), context
+            )
+
+        if self._autocommit and not self._bulk_load_depth:
+            self.commit()
+
+    def triples(
+        self,
+        triple_pattern: Tuple[
+            Union[URIRef, BNode, None],
+            Union[URIRef, None],
+            Union[URIRef, BNode, Literal, None],
+        ],
+        context=None,
+    ):
+        """Yield the triples matching the pattern and their graphs.
+
+        Matches are read from the indexes in batches, each under the read
+        lock, so writes from any thread can go ahead between them.
+        """
+        with self._lock.read():
+            pattern = self._lookup_pattern(triple_pattern)
+            c = self._lookup_context(context)
+        if pattern is None or c is False:
+            return
+
+        if self._instrumentation is not None:
+            yield from self._instrumented_triples(pattern, c)
+            return
+
+        yield from self._read_batches(
+            self._decode_triple(triple) for triple in self._index.triples(pattern, c)
+        )
+
+    def _instrumented_triples(self, pattern: Tuple, c: Optional[int]) -> Iterator:
+        """triples() recording the time spent in it, excluding the caller's,
+        and the matches scanned and yielded."""
+        shape = "".join(
+            "?" if term is None else "spo"[i] for i, term in enumerate(pattern)
+        )
+        # Patterns with bound terms in one graph are matched in all of them,
+        # then filtered.
+        filtered = c is not None and pattern != (None, None, None)
+        # Scanned and yielded matches.
+        counts = [0, 0]
+
+        def matches() -> Iterator:
+            for triple in self._index.triples(pattern, None if filtered else c):
+                counts[0] += 1
+                if filtered and c not in self._index.triple_contexts(triple):
+                    continue
+                counts[1] += 1
+                yield self._decode_triple(triple)
+
+        results = self._read_batches(matches())
+        seconds = 0.0
+        start = perf_counter()
+        try:
+            for result in results:
+                seconds += perf_counter() - start
+                yield result
+                start = perf_counter()
+            seconds += perf_counter() - start
+        finally:
+            self._instrumentation.record("triples " + shape, seconds, *counts)
+
+    def _decode_triple(self, triple: Tuple[int, int, int]) -> Tuple:
+        return tuple(self._decode(term_id) for term_id in triple), self._context_graphs(
+            self._index.triple_contexts(triple)
+        )
+
+    def _read_batches(self, iterator: Iterator) -> Iterator:
+        """Iterate holding the read lock while each batch of items is made.
+
+        Batches start at one item and double, so a caller that stops early,
+        e.g. ASK, does not make more than about twice what it takes.
+        """
+        size = 1
+        while True:
+            with self._lock.read():
+                batch = list(islice(iterator, size))
+            yield from batch
+            if len(batch) < size:
+                return
+            size = min(size * 2, _READ_BATCH_SIZE)
+
+    def contexts(self, triple=None) -> Iterator[Graph]:
+        """Yield the graphs in the store, or the graphs holding the triple."""
+        with self._lock.read():
+            if triple is None:
+                contexts = self._index.contexts()
             else:
-                # s, None, o
-                if o is not None:
-                    documents = self._osp.search(Query()[str(o)][str(s)].matches(".*"))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
-                # s, None, None
-                else:
-                    documents = self._spo.search(Query()[str(s)].all([]))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
-        else:
-            if p is not None:
-                # None, p, o
-                if o is not None:
-                    documents = self._pos.search(Query()[str(p)][str(o)].matches(".*"))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
-                # None, p, None
-                else:
-                    documents = self._pos.search(Query()[str(p)].all([]))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
+                pattern = self._lookup_pattern(triple)
+                if pattern is None:
+                    return
+                contexts = self._index.contexts(pattern)
+        yield from self._read_batches(
+            Graph(store=self, identifier=self._decode(c)) for c in contexts
+        )
+
+    def _context_graphs(self, contexts: Iterable[int]) -> Iterator[Graph]:
+        for c in contexts:
+            yield Graph(store=self, identifier=self._decode(c))
+
+    @_writes
+    def add_graph(self, graph: Graph):
+        # Registered as named, even if a blank node.
+        self._add_context_id(self._encode(graph.identifier))
+        if self._autocommit and not self._bulk_load_depth:
+            self.commit()
+
+    @_writes
+    def remove_graph(self, graph: Graph):
+        c = self._lookup(graph.identifier)
+        if c is None or not self._index.has_context(c):
+            return
+        with self.bulk_load():
+            self.remove((None, None, None), graph)
+            self._index.remove_context(c)
+            self._undo.append(("remove_graph", c))
+            self._pending["graphs"][c] = None
+
+    def _add_context(self, context: Union[None, URIRef, BNode, Graph]) -> int:
+        """Get the term ID of a context, registering the graph if it is new.
+
+        Triples added without a context go to the default graph.
+        """
+        c = self._encode(self._graph_identifier(context))
+        self._add_context_id(c)
+        return c
+
+    def _graph_identifier(
+        self, context: Union[None, URIRef, BNode, Graph]
+    ) -> Union[URIRef, BNode]:
+        """Get the identifier of the graph of a context.
+
+        That is the default graph for no context and, with "blank_graphs"
+        set to "default", for a blank node no graph was registered under.
+        """
+        identifier = getattr(context, "identifier", context)
+        if identifier is None:
+            return DATASET_DEFAULT_GRAPH_ID
+        if isinstance(identifier, BNode) and self._blank_graphs_default:
+            c = self._lookup(identifier)
+            if c is None or not self._index.has_context(c):
+                return DATASET_DEFAULT_GRAPH_ID
+        return identifier
+
+    def _add_context_id(self, c: int):
+        """Register the graph of a context term ID if it is new."""
+        if self._index.add_context(c):
+            self._undo.append(("add_graph", c))
+            self._pending["graphs"][c] = {}
+
+    def _lookup_context(
+        self, context: Union[None, URIRef, BNode, Graph]
+    ) -> Union[None, bool, int]:
+        """Get the term ID of a context.
+
+        :return: None for no context, or False if the context was never
+            stored, as nothing can match.
+        """
+        if context is None:
+            return None
+        term_id = self._lookup(self._graph_identifier(context))
+        if term_id is None:
+            return False
+        return term_id
+
+    def _lookup_pattern(self, triple_pattern: Tuple) -> Optional[Tuple]:
+        """Get the term ID pattern for a triple pattern.
+
+        :return: None if a bound term was never stored, as nothing can match.
+        """
+        pattern = []
+        for node in triple_pattern:
+            if node is None:
+                pattern.append(None)
             else:
-                # None, None, o
-                if o is not None:
-                    documents = self._osp.search(Query()[str(o)].all([]))
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
-                # None, None, None
-                else:
-                    documents = self._spo.all()
-                    for document in documents:
-                        yield _convert_document_to_rdflib_result(document)
+                term_id = self._lookup(node)
+                if term_id is None:
+                    return None
+                pattern.append(term_id)
+        return tuple(pattern)
+
+    def _lookup(self, node: Union[URIRef, BNode, Literal]) -> Optional[int]:
+        """Get the term ID of a node, or None if it was never stored."""
+        return self._term_dictionary.lookup(self._store_key(node))
+
+    def _encode(self, node: Union[URIRef, BNode, Literal]) -> int:
+        """Get the term ID of a node, queueing a new terms document if needed."""
+        return self._add_term(self._store_key(node))
+
+    def _add_term(self, key: Tuple[str, str, str, str]) -> int:
+        """Get the term ID of a store key, queueing a new terms document if
+        needed."""
+        term_id, created = self._term_dictionary.add(key)
+        if created:
+            self._pending["terms"][term_id] = _convert_key_to_store_term(key)
+            if key[0] == "Literal":
+                if self._text_index is not None:
+                    self._text_index.add(term_id, key[1])
+                if self._range_index is not None:
+                    self._range_index.add_term(term_id, key[2], key[1])
+        return term_id
+
+    def _decode(self, term_id: int) -> Union[URIRef, BNode, Literal]:
+        return self._decode_key(self._term_dictionary.decode(term_id))
+
+    def _store_key(self, node: Union[URIRef, BNode, Literal]) -> Tuple:
+        # Literal equality ignores the case of language tags and, for literals
+        # that are not normalised, the lexical form of equal values. Literals
+        # cannot key the cache, so they are converted every time.
+        if isinstance(node, Literal):
+            return _convert_node_to_store_key(node)
+        return self._encode_key(node)
+
+    def term_cache_info(self) -> Dict[str, Any]:
+        """Get the hits, misses and sizes of the term caches.
+
+        :return: The functools cache_info() of the "encode" (IRIs and blank
+            nodes to stored terms) and "decode" (stored terms to RDFLib
+            terms) caches.
+        """
+        return {
+            "encode": self._encode_key.cache_info(),
+            "decode": self._decode_key.cache_info(),
+        }
+
+    @_reads
+    def search(
+        self,
+        text: str,
+        prefix: bool = False,
+        context: Union[None, URIRef, BNode, Graph] = None,
+        limit: Optional[int] = None,
+    ) -> List[Literal]:
+        """Find the literals whose value contains a text, ignoring case.
+
+        Uses the text index if the store was opened with "text_index",
+        otherwise checks every literal term.
+
+        :param text: Text to look for.
+        :param prefix: Only find the literals whose value starts with the
+            text, e.g. to complete what a user is typing.
+        :param context: Only find literals that are objects in this graph.
+            None finds the literals that are objects in any graph.
+        :param limit: Largest number of literals to return.
+        """
+        c = self._lookup_context(context)
+        if c is False:
+            return []
+        literals = []
+        for term_id in self._search_ids(text, prefix):
+            if len(literals) == limit:
+                break
+            if self._index.cardinality((None, None, term_id), c):
+                literals.append(self._decode(term_id))
+        return literals
+
+    def value_range(
+        self,
+        predicate: URIRef,
+        low: Optional[Literal] = None,
+        high: Optional[Literal] = None,
+        context: Union[None, URIRef, BNode, Graph] = None,
+        include_low: bool = True,
+        include_high: bool = True,
+    ) -> Iterator[Tuple]:
+        """Get an iterator over the triples of a predicate whose object is in
+        a range of values, and their graphs, in order of value.
+
+        The bounds and objects are numeric, date or dateTime literals, and
+        only objects of the same kind as the bounds match. dateTimes with
+        and without a timezone are different kinds. Requires the store to
+        be opened with "range_index".
+
+        :param low: Lowest value, or None for no lower bound. Python values
+            are converted to literals.
+        :param high: Highest value, or None for no upper bound. At least
+            one of low and high must be given.
+        :param context: Only yield triples in this graph.
+        :param include_low: Whether objects equal to low match.
+        :param include_high: Whether objects equal to high match.
+        :raises ValueError: If the store has no range index, or the bounds
+            are missing or not of one kind.
+        """
+        if self._range_index is None:
+            raise ValueError('Open the store with "range_index" to query ranges.')
+        if low is None and high is None:
+            raise ValueError("Expected a low bound, a high bound or both.")
+        bounds = []
+        for bound in (low, high):
+            if bound is not None:
+                if not isinstance(bound, Literal):
+                    bound = Literal(bound)
+                value = literal_value(str(bound.datatype), str(bound))
+                if value is None:
+                    raise ValueError(
+                        f"Expected a numeric, date or dateTime literal. Got {bound!r}."
+                    )
+                bound = value
+            bounds.append(bound)
+        kinds = {bound[0] for bound in bounds if bound is not None}
+        if len(kinds) != 1:
+            raise ValueError("Expected bounds of the same kind of value.")
+        return self._value_range(
+            predicate, kinds.pop(), *bounds, context, include_low, include_high
+        )
+
+    def _value_range(
+        self,
+        predicate: URIRef,
+        kind: str,
+        low: Optional[Tuple[str, Any]],
+        high: Optional[Tuple[str, Any]],
+        context: Union[None, URIRef, BNode, Graph],
+        include_low: bool,
+        include_high: bool,
+    ) -> Iterator[Tuple]:
+        with self._lock.read():
+            p = self._lookup(predicate)
+            c = self._lookup_context(context)
+            if p is None or c is False:
+                return
+            objects = self._range_index.objects(
+                p,
+                kind,
+                None if low is None else sort_key(*low),
+                None if high is None else sort_key(*high),
+            )
+
+        def matches() -> Iterator[Tuple[int, int, int]]:
+            for o in objects:
+                key = self._term_dictionary.decode(o)
+                value = literal_value(key[2], key[1])[1]
+                if low is not None and (
+                    value < low[1] or value == low[1] and not include_low
+                ):
+                    continue
+                if high is not None and (
+                    value > high[1] or value == high[1] and not include_high
+                ):
+                    continue
+                yield from self._index.triples((None, p, o), c)
+
+        yield from self._read_batches(self._decode_triple(t) for t in matches())
+
+    def _search_ids(
+        self, text: str, prefix: bool, candidates: Optional[Iterable[int]] = None
+    ) -> Iterator[int]:
+        """Yield the IDs of the literal terms whose value contains the text,
+        or starts with it if prefix is True, ignoring case.
+
+        :param candidates: IDs of the terms to check, by default those the
+            text index finds or, without one, every literal term.
+        """
+        if candidates is None and self._text_index is None:
+            candidates = (
+                term_id
+                for term_id, key in self._term_dictionary.items()
+                if key[0] == "Literal"
+            )
+        elif candidates is None:
+            candidates = sorted(self._text_index.candidates(text, prefix))
+        text = text.casefold()
+        for term_id in candidates:
+            value = self._term_dictionary.decode(term_id)[1].casefold()
+            if value.startswith(text) if prefix else text in value:
+                yield term_id
+
+    @_reads
+    def __len__(self, context: Union[None, URIRef, BNode, Graph] = None):
+        c = self._lookup_context(context)
+        if c is False:
+            return 0
+        return self._index.count(c)
+
+    @_reads
+    def cardinality(
+        self,
+        triple_pattern: Tuple[
+            Union[URIRef, BNode, None],
+            Union[URIRef, None],
+            Union[URIRef, BNode, Literal, None],
+        ],
+        context: Union[None, URIRef, BNode, Graph] = None,
+    ) -> int:
+        """Get the number of triples matching a pattern without decoding them.
+
+        :param triple_pattern: Triple pattern with None wildcards.
+        :param context: Only count triples in this graph. None counts the
+            distinct triples across all graphs.
+        """
+        pattern = self._lookup_pattern(triple_pattern)
+        c = self._lookup_context(context)
+        if pattern is None or c is False:
+            return 0
+        return self._index.cardinality(pattern, c)
+
+    @_reads
+    def stats(self) -> Dict[str, Any]:
+        """Get the statistics kept up to date by every change to the store.
 
-    def __len__(self, context: str = None):
-        return len(self._spo)
+        :return: A dict of the number of distinct "triples" across graphs,
+            of distinct "subjects", "predicates" and "objects", and of the
+            triples of each predicate ("predicate_counts") and in each graph
+            ("graph_counts"), keyed by term.
+        """
+        stats = self._index.stats()
+        stats["predicate_counts"] = {
+            self._decode(p): count for p, count in stats["predicate_counts"].items()
+        }
+        stats["graph_counts"] = {
+            self._decode(c): count for c, count in stats.pop("context_counts").items()
+        }
+        return stats
 
     def query(self, query, initNs, initBindings, queryGraph, **kwargs):
         super(_BaseTinyDBStore, self).query(
@@ -178,25 +1450,149 @@ class _BaseTinyDBStore(Store, ABC):
 
 
 class TinyDBStore(_BaseTinyDBStore):
-    def open(self, configuration: str, create: bool = False) -> Optional[int]:
-        if configuration is None:
+    def open(
+        self, configuration: Union[str, Mapping[str, Any]], create: bool = False
+    ) -> Optional[int]:
+        """Open the TinyDB database.
+
+        :param configuration: Path to the database file, or a mapping with
+            the keys "path", "storage" (a TinyDB Storage class, or "json",
+            the default, "log" for LogStorage or "binary"), "storage_options"
+            (a mapping of keyword arguments for the storage) and the store
+            settings described in _open_tables(). The "binary" storage keeps
+            the store in a memory-mapped file at path + ".bin", rewritten by
+            compact(), and the changes since in a LogStorage database.
+            Unless "index_snapshot" is False, the other storages save the
+            in-memory indexes to path + ".index" on close() and load them
+            from there on open() while the database file is unchanged.
+            With "file_lock", writes hold an advisory lock on path + ".lock"
+            from the first write of a transaction to its end, and the store
+            is reloaded before a write if another process changed it.
+        """
+        configuration = _parse_configuration(configuration)
+        path = configuration.get("path")
+        if path is None:
             raise ValueError("TinyDB store must have a configuration string.")
-        self._store = TinyDB(configuration)
-        self._spo = self._store.table("spo")
-        self._pos = self._store.table("pos")
-        self._osp = self._store.table("osp")
+
+        with self._lock.write():
+            self._configuration = configuration
+            self._instrument(configuration)
+            self._file_lock = None
+            if configuration.get("file_lock", False):
+                self._file_lock = FileLock(os.fspath(path) + ".lock")
+                with self._file_lock:
+                    self._connect()
+            else:
+                self._connect()
         return store.VALID_STORE
 
+    def _connect(self):
+        configuration = self._configuration
+        path = configuration["path"]
+        storage = configuration.get("storage", "json")
+        base = None
+        self._snapshot_path = None
+        if storage == "binary":
+            base_path = os.fspath(path) + ".bin"
+            if not os.path.exists(base_path):
+                write_binary(base_path, 0, (), (), {})
+            base = BinaryFile(base_path)
+            storage = "log"
+        if isinstance(storage, str):
+            if storage not in _STORAGES:
+                raise ValueError(f'Unknown TinyDB storage "{storage}".')
+            storage = _STORAGES[storage]
+
+        options = dict(configuration.get("storage_options", {}))
+        if self._file_lock is not None and storage is LogStorage:
+            # Compacting in the background would outlast the file lock.
+            options["background_compaction"] = False
+
+        self._store = TinyDB(path, storage=self._timed_storage(storage), **options)
+        path = os.fspath(path)
+        self._storage_files = [path, path + ".log", path + ".log.old"]
+        if base is not None:
+            self._storage_files.append(base.path)
+        elif configuration.get("index_snapshot", True):
+            self._snapshot_path = path + ".index"
+        self._open_tables(configuration, base)
+
+    @_writes
+    def compact(self):
+        """Compact the storage if it supports it, e.g. LogStorage.
+
+        With the binary storage, the changes since the binary file was
+        written are first folded into a new one. Iterators started before
+        keep reading the old file, except on Windows, where it has to be
+        unmapped first: there they must not be resumed after.
+        """
+        if self._base is not None:
+            self._compact_base()
+        compact = getattr(self._store.storage, "compact", None)
+        if compact is not None:
+            compact()
+        self._storage_state = self._storage_signature()
+
+    def _compact_base(self):
+        if self._undo:
+            raise ValueError("Commit or roll back the transaction before compacting.")
+        index = self._index
+        path = self._base.path
+        generation = self._base.generation + 1
+        terms = list(self._term_dictionary.items())
+        quads = [
+            triple + (c,)
+            for triple in index.triples((None, None, None))
+            for c in index.triple_contexts(triple)
+        ]
+        context_counts = {c: index.count(c) for c in index.contexts()}
+        # Elsewhere, the current file stays mapped for readers still using
+        # it, and is unmapped once they are gone. Windows does not allow
+        # replacing a mapped file.
+        unmap = os.name == "nt"
+        if unmap:
+            self._base.close()
+        try:
+            write_binary(path, generation, terms, quads, context_counts)
+        except BaseException:
+            if unmap:
+                # The current file is still in place.
+                self._load_indexes(BinaryFile(path))
+            raise
+
+        # The changes are now in the file: clear them with a single write.
+        self._write_tables(
+            {"terms": None, "triples": None, "removed": None}, {"base": generation}
+        )
+        self._load_indexes(BinaryFile(path))
+
 
 class TinyDBMemoryStore(_BaseTinyDBStore):
-    def open(self, configuration: Optional[str], create: bool = False) -> Optional[int]:
-        self._store = TinyDB(storage=MemoryStorage)
-        self._spo = self._store.table("spo")
-        self._pos = self._store.table("pos")
-        self._osp = self._store.table("osp")
+    def open(
+        self,
+        configuration: Union[None, str, Mapping[str, Any]],
+        create: bool = False,
+    ) -> Optional[int]:
+        """Open an in-memory TinyDB database.
+
+        :param configuration: None, or a mapping of the store settings
+            described in _open_tables().
+        """
+        configuration = _parse_configuration(configuration)
+        with self._lock.write():
+            self._instrument(configuration)
+            self._store = TinyDB(storage=self._timed_storage(MemoryStorage))
+            self._open_tables(configuration)
         return store.VALID_STORE
 
 
+def _parse_configuration(configuration) -> Dict[str, Any]:
+    """Normalise a path or a mapping of settings into a configuration dict."""
+    if isinstance(configuration, Mapping):
+        return dict(configuration)
+    return {"path": configuration}
+
+
 def _convert_to_store_term(node: Union[URIRef, BNode, Literal]) -> Dict:
     term = {}
 
@@ -210,7 +1606,7 @@ def _convert_to_store_term(node: Union[URIRef, BNode, Literal]) -> Dict:
         term["type"] = "Literal"
         term["datatype"] = str(node.datatype) if node.datatype else ""
         term["lang"] = node.language if node.language else ""
-        term["value"] = str(node.value)
+        term["value"] = str(node)
     else:
         raise ValueError(f'Expected URIRef, BNode or Literal. Got "{type(node)}".')
     return term
@@ -231,9 +1627,123 @@ def _convert_to_rdflib_term(node: dict) -> Union[URIRef, BNode, Literal]:
         raise ValueError(f'Unexpected store term type: "{node["type"]}".')
 
 
-def _convert_document_to_rdflib_result(document: Document, context=None):
-    return (
-        _convert_to_rdflib_term(document["s"]),
-        _convert_to_rdflib_term(document["p"]),
-        _convert_to_rdflib_term(document["o"]),
-    ), context
+def _convert_v1_term(term: Dict) -> Dict:
+    """Get the store term of a term written by the first version of the store.
+
+    It kept the str() of the Python value of typed literals, e.g. "True"
+    for an xsd:boolean or "2020-01-01 10:00:00" for an xsd:dateTime, rather
+    than their normalised lexical form.
+    """
+    if term["type"] != "Literal" or not term["datatype"]:
+        return term
+    value = term["value"]
+    if term["datatype"] == str(XSD.dateTime):
+        # str() separates the date and the time with a space.
+        value = value.replace(" ", "T", 1)
+    return _convert_to_store_term(_convert_to_rdflib_term({**term, "value": value}))
+
+
+def _convert_to_store_key(term: Dict) -> Tuple[str, str, str, str]:
+    """Hashable form of a store term, used as the in-memory index key."""
+    return term["type"], term["value"], term.get("datatype", ""), term.get("lang", "")
+
+
+def _convert_node_to_store_key(
+    node: Union[URIRef, BNode, Literal],
+) -> Tuple[str, str, str, str]:
+    return _convert_to_store_key(_convert_to_store_term(node))
+
+
+def _convert_key_to_store_term(key: Tuple[str, str, str, str]) -> Dict:
+    term_type, value, datatype, lang = key
+    if term_type == "Literal":
+        return {"type": term_type, "datatype": datatype, "lang": lang, "value": value}
+    return {"type": term_type, "value": value}
+
+
+def _convert_key_to_rdflib_term(key: Tuple[str, str, str, str]):
+    term_type, value, datatype, lang = key
+    return _convert_to_rdflib_term(
+        {"type": term_type, "value": value, "datatype": datatype, "lang": lang}
+    )
+
+
+def _parse_files(
+    paths: Iterable[Union[str, os.PathLike]], format: Optional[str], workers: int
+) -> Iterator[Tuple[List, List]]:
+    """Yield the parse_file() results of the files in order, parsed by a pool
+    of worker processes with at most two files in flight per worker."""
+    if workers <= 1:
+        for path in paths:
+            yield _parse_file(os.fspath(path), format)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = deque()
+        try:
+            for path in paths:
+                futures.append(executor.submit(_parse_file, os.fspath(path), format))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _parse_file(
+    path: str, format: Optional[str]
+) -> Tuple[List[Tuple[str, str, str, str]], List[Tuple[int, int, int, Optional[int]]]]:
+    """Parse an RDF file, in a worker process.
+
+    :return: The distinct terms of the file as store keys, and its distinct
+        quads as positions in the terms, with None for the default graph.
+    """
+    # Triples of files without named graphs, and of the default graph of
+    # the others, are parsed into the graph named after the file.
+    public_id = Path(path).absolute().as_uri()
+    sink = _ParseSink(URIRef(public_id))
+    ConjunctiveGraph(store=sink).parse(path, format=format, publicID=public_id)
+    return sink.terms, list(sink.quads)
+
+
+class _ParseSink(Store):
+    """Store collecting parsed quads as positions in a list of distinct terms,
+    without indexing them."""
+
+    context_aware = True
+
+    def __init__(self, default_graph: URIRef):
+        super(_ParseSink, self).__init__()
+        self.terms: List[Tuple[str, str, str, str]] = []
+        # Insertion-ordered set of the quads.
+        self.quads: Dict[Tuple[int, int, int, Optional[int]], None] = {}
+        self._positions: Dict[Tuple[str, str, str, str], int] = {}
+        self._default_graph = default_graph
+
+    def add(self, triple: Tuple, context, quoted: bool = False):
+        s, p, o = triple
+        graph = getattr(context, "identifier", context)
+        if graph is None or graph == self._default_graph:
+            g = None
+        else:
+            g = self._position(graph)
+        self.quads[(self._position(s), self._position(p), self._position(o), g)] = None
+
+    def addN(self, quads: Iterable[Tuple]):
+        for s, p, o, context in quads:
+            self.add((s, p, o), context)
+
+    def remove(self, triple_pattern: Tuple, context=None):
+        # ConjunctiveGraph.parse() clears the graph it parses into, which
+        # is empty.
+        pass
+
+    def _position(self, node: Union[URIRef, BNode, Literal]) -> int:
+        key = _convert_node_to_store_key(node)
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = len(self.terms)
+            self.terms.append(key)
+        return position
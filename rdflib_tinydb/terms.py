@@ -0,0 +1,69 @@
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+Key = Hashable
+
+
+class TermDictionary:
+    """Two-way mapping between store term keys and compact integer term IDs.
+
+    IDs start at 1 so they can double as TinyDB document IDs in the terms
+    table.
+    """
+
+    def __init__(self):
+        self._ids: Dict[Key, int] = {}
+        self._keys: Dict[int, Key] = {}
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the state of the dictionary as plain data, e.g. for marshal."""
+        return {"keys": self._keys, "next_id": self._next_id}
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> "TermDictionary":
+        """Create a dictionary from the state returned by snapshot()."""
+        dictionary = cls()
+        dictionary._keys = state["keys"]
+        dictionary._ids = {key: term_id for term_id, key in dictionary._keys.items()}
+        dictionary._next_id = state["next_id"]
+        return dictionary
+
+    def load(self, term_id: int, key: Key):
+        """Register a term already persisted with the given ID."""
+        self._ids[key] = term_id
+        self._keys[term_id] = key
+        if term_id >= self._next_id:
+            self._next_id = term_id + 1
+
+    def add(self, key: Key) -> Tuple[int, bool]:
+        """Get the ID of a term, assigning a new one if it is not known yet.
+
+        :return: The term ID and whether it was newly assigned.
+        """
+        term_id = self.lookup(key)
+        if term_id is not None:
+            return term_id, False
+
+        term_id = self._next_id
+        self.load(term_id, key)
+        return term_id, True
+
+    def discard(self, term_id: int):
+        """Forget a term, e.g. one assigned in a rolled back transaction."""
+        key = self._keys.pop(term_id, None)
+        if key is not None:
+            del self._ids[key]
+
+    def lookup(self, key: Key) -> Optional[int]:
+        """Get the ID of a term, or None if it is not known."""
+        return self._ids.get(key)
+
+    def decode(self, term_id: int) -> Key:
+        return self._keys[term_id]
+
+    def items(self) -> Iterator[Tuple[int, Key]]:
+        """Yield the (term ID, key) pairs of the known terms."""
+        yield from self._keys.items()
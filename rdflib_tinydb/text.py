@@ -0,0 +1,80 @@
+from typing import Any, Dict, FrozenSet, Iterable, Set
+
+# Trigrams of a value are taken from its case-folded form, preceded by this
+# marker so that the first trigram also matches prefixes of two characters.
+_START = "\x02"
+
+# Values longer than this are not split into trigrams. They are candidates
+# for every search instead, which keeps the index small.
+_MAX_LENGTH = 256
+
+_NO_TERMS: FrozenSet[int] = frozenset()
+
+
+class TextIndex:
+    """Inverted trigram index of the lexical values of literal terms.
+
+    Maps each case-folded trigram to the IDs of the terms whose value has
+    it. Searching intersects the terms of the trigrams of the search text,
+    which gives every term whose value contains the text, whatever its
+    case, and some that do not: callers check the candidates' values.
+    """
+
+    def __init__(self):
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._terms: Set[int] = set()
+        self._long_terms: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the state of the index as plain data, e.g. for marshal."""
+        return {
+            "trigrams": self._trigrams,
+            "terms": self._terms,
+            "long_terms": self._long_terms,
+        }
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> "TextIndex":
+        """Create an index from the state returned by snapshot()."""
+        index = cls()
+        index._trigrams = state["trigrams"]
+        index._terms = state["terms"]
+        index._long_terms = state["long_terms"]
+        return index
+
+    def add(self, term_id: int, value: str):
+        self._terms.add(term_id)
+        if len(value) > _MAX_LENGTH:
+            self._long_terms.add(term_id)
+            return
+        for trigram in _trigrams(_START + value.casefold()):
+            self._trigrams.setdefault(trigram, set()).add(term_id)
+
+    def discard(self, term_id: int, value: str):
+        self._terms.discard(term_id)
+        self._long_terms.discard(term_id)
+        for trigram in _trigrams(_START + value.casefold()):
+            terms = self._trigrams.get(trigram)
+            if terms is not None:
+                terms.discard(term_id)
+                if not terms:
+                    del self._trigrams[trigram]
+
+    def candidates(self, text: str, prefix: bool = False) -> Iterable[int]:
+        """Get the IDs of the terms whose value may contain the text, or
+        start with it if prefix is True, ignoring case."""
+        text = text.casefold()
+        trigrams = _trigrams(_START + text if prefix else text)
+        if not trigrams:
+            return self._terms
+        postings = sorted(
+            (self._trigrams.get(trigram, _NO_TERMS) for trigram in trigrams), key=len
+        )
+        return postings[0].intersection(*postings[1:]) | self._long_terms
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
@@ -25,11 +25,12 @@ setup(
         "Topic :: Database :: Database Engines/Servers",
     ],
     packages=["rdflib_tinydb"],
-    install_requires=["tinydb>=4.5.2,<5.0", "rdflib>=4.0,<7.0"],
+    install_requires=["tinydb>=4.7.0,<5.0", "rdflib>=4.0,<7.0"],
     entry_points={
         "rdf.plugins.store": [
             "TinyDBMemory = rdflib_tinydb:TinyDBMemoryStore",
             "TinyDB = rdflib_tinydb:TinyDBStore",
+            "TinyDBSharded = rdflib_tinydb:TinyDBShardedStore",
         ]
     },
     include_package_data=True,
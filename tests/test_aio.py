@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+EX = "https://example.com/"
+
+
+def test_async_store(tmp_path: Path):
+    g = Graph("TinyDB", identifier=URIRef(EX + "g"))
+    g.open({"path": str(tmp_path / "db.json"), "async_workers": 2})
+    store = g.store
+    writes = []
+    write = store._store.storage.write
+    store._store.storage.write = lambda data: writes.append(data) or write(data)
+    triples = [(URIRef(EX + f"s{i}"), URIRef(EX + "p"), Literal(i)) for i in range(50)]
+
+    async def main():
+        # Concurrent writes are applied in a few batches, not one at a time.
+        await asyncio.gather(*(store.aadd(triple, g) for triple in triples))
+        assert len(writes) < 10
+        assert await store.alen(g) == 50
+
+        await store.aaddN(
+            (URIRef(EX + "s"), URIRef(EX + "q"), o, g) for _, _, o in triples
+        )
+        assert await store.alen() == 100
+
+        results = [
+            triple
+            async for triple, _ in store.atriples((None, URIRef(EX + "p"), None), g, 8)
+        ]
+        assert sorted(results) == sorted(triples)
+
+        # A rejected write does not hold up the others in its batch.
+        outcomes = await asyncio.gather(
+            store.aadd(("not a term", URIRef(EX + "p"), Literal(0)), g),
+            store.aremove((None, URIRef(EX + "q"), None), g),
+            return_exceptions=True,
+        )
+        assert isinstance(outcomes[0], ValueError)
+        assert outcomes[1] is None
+        assert await store.alen() == 50
+
+    asyncio.run(main())
+    g.close()
+
+    g = Graph("TinyDB", identifier=URIRef(EX + "g"))
+    g.open(str(tmp_path / "db.json"))
+    assert set(g) == set(triples)
+    g.close()
+
+
+def test_async_store_rejects_quoted_triples():
+    g = Graph("TinyDBMemory")
+    g.open(None)
+
+    async def main():
+        with pytest.raises(ValueError):
+            await g.store.aadd(
+                (URIRef(EX + "s"), URIRef(EX + "p"), Literal(0)), g, True
+            )
+        assert await g.store.alen() == 0
+
+    asyncio.run(main())
+    g.close()
@@ -0,0 +1,18 @@
+from benchmarks.benchmark import STORES, generate, run
+
+
+def test_generate():
+    triples = generate(500, seed=1)
+    assert len(triples) == 500
+    assert len(set(triples)) > 400
+    assert generate(500, seed=1) == triples
+    assert generate(500, seed=2) != triples
+
+
+def test_run():
+    results = run([200], repeat=1, adds=5)
+    assert [result["store"] for result in results["results"]] == list(STORES)
+    for result in results["results"]:
+        assert result["size"] == 200
+        assert len(result["triples"]) == 8
+        assert all(seconds >= 0 for seconds in result["sparql"].values())
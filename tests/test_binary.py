@@ -0,0 +1,198 @@
+import os
+from pathlib import Path
+
+import pytest
+from rdflib import ConjunctiveGraph, Graph, Literal, RDF, URIRef, Namespace
+
+from rdflib_tinydb.binary import BinaryFile, BinaryTripleIndex, write_binary
+
+SDO = Namespace("https://schema.org/")
+
+terms = {
+    1: ("URIRef", "https://example.com/s1", "", ""),
+    2: ("URIRef", "https://example.com/p1", "", ""),
+    3: ("Literal", "o1", "", "en"),
+    4: ("URIRef", "https://example.com/s2", "", ""),
+    6: ("URIRef", "https://example.com/g1", "", ""),
+    7: ("URIRef", "https://example.com/g2", "", ""),
+}
+quads = [(1, 2, 3, 6), (1, 2, 3, 7), (1, 2, 4, 6), (4, 2, 3, 6)]
+
+
+@pytest.fixture(scope="function")
+def base(tmp_path: Path) -> BinaryFile:
+    path = tmp_path / "test.json.bin"
+    write_binary(path, 1, terms.items(), quads, {6: 3, 7: 1})
+    return BinaryFile(path)
+
+
+def test_binary_file(base: BinaryFile):
+    assert base.generation == 1
+    assert (base.subjects, base.predicates, base.objects) == (2, 1, 2)
+    for term_id, key in terms.items():
+        assert base.lookup(key) == term_id
+        assert base.decode(term_id) == key
+    assert base.lookup(("Literal", "o1", "", "")) is None
+    assert base.decode(5) is None
+    assert dict(base.items()) == terms
+
+    assert list(base.triples((None, None, None))) == [
+        (1, 2, 3),
+        (1, 2, 4),
+        (4, 2, 3),
+    ]
+    assert set(base.triples((None, None, 3))) == {(1, 2, 3), (4, 2, 3)}
+    assert set(base.triples((1, None, 4))) == {(1, 2, 4)}
+    assert base.count((None, 2, 3)) == 2
+    assert base.contexts((1, 2, 3)) == {6, 7}
+    assert base.predicate_counts() == {2: 3}
+
+
+def test_binary_triple_index(base: BinaryFile):
+    index = BinaryTripleIndex(base)
+    assert len(index) == 3
+    assert index.count(6) == 3
+
+    assert index.remove((1, 2, 3), 6)
+    assert (1, 2, 3) in index
+    assert index.remove((1, 2, 3), 7)
+    assert (1, 2, 3) not in index
+    assert len(index) == 2
+    assert index.add((1, 2, 3), 7)
+    assert index.add((4, 2, 1), 6)
+    assert not index.add((4, 2, 1), 6)
+
+    assert set(index.triples((None, None, None))) == {
+        (1, 2, 3),
+        (1, 2, 4),
+        (4, 2, 3),
+        (4, 2, 1),
+    }
+    assert set(index.triples((None, None, None), 6)) == {
+        (1, 2, 4),
+        (4, 2, 3),
+        (4, 2, 1),
+    }
+    assert set(index.triples((None, None, None), 7)) == {(1, 2, 3)}
+    assert index.cardinality((None, 2, None)) == 4
+    assert index.cardinality((4, None, None), 6) == 2
+    assert index.stats() == {
+        "triples": 4,
+        "subjects": 2,
+        "predicates": 1,
+        "objects": 3,
+        "predicate_counts": {2: 4},
+        "context_counts": {6: 3, 7: 1},
+    }
+
+
+def _open(path: Path, **configuration) -> ConjunctiveGraph:
+    g = ConjunctiveGraph("TinyDB")
+    g.open({"path": path, "storage": "binary", **configuration})
+    return g
+
+
+def test_binary_storage(tmp_path: Path):
+    path = tmp_path / "test.json"
+    g1 = URIRef("https://example.com/g1")
+    g2 = URIRef("https://example.com/g2")
+    people = [URIRef(f"https://example.com/person-{i}") for i in range(10)]
+
+    g = _open(path)
+    for i, person in enumerate(people):
+        g.add((person, RDF.type, SDO.Person, g1))
+        g.add((person, SDO.name, Literal(f"Person {i}"), g1))
+    g.add((people[0], RDF.type, SDO.Person, g2))
+    g.store.compact()
+    assert len(g.store._store.table("triples")) == 0
+    base = g.store._base
+    expected = set(g.quads())
+    g.close()
+    assert base._buffer.closed
+
+    g = _open(path)
+    assert set(g.quads()) == expected
+    assert len(g) == 20
+    assert g.store.cardinality((None, RDF.type, SDO.Person), g1) == 10
+
+    # Changes since the compaction go to the TinyDB tables.
+    g.remove((people[0], None, None, g1))
+    g.remove((people[1], SDO.name, None))
+    g.add((people[1], SDO.name, Literal("Person One"), g1))
+    g.store.remove_graph(Graph(store=g.store, identifier=g2))
+    g.add((people[2], SDO.name, Literal("Person 2"), g1))
+    assert len(g.store._store.table("removed")) == 4
+    expected = set(g.quads())
+    g.close()
+
+    g = _open(path)
+    assert set(g.quads()) == expected
+    assert {c.identifier for c in g.contexts()} == {g1}
+    assert len(g) == 18
+    assert g.store.stats()["predicate_counts"][RDF.type] == 9
+
+    # Rolled back changes leave the file untouched.
+    g.store._autocommit = False
+    g.remove((people[3], None, None))
+    g.store.rollback()
+    assert set(g.quads()) == expected
+    g.store._autocommit = True
+
+    g.store.compact()
+    assert len(g.store._store.table("removed")) == 0
+    g.close()
+
+    g = _open(path)
+    assert set(g.quads()) == expected
+    assert len(g.store._term_dictionary) > 0
+    g.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Windows unmaps the file to replace it.")
+def test_binary_storage_compaction_while_reading(tmp_path: Path):
+    g = _open(tmp_path / "test.json")
+    people = [URIRef(f"https://example.com/person-{i}") for i in range(200)]
+    for person in people[:100]:
+        g.add((person, RDF.type, SDO.Person))
+    g.store.compact()
+    for person in people[100:]:
+        g.add((person, RDF.type, SDO.Person))
+
+    # Readers keep the file they started on after it is replaced.
+    triples = g.triples((None, RDF.type, None))
+    found = {next(triples)[0]}
+    g.store.compact()
+    found.update(s for s, _, _ in triples)
+    assert found == set(people)
+    g.close()
+
+
+def test_binary_storage_interrupted_compaction(tmp_path: Path):
+    path = tmp_path / "test.json"
+    g = _open(path)
+    person = URIRef("https://example.com/person-1")
+    g.add((person, RDF.type, SDO.Person))
+    g.store.compact()
+    g.add((person, SDO.name, Literal("Person 1")))
+    g.remove((person, RDF.type, SDO.Person))
+    expected = set(g.quads())
+
+    # Write the next file without clearing the changes it folds in.
+    store = g.store
+    write_binary(
+        store._base.path,
+        store._base.generation + 1,
+        store._term_dictionary.items(),
+        (
+            triple + (c,)
+            for triple in store._index.triples((None, None, None))
+            for c in store._index.triple_contexts(triple)
+        ),
+        {c: store._index.count(c) for c in store._index.contexts()},
+    )
+    g.close()
+
+    g = _open(path)
+    assert set(g.quads()) == expected
+    assert len(g.store._store.table("triples")) == 0
+    g.close()
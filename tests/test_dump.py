@@ -0,0 +1,118 @@
+import io
+import threading
+from pathlib import Path
+
+import pytest
+from rdflib import BNode, Dataset, Graph, Literal, URIRef, XSD
+from rdflib.compare import isomorphic
+
+from rdflib_tinydb import store as store_module
+
+EX = "https://example.com/"
+
+TRIPLES = [
+    (URIRef(EX + "s"), URIRef(EX + "label"), Literal("plain")),
+    (URIRef(EX + "s"), URIRef(EX + "label"), Literal('quote " and \\ and\nline')),
+    (URIRef(EX + "s"), URIRef(EX + "label"), Literal("café ☕", lang="fr")),
+    (URIRef(EX + "s"), URIRef(EX + "count"), Literal("01", datatype=XSD.integer)),
+    (URIRef(EX + "s"), URIRef(EX + "when"), Literal("2020-01-01", datatype=XSD.date)),
+    (URIRef(EX + "s"), URIRef(EX + "knows"), BNode("b1")),
+    (BNode("b1"), URIRef(EX + "name"), Literal("b1")),
+]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_dump_and_load_triples(binary: bool):
+    g = Graph("TinyDBMemory")
+    g.open(None)
+    for triple in TRIPLES:
+        g.add(triple)
+    output = io.BytesIO() if binary else io.StringIO()
+    assert g.store.dump(output, "nt") == len(TRIPLES)
+
+    # The output is N-Triples as RDFLib reads it.
+    data = output.getvalue()
+    expected = Graph()
+    expected.parse(data=data.decode() if binary else data, format="nt")
+    assert isomorphic(expected, g)
+
+    loaded = Graph("TinyDBMemory")
+    loaded.open(None)
+    output.seek(0)
+    assert loaded.store.load(output, loaded) == len(TRIPLES)
+    assert isomorphic(loaded, g)
+    # Loaded terms are the same as added ones.
+    assert (None, None, Literal("1", datatype=XSD.integer)) in loaded
+    # Blank nodes get new labels.
+    assert BNode("b1") not in set(loaded.subjects())
+    g.close()
+    loaded.close()
+
+
+def test_dump_and_load_quads(tmp_path: Path):
+    g = Dataset("TinyDB")
+    g.open(str(tmp_path / "db.json"))
+    graph1 = g.graph(URIRef(EX + "g1"))
+    graph2 = g.graph(URIRef(EX + "g2"))
+    for triple in TRIPLES[:3]:
+        graph1.add(triple)
+        graph2.add(triple)
+    g.add(TRIPLES[3])
+    g.commit()
+
+    output = io.StringIO()
+    assert g.store.dump(output, "nquads") == 7
+    assert g.store.dump(io.StringIO(), "nquads", graph2) == 3
+    assert g.store.dump(io.StringIO(), "nt") == 4
+    with pytest.raises(ValueError):
+        g.store.dump(io.StringIO(), "turtle")
+    g.close()
+
+    loaded = Dataset("TinyDBMemory")
+    loaded.open(None)
+    output.seek(0)
+    assert loaded.store.load(output) == 7
+    assert len(loaded.graph(URIRef(EX + "g2"))) == 3
+    assert len(loaded.default_context) == 1
+    # Statements without a graph go to the given one.
+    output.seek(0)
+    assert loaded.store.load(output, URIRef(EX + "g3")) == 1
+    assert len(loaded.graph(URIRef(EX + "g3"))) == 1
+    loaded.close()
+
+
+def test_load_invalid_line(tmp_path: Path):
+    g = Graph("TinyDB")
+    g.open(str(tmp_path / "db.json"))
+    data = (
+        "# comment\n"
+        "\n"
+        f"<{EX}s> <{EX}p> <{EX}o> .\n"
+        f"<{EX}s> <{EX}p> not a term .\n"
+    )
+    with pytest.raises(ValueError, match="Line 4"):
+        g.store.load(io.StringIO(data))
+    assert len(g) == 0
+    assert g.store.load(io.StringIO("")) == 0
+    g.close()
+
+
+def test_load_with_concurrent_writes(monkeypatch):
+    monkeypatch.setattr(store_module, "_LOAD_BATCH_SIZE", 1)
+    g = Graph("TinyDBMemory", identifier=URIRef(EX + "g"))
+    g.open(None)
+    triple = (URIRef(EX + "s"), URIRef(EX + "p"), URIRef(EX + "other"))
+    writer = threading.Thread(target=g.add, args=(triple,))
+
+    def lines():
+        yield f"<{EX}s> <{EX}p> <{EX}o> .\n"
+        # A write from another thread between batches waits for the load.
+        writer.start()
+        writer.join(timeout=0.5)
+        yield "not a statement\n"
+
+    with pytest.raises(ValueError):
+        g.store.load(lines(), g)
+    writer.join()
+    assert set(g) == {triple}
+    g.close()
@@ -0,0 +1,160 @@
+import pytest
+
+from rdflib_tinydb.index import TripleIndex
+
+
+@pytest.fixture(scope="function")
+def index():
+    index = TripleIndex()
+    for triple in [
+        ("s1", "p1", "o1"),
+        ("s1", "p1", "o2"),
+        ("s1", "p2", "o1"),
+        ("s2", "p1", "o1"),
+    ]:
+        assert index.add(triple, "g1")
+    assert index.add(("s1", "p1", "o1"), "g2")
+    return index
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        (("s1", "p1", "o1"), {("s1", "p1", "o1")}),
+        (("s1", "p1", None), {("s1", "p1", "o1"), ("s1", "p1", "o2")}),
+        (("s1", None, "o1"), {("s1", "p1", "o1"), ("s1", "p2", "o1")}),
+        (
+            ("s1", None, None),
+            {("s1", "p1", "o1"), ("s1", "p1", "o2"), ("s1", "p2", "o1")},
+        ),
+        ((None, "p1", "o1"), {("s1", "p1", "o1"), ("s2", "p1", "o1")}),
+        (
+            (None, "p1", None),
+            {("s1", "p1", "o1"), ("s1", "p1", "o2"), ("s2", "p1", "o1")},
+        ),
+        (
+            (None, None, "o1"),
+            {("s1", "p1", "o1"), ("s1", "p2", "o1"), ("s2", "p1", "o1")},
+        ),
+        (
+            (None, None, None),
+            {
+                ("s1", "p1", "o1"),
+                ("s1", "p1", "o2"),
+                ("s1", "p2", "o1"),
+                ("s2", "p1", "o1"),
+            },
+        ),
+        (("s3", None, None), set()),
+    ],
+)
+def test_triples(index: TripleIndex, pattern, expected):
+    assert set(index.triples(pattern)) == expected
+
+
+def test_add_and_remove(index: TripleIndex):
+    assert len(index) == 4
+    assert not index.add(("s1", "p1", "o1"), "g1")
+    assert len(index) == 4
+
+    assert index.remove(("s1", "p1", "o1"), "g1")
+    assert not index.remove(("s1", "p1", "o1"), "g1")
+    # The triple is still in g2.
+    assert ("s1", "p1", "o1") in index
+    assert index.remove(("s1", "p1", "o1"), "g2")
+    assert ("s1", "p1", "o1") not in index
+    assert len(index) == 3
+
+    for triple in list(index.triples((None, None, None))):
+        index.remove(triple, "g1")
+    assert len(index) == 0
+    assert list(index.triples((None, None, None))) == []
+
+
+def test_contexts(index: TripleIndex):
+    assert set(index.contexts()) == {"g1", "g2"}
+    assert set(index.contexts(("s1", "p1", "o1"))) == {"g1", "g2"}
+    assert set(index.contexts(("s1", "p1", "o2"))) == {"g1"}
+    assert index.count() == 4
+    assert index.count("g1") == 4
+    assert index.count("g2") == 1
+    assert index.count("g3") == 0
+
+    assert list(index.triples((None, None, None), "g2")) == [("s1", "p1", "o1")]
+    assert set(index.triples(("s1", "p1", None), "g2")) == {("s1", "p1", "o1")}
+    assert list(index.triples(("s2", None, None), "g2")) == []
+
+    # Empty contexts are kept until they are removed.
+    assert index.add_context("g3")
+    assert not index.add_context("g3")
+    index.remove(("s1", "p1", "o1"), "g2")
+    assert set(index.contexts()) == {"g1", "g2", "g3"}
+    index.remove_context("g1")
+    assert set(index.contexts()) == {"g2", "g3"}
+    assert len(index) == 0
+
+
+@pytest.mark.parametrize(
+    "pattern, context, expected",
+    [
+        (("s1", "p1", "o1"), None, 1),
+        (("s1", "p1", None), None, 2),
+        (("s1", None, "o1"), None, 2),
+        (("s1", None, None), None, 3),
+        ((None, "p1", "o1"), None, 2),
+        ((None, "p1", None), None, 3),
+        ((None, None, "o1"), None, 3),
+        ((None, None, None), None, 4),
+        (("s3", None, None), None, 0),
+        ((None, None, None), "g2", 1),
+        (("s1", "p1", None), "g1", 2),
+        (("s1", "p1", None), "g2", 1),
+        ((None, None, None), "g3", 0),
+    ],
+)
+def test_cardinality(index: TripleIndex, pattern, context, expected):
+    assert index.cardinality(pattern, context) == expected
+    assert len(list(index.triples(pattern, context))) == expected
+
+
+def test_stats(index: TripleIndex):
+    assert index.stats() == {
+        "triples": 4,
+        "subjects": 2,
+        "predicates": 2,
+        "objects": 2,
+        "predicate_counts": {"p1": 3, "p2": 1},
+        "context_counts": {"g1": 4, "g2": 1},
+    }
+    index.remove(("s1", "p2", "o1"), "g1")
+    index.remove(("s1", "p1", "o1"), "g2")
+    stats = index.stats()
+    assert stats["triples"] == 3
+    assert stats["predicates"] == 1
+    assert stats["predicate_counts"] == {"p1": 3}
+    assert stats["context_counts"] == {"g1": 3, "g2": 0}
+
+
+@pytest.mark.parametrize(
+    "pattern, context",
+    [
+        ((None, "p1", "o1"), None),
+        ((None, "p1", None), None),
+        ((None, None, None), None),
+        ((None, None, None), "g1"),
+    ],
+)
+def test_triples_while_changing_index(pattern, context):
+    index = TripleIndex()
+    triples = [(f"s{i}", "p1", "o1") for i in range(20)]
+    for triple in triples:
+        index.add(triple, "g1")
+
+    seen = []
+    for triple in index.triples(pattern, context):
+        seen.append(triple)
+        index.add((triple[0], "p2", f"o{len(seen)}"), "g1")
+        index.remove(triple, "g1")
+        index.add(triple, "g2")
+    assert set(triples) <= set(seen)
+    assert index.count("g2") == 20
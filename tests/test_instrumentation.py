@@ -0,0 +1,70 @@
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+from rdflib_tinydb import Instrumentation
+from rdflib_tinydb.instrumentation import HISTOGRAM_BOUNDS
+
+EX = "https://example.com/"
+
+
+def test_record():
+    instrumentation = Instrumentation()
+    calls = []
+    instrumentation.add_hook(lambda *args: calls.append(args))
+    instrumentation.record("add", 5e-6)
+    instrumentation.record("add", 2.0)
+    instrumentation.record("triples s??", 1e-3, 3, 2)
+
+    stats = instrumentation.stats()
+    assert stats["add"]["count"] == 2
+    assert stats["add"]["seconds"] == pytest.approx(2.000005)
+    assert len(stats["add"]["histogram"]) == len(HISTOGRAM_BOUNDS) + 1
+    assert stats["add"]["histogram"][1] == 1
+    assert stats["add"]["histogram"][7] == 1
+    assert stats["triples s??"]["scanned"] == 3
+    assert stats["triples s??"]["yielded"] == 2
+    assert calls[-1] == ("triples s??", 1e-3, 3, 2)
+
+    instrumentation.reset()
+    assert instrumentation.stats() == {}
+
+
+@pytest.mark.parametrize(
+    "plugin, path", [("TinyDB", "db.json"), ("TinyDBMemory", None)]
+)
+def test_store(tmp_path, plugin, path):
+    instrumentation = Instrumentation()
+    configuration = {"instrumentation": instrumentation}
+    if path is not None:
+        configuration["path"] = str(tmp_path / path)
+    g = Graph(plugin, identifier=URIRef(EX + "g1"))
+    g.open(configuration)
+    assert g.store.instrumentation is instrumentation
+
+    for i in range(3):
+        g.add((URIRef(EX + "s"), URIRef(EX + "p"), Literal(i)))
+    g.store.add((URIRef(EX + "s"), URIRef(EX + "p"), Literal(0)), URIRef(EX + "g2"))
+    assert g.value(URIRef(EX + "s"), URIRef(EX + "p"), any=True) is not None
+    # Matches in g2 are scanned, then filtered.
+    assert len(list(g.triples((URIRef(EX + "s"), None, None)))) == 3
+    g.store.remove((None, None, Literal(0)), URIRef(EX + "g2"))
+
+    stats = instrumentation.stats()
+    assert stats["add"]["count"] == 4
+    assert stats["commit"]["count"] == 5
+    assert stats["remove"]["count"] == 1
+    # One more for the meta table created on open().
+    assert stats["storage.write"]["count"] == 6
+    assert stats["storage.read"]["count"] >= 5
+    # value() stops after the first match.
+    assert stats["triples sp?"]["yielded"] == 1
+    assert stats["triples s??"]["scanned"] == 3
+    assert stats["triples s??"]["yielded"] == 3
+    g.close()
+
+
+def test_store_without_instrumentation():
+    g = Graph("TinyDBMemory")
+    g.open(None)
+    assert g.store.instrumentation is None
+    g.close()
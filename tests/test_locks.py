@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+from rdflib.graph import ConjunctiveGraph
+from rdflib.plugins.sparql import prepareQuery
+
+from rdflib_tinydb.locks import FileLock, ReadWriteLock
+
+EX = "https://example.com/"
+
+
+def test_read_write_lock():
+    lock = ReadWriteLock()
+    events = []
+    # Both readers hold the lock when they meet here, so they run together.
+    readers_in = threading.Barrier(3, timeout=5)
+    readers_out = threading.Event()
+    writer_in = threading.Event()
+    writer_out = threading.Event()
+
+    def read():
+        with lock.read():
+            readers_in.wait()
+            readers_out.wait(5)
+            events.append("read done")
+
+    def write():
+        with lock.write():
+            events.append("write")
+            writer_in.set()
+            writer_out.wait(5)
+            events.append("write done")
+
+    def read_after_write():
+        with lock.read():
+            events.append("read")
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    readers_in.wait()
+    writer = threading.Thread(target=write)
+    writer.start()
+    readers_out.set()
+    for thread in readers:
+        thread.join()
+    writer_in.wait(5)
+    reader = threading.Thread(target=read_after_write)
+    reader.start()
+    writer_out.set()
+    writer.join()
+    reader.join()
+    # The writer waits for both readers, and a reader waits for the writer.
+    assert events == ["read done", "read done", "write", "write done", "read"]
+
+    # Both sides are reentrant and the writer may read.
+    with lock.write(), lock.write(), lock.read():
+        pass
+    with lock.read(), lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+
+
+def test_file_lock(tmp_path):
+    path = str(tmp_path / "db.json.lock")
+    first = FileLock(path)
+    second = FileLock(path)
+    events = []
+
+    def lock():
+        with second:
+            events.append("second")
+
+    with first:
+        assert first.locked
+        thread = threading.Thread(target=lock)
+        thread.start()
+        time.sleep(0.05)
+        events.append("first")
+    thread.join()
+    assert not first.locked
+    assert events == ["first", "second"]
+
+
+@pytest.mark.parametrize("storage", ["json", "log", "binary"])
+def test_file_locked_stores(tmp_path, storage):
+    # Two stores on the same files stand in for two processes: flock()
+    # locks are held per open file, so they exclude each other too.
+    configuration = {
+        "path": str(tmp_path / "db.json"),
+        "storage": storage,
+        "file_lock": True,
+    }
+    first = ConjunctiveGraph("TinyDB")
+    first.open(configuration)
+    second = ConjunctiveGraph("TinyDB")
+    second.open(configuration)
+
+    triples = [(URIRef(EX + "s"), URIRef(EX + "p"), Literal(i)) for i in range(4)]
+    for i, triple in enumerate(triples):
+        (first, second)[i % 2].add(triple)
+    assert len(first) == 3
+    assert len(second) == 4
+    first.store.refresh()
+    assert len(first) == 4
+
+    first.close()
+    second.close()
+    g = ConjunctiveGraph("TinyDB")
+    g.open(configuration)
+    assert set(g) == set(triples)
+    g.close()
+
+
+def test_concurrent_reads_and_writes():
+    g = Graph("TinyDBMemory", identifier=URIRef(EX + "g"))
+    g.open(None)
+    for i in range(200):
+        g.add((URIRef(EX + f"s{i}"), URIRef(EX + "p"), Literal(i)))
+    # RDFLib's SPARQL parser is not thread-safe, so parse up front.
+    query = prepareQuery("SELECT * WHERE { ?s ?p ?o }")
+    errors = []
+
+    def read():
+        try:
+            for _ in range(20):
+                for s, p, o in g.triples((None, URIRef(EX + "p"), None)):
+                    assert p == URIRef(EX + "p")
+                len(g.query(query))
+        except Exception as error:
+            errors.append(error)
+
+    def write(first):
+        try:
+            for i in range(first, first + 100):
+                g.add((URIRef(EX + f"s{i + 1000}"), URIRef(EX + "q"), Literal(i)))
+                g.remove((URIRef(EX + f"s{i}"), URIRef(EX + "p"), None))
+                g.add((URIRef(EX + f"s{i}"), URIRef(EX + "p"), Literal(-i)))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    threads += [threading.Thread(target=write, args=(first,)) for first in (0, 100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(g) == 400
+    g.close()
@@ -0,0 +1,182 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+from rdflib import XSD, ConjunctiveGraph, Graph, Literal, URIRef
+
+from rdflib_tinydb import sparql
+from rdflib_tinydb.ranges import RangeIndex
+
+EX = "https://example.com/"
+PRICE = URIRef(EX + "price")
+START = URIRef(EX + "start")
+NAME = URIRef(EX + "name")
+WHEN = URIRef(EX + "when")
+
+prices = [Literal(3), Literal(7), Literal("6.5", datatype=XSD.decimal), Literal(12.0)]
+starts = [
+    Literal("2023-12-31", datatype=XSD.date),
+    Literal("2024-01-01", datatype=XSD.date),
+    Literal("2024-03-15", datatype=XSD.date),
+]
+# dateTimes with and without a timezone.
+whens = [
+    Literal("2024-04-30T12:00:00Z", datatype=XSD.dateTime),
+    Literal("2024-05-01T12:00:00Z", datatype=XSD.dateTime),
+    Literal("2024-04-30T12:00:00", datatype=XSD.dateTime),
+    Literal("2024-05-01T12:00:00", datatype=XSD.dateTime),
+]
+
+
+def test_range_index():
+    index = RangeIndex()
+    for term_id, literal in enumerate(prices, 1):
+        index.add_term(term_id, str(literal.datatype), str(literal))
+        index.update(10, term_id, 0, 1)
+    index.add_term(5, str(XSD.string), "7")
+    assert 5 not in index
+    assert list(index.objects(10, "numeric", 6.5, None)) == [3, 2, 4]
+    assert list(index.objects(10, "numeric", None, 6.9)) == [1, 3]
+    assert index.count(10, "numeric") == 4
+
+    index.update(10, 2, 1, 2)
+    index.update(10, 3, 1, 0)
+    index = RangeIndex.restore(index.snapshot())
+    assert list(index.objects(10, "numeric")) == [1, 2, 4]
+    assert index.count(10, "numeric") == 4
+    assert list(index.objects(10, "date")) == []
+
+
+@pytest.fixture(scope="function")
+def graph():
+    g = Graph("TinyDBMemory", identifier=URIRef(EX + "g"))
+    g.open({"range_index": True})
+    for i, price in enumerate(prices):
+        g.add((URIRef(EX + f"item-{i}"), PRICE, price))
+    for i, start in enumerate(starts):
+        g.add((URIRef(EX + f"event-{i}"), START, start))
+    g.add((URIRef(EX + "item-0"), NAME, Literal("Item 0")))
+    g.add((URIRef(EX + "item-1"), NAME, Literal(5)))
+    for i, when in enumerate(whens):
+        g.add((URIRef(EX + f"event-{i}"), WHEN, when))
+    yield g
+    g.close()
+
+
+def test_value_range(tmp_path: Path):
+    configuration = {"path": str(tmp_path / "db.json"), "range_index": True}
+    g = ConjunctiveGraph("TinyDB")
+    g.open(configuration)
+    for i, price in enumerate(prices):
+        g.add((URIRef(EX + f"item-{i}"), PRICE, price))
+    for i, start in enumerate(starts):
+        g.add((URIRef(EX + f"event-{i}"), START, start))
+    store = g.store
+
+    def objects(*args, **kwargs):
+        return [o for (_, _, o), _ in store.value_range(*args, **kwargs)]
+
+    assert objects(PRICE, 5, 10) == [prices[2], prices[1]]
+    assert objects(PRICE, 6.5, include_low=False) == [prices[1], prices[3]]
+    assert objects(PRICE, high=Literal("7.0", datatype=XSD.double)) == [
+        prices[0],
+        prices[2],
+        prices[1],
+    ]
+    assert objects(START, date(2024, 1, 1)) == starts[1:]
+    assert objects(START, 1) == []
+    # Invalid arguments are rejected on the call, not the first next().
+    with pytest.raises(ValueError):
+        store.value_range(PRICE, 1, date(2024, 1, 1))
+    with pytest.raises(ValueError):
+        store.value_range(PRICE)
+
+    g.remove((None, PRICE, prices[1]))
+    assert objects(PRICE, 5, 10) == [prices[2]]
+    g.close()
+
+    g = ConjunctiveGraph("TinyDB")
+    g.open(configuration)
+    assert [o for (_, _, o), _ in g.store.value_range(PRICE, 5)] == [
+        prices[2],
+        prices[3],
+    ]
+    g.close()
+
+
+def test_value_range_date_times():
+    g = Graph("TinyDBMemory")
+    g.open({"range_index": True})
+    for i, when in enumerate(whens):
+        g.add((URIRef(EX + f"event-{i}"), WHEN, when))
+
+    def objects(low):
+        return [o for (_, _, o), _ in g.store.value_range(WHEN, low)]
+
+    assert objects(Literal("2024-05-01T00:00:00Z", datatype=XSD.dateTime)) == [whens[1]]
+    assert objects(Literal("2024-05-01T00:00:00", datatype=XSD.dateTime)) == [whens[3]]
+    g.close()
+
+
+def test_value_range_rollback():
+    g = Graph("TinyDBMemory")
+    g.open({"range_index": True, "autocommit": False})
+    g.add((URIRef(EX + "item"), PRICE, Literal(3)))
+    g.commit()
+    g.remove((URIRef(EX + "item"), PRICE, None))
+    g.add((URIRef(EX + "item"), PRICE, Literal(4)))
+    g.rollback()
+    assert [o for (_, _, o), _ in g.store.value_range(PRICE, 0)] == [Literal(3)]
+    g.close()
+
+
+queries = [
+    "SELECT ?s WHERE { ?s <https://example.com/price> ?price FILTER(?price > 5) }",
+    "SELECT ?s WHERE { ?s <https://example.com/price> ?price FILTER(6.5 >= ?price) }",
+    "SELECT ?s WHERE { ?s <https://example.com/price> ?price FILTER(?price = 7.0) }",
+    """
+    SELECT ?s WHERE {
+        ?s <https://example.com/start> ?start
+        FILTER(?start >= "2024-01-01"^^<http://www.w3.org/2001/XMLSchema#date>
+            && ?start < "2024-02-01"^^<http://www.w3.org/2001/XMLSchema#date>)
+    }
+    """,
+    # Objects of other kinds compare by datatype in rdflib.
+    "SELECT ?s WHERE { ?s <https://example.com/name> ?name FILTER(?name > 1) }",
+    "SELECT ?s ?o WHERE { ?s ?p ?o FILTER(?o < 10) }",
+    # dateTimes without a timezone do not compare by value with the others.
+    """
+    SELECT ?s WHERE {
+        ?s <https://example.com/when> ?when
+        FILTER(?when > "2024-05-01T00:00:00"^^<http://www.w3.org/2001/XMLSchema#dateTime>)
+    }
+    """,
+    """
+    SELECT ?s WHERE {
+        ?s <https://example.com/when> ?when
+        FILTER(?when > "2024-05-01T00:00:00Z"^^<http://www.w3.org/2001/XMLSchema#dateTime>)
+    }
+    """,
+]
+
+
+@pytest.mark.parametrize("query", queries)
+def test_sparql_filters(graph, query):
+    expected = Graph()
+    for triple in graph:
+        expected.add(triple)
+    assert sorted(graph.query(query)) == sorted(expected.query(query))
+
+
+def test_sparql_filters_use_range_index(graph, monkeypatch):
+    found = []
+    candidates_of = sparql._candidates
+
+    def spy(*args):
+        candidates = candidates_of(*args)
+        found.append(candidates)
+        return candidates
+
+    monkeypatch.setattr(sparql, "_candidates", spy)
+    assert len(graph.query(queries[3])) == 1
+    assert [len(terms) for candidates in found for terms in candidates.values()] == [1]
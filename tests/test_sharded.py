@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import pytest
+from rdflib import ConjunctiveGraph, Graph, Literal, URIRef
+
+from rdflib_tinydb import sharded
+
+EX = "https://example.com/"
+P = URIRef(EX + "p")
+
+
+def _quads(graph: Graph, count: int):
+    return [
+        (
+            URIRef(EX + f"s{i}"),
+            P,
+            Literal(i),
+            graph.get_context(URIRef(EX + f"g{i % 2}")),
+        )
+        for i in range(count)
+    ]
+
+
+def test_sharded_store(tmp_path: Path):
+    configuration = {"path": str(tmp_path / "db"), "shards": 3}
+    g = ConjunctiveGraph("TinyDBSharded")
+    g.open(configuration)
+    quads = _quads(g, 30)
+    g.addN(quads)
+    assert sorted(len(shard) for shard in g.store.shards) != [0, 0, 30]
+    assert len(g) == 30
+    assert len(g.get_context(URIRef(EX + "g0"))) == 15
+
+    # A bound subject is answered by its shard alone.
+    shard = g.store._shard(URIRef(EX + "s4"))
+    assert list(shard.triples((URIRef(EX + "s4"), None, None))) != []
+    assert set(g.triples((URIRef(EX + "s4"), None, None))) == {
+        (URIRef(EX + "s4"), P, Literal(4))
+    }
+    assert {(s, p, o, c.identifier) for s, p, o, c in g.quads((None, P, None))} == {
+        (s, p, o, c.identifier) for s, p, o, c in quads
+    }
+    assert {c.identifier for c in g.contexts()} == {
+        URIRef(EX + "g0"),
+        URIRef(EX + "g1"),
+    }
+    assert g.store.cardinality((None, P, None)) == 30
+
+    g.remove((URIRef(EX + "s4"), None, None))
+    g.remove((None, None, Literal(5)))
+    g.store.remove_graph(g.get_context(URIRef(EX + "g1")))
+    assert len(g) == 14
+    g.close()
+
+    g = ConjunctiveGraph("TinyDBSharded")
+    g.open(str(tmp_path / "db"))
+    assert len(g) == 14
+    assert len(g.store.shards) == 3
+    g.close()
+
+    with pytest.raises(ValueError):
+        ConjunctiveGraph("TinyDBSharded").open({**configuration, "shards": 2})
+
+
+def test_sharded_fan_out(monkeypatch):
+    monkeypatch.setattr(sharded, "_FAN_OUT_THRESHOLD", 0)
+    monkeypatch.setattr(sharded, "_FAN_OUT_BATCH_SIZE", 4)
+    g = ConjunctiveGraph("TinyDBSharded")
+    g.open(None)
+    g.addN(_quads(g, 100))
+
+    assert len(set(g.triples((None, P, None)))) == 100
+    # Stopping early, and reading other patterns while iterating.
+    for triple in g.triples((None, P, None)):
+        assert len(list(g.triples((None, None, triple[2])))) == 1
+        break
+    assert g.value(predicate=P, object=Literal(42)) == URIRef(EX + "s42")
+
+    query = f"SELECT ?s ?o WHERE {{ ?s <{P}> ?o FILTER(?o < 10) }}"
+    assert len(g.query(query)) == 10
+    g.close()
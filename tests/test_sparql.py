@@ -0,0 +1,167 @@
+import pytest
+from rdflib import ConjunctiveGraph, Dataset, Graph, Literal, URIRef, Variable
+from rdflib.plugins.sparql import CUSTOM_EVALS
+
+from rdflib_tinydb.sparql import _join, _plan
+
+data = """
+    PREFIX sdo: <https://schema.org/>
+    PREFIX ex: <https://example.com/>
+
+    ex:person-1 a sdo:Person ;
+        sdo:name "Person 1" ;
+        sdo:knows ex:person-2, ex:person-3 ;
+        sdo:affiliation ex:org-1 .
+
+    ex:person-2 a sdo:Person ;
+        sdo:name "Person 2" ;
+        sdo:knows ex:person-1 ;
+        sdo:affiliation ex:org-1 .
+
+    ex:person-3 a sdo:Person ;
+        sdo:name "Person 3"@en ;
+        sdo:knows ex:person-3 .
+
+    ex:org-1 a sdo:Organization ;
+        sdo:name "RDFLib" .
+"""
+
+queries = [
+    # Star join.
+    """
+    SELECT ?person ?name WHERE {
+        ?person a <https://schema.org/Person> ;
+            <https://schema.org/name> ?name ;
+            <https://schema.org/affiliation> ?org .
+    }
+    """,
+    # Chain join.
+    """
+    SELECT ?a ?c ?name WHERE {
+        ?a <https://schema.org/knows> ?b .
+        ?b <https://schema.org/knows> ?c .
+        ?c <https://schema.org/name> ?name .
+    }
+    """,
+    # Repeated variable in one pattern.
+    "SELECT ?x WHERE { ?x <https://schema.org/knows> ?x }",
+    # Blank node in the pattern, and a join with OPTIONAL and FILTER.
+    """
+    SELECT ?name ?org WHERE {
+        [] <https://schema.org/name> ?name .
+        OPTIONAL { ?x <https://schema.org/name> ?name ; <https://schema.org/affiliation> ?org }
+        FILTER (?name != "RDFLib")
+    }
+    """,
+    # Unknown term.
+    "SELECT ?x WHERE { ?x a <https://schema.org/Unknown> }",
+    # Property path, evaluated by rdflib.
+    "SELECT ?x ?y WHERE { ?x <https://schema.org/knows>+ ?y }",
+    # Cross product.
+    """
+    SELECT ?o ?p WHERE {
+        ?o a <https://schema.org/Organization> . ?p a <https://schema.org/Person>
+    }
+    """,
+]
+
+
+def _results(graph, query, **kwargs):
+    return sorted(tuple(row) for row in graph.query(query, **kwargs))
+
+
+@pytest.fixture(scope="function")
+def graphs():
+    g = ConjunctiveGraph("TinyDBMemory")
+    g.open(None)
+    g.get_context(URIRef("https://example.com/g")).parse(data=data, format="turtle")
+    expected = Graph().parse(data=data, format="turtle")
+
+    yield g, expected
+
+    g.close()
+
+
+@pytest.mark.parametrize("query", queries)
+def test_bgp_matches_rdflib(graphs, query):
+    g, expected = graphs
+    assert "rdflib_tinydb" in CUSTOM_EVALS
+    assert _results(g, query) == _results(expected, query)
+
+
+def test_bgp_init_bindings(graphs):
+    g, expected = graphs
+    query = queries[0]
+    init_bindings = {"name": Literal("Person 2")}
+    assert _results(g, query, initBindings=init_bindings) == _results(
+        expected, query, initBindings=init_bindings
+    )
+    assert len(_results(g, query, initBindings=init_bindings)) == 1
+
+
+def test_bgp_graph_scopes():
+    d = Dataset("TinyDBMemory")
+    d.open(None)
+    d.graph(URIRef("https://example.com/g1")).parse(data=data, format="turtle")
+    d.add(
+        (
+            URIRef("https://example.com/person-4"),
+            URIRef("https://schema.org/name"),
+            Literal("Person 4"),
+        )
+    )
+
+    query = "SELECT ?name WHERE { ?x <https://schema.org/name> ?name }"
+    assert _results(d, query) == [(Literal("Person 4"),)]
+
+    query = """
+        SELECT ?g ?name WHERE {
+            GRAPH ?g { ?x a <https://schema.org/Person> ; <https://schema.org/name> ?name }
+        }
+    """
+    assert [name for _, name in _results(d, query)] == [
+        Literal("Person 1"),
+        Literal("Person 2"),
+        Literal("Person 3", lang="en"),
+    ]
+
+    g = Graph(store=d.store, identifier=URIRef("https://example.com/g1"))
+    assert len(_results(g, queries[0])) == 2
+
+    d.close()
+
+
+def test_plan_orders_by_selectivity(graphs):
+    g, _ = graphs
+    store = g.store
+    person, name, org = Variable("person"), Variable("name"), Variable("org")
+    rdf_type = store._lookup(URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type"))
+    organization = store._lookup(URIRef("https://schema.org/Organization"))
+    name_id = store._lookup(URIRef("https://schema.org/name"))
+
+    patterns = [(person, name_id, name), (org, rdf_type, organization)]
+    assert _plan(store._index, patterns, {}) == list(reversed(patterns))
+
+
+def test_join_looks_up_cross_products_once(graphs):
+    g, _ = graphs
+    store = g.store
+    person, org = Variable("person"), Variable("org")
+    rdf_type = store._lookup(URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type"))
+    person_id = store._lookup(URIRef("https://schema.org/Person"))
+    organization = store._lookup(URIRef("https://schema.org/Organization"))
+    lookups = []
+    triples = store._index.triples
+
+    def count(lookup, context=None):
+        lookups.append(lookup)
+        return triples(lookup, context)
+
+    store._index.triples = count
+    patterns = [(person, rdf_type, person_id), (org, rdf_type, organization)]
+    solutions = list(_join(store._index, patterns, None, {}))
+    assert len(solutions) == 3
+    assert {solution[org] for solution in solutions} == {
+        store._lookup(URIRef("https://example.com/org-1"))
+    }
+    assert lookups.count((None, rdf_type, organization)) == 1
@@ -0,0 +1,161 @@
+import json
+from pathlib import Path
+
+from rdflib import Graph, URIRef, RDF
+from tinydb import TinyDB
+
+from rdflib_tinydb import LogStorage
+
+
+def test_log_storage_appends_changes(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    db = TinyDB(db_file, storage=LogStorage, compaction_threshold=None)
+    table = db.table("things")
+    table.insert_multiple({"n": i} for i in range(3))
+    table.update({"n": 10}, doc_ids=[1])
+    table.remove(doc_ids=[2])
+    db.close()
+
+    # The snapshot is untouched, each write appended only what changed.
+    assert db_file.read_text() == ""
+    log = [json.loads(line) for line in Path(f"{db_file}.log").read_text().splitlines()]
+    assert log == [
+        {"things": {"1": {"n": 0}, "2": {"n": 1}, "3": {"n": 2}}},
+        {"things": {"1": {"n": 10}}},
+        {"things": {"2": None}},
+    ]
+
+    db = TinyDB(db_file, storage=LogStorage)
+    assert db.table("things").all() == [{"n": 10}, {"n": 2}]
+    db.close()
+
+
+def test_log_storage_compact(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    db = TinyDB(
+        db_file,
+        storage=LogStorage,
+        compaction_threshold=5,
+        background_compaction=False,
+    )
+    table = db.table("things")
+    for i in range(4):
+        table.insert({"n": i})
+    assert db_file.read_text() == ""
+
+    # The fifth logged document triggers a compaction.
+    table.insert({"n": 4})
+    assert json.loads(db_file.read_text())["things"]["5"] == {"n": 4}
+    assert Path(f"{db_file}.log").read_text() == ""
+
+    table.insert({"n": 5})
+    db.storage.compact()
+    db.close()
+
+    db = TinyDB(db_file, storage=LogStorage)
+    assert [document["n"] for document in db.table("things")] == list(range(6))
+    db.close()
+
+
+def test_log_storage_background_compaction(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    db = TinyDB(db_file, storage=LogStorage, compaction_threshold=10)
+    table = db.table("things")
+    for i in range(100):
+        table.insert({"n": i})
+    db.close()
+
+    db = TinyDB(db_file, storage=LogStorage)
+    assert [document["n"] for document in db.table("things")] == list(range(100))
+    db.close()
+
+
+def test_log_storage_recovers_interrupted_compaction(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    db = TinyDB(db_file, storage=LogStorage, compaction_threshold=None)
+    db.table("things").insert({"n": 0})
+    db.close()
+
+    # A compaction that rotated the log but did not write the snapshot.
+    Path(f"{db_file}.log").rename(f"{db_file}.log.old")
+    db = TinyDB(db_file, storage=LogStorage, compaction_threshold=None)
+    db.table("things").insert({"n": 1})
+    db.storage.compact()
+    db.close()
+
+    assert not Path(f"{db_file}.log.old").exists()
+    db = TinyDB(db_file, storage=LogStorage)
+    assert db.table("things").all() == [{"n": 0}, {"n": 1}]
+    db.close()
+
+
+def test_log_storage_apply(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    db = TinyDB(db_file, storage=LogStorage, compaction_threshold=None)
+    db.table("things").insert_multiple({"n": i} for i in range(3))
+    db.storage.apply({"things": {"1": {"n": 10}, "2": None}, "other": {"1": {}}})
+    db.storage.apply({"other": None})
+    assert db.table("things").all() == [{"n": 10}, {"n": 2}]
+    assert db.tables() == {"things"}
+    db.close()
+
+    db = TinyDB(db_file, storage=LogStorage)
+    assert db.table("things").all() == [{"n": 10}, {"n": 2}]
+    db.close()
+
+
+class _UnscannableTable(dict):
+    """Table failing the test if a write goes over all its documents."""
+
+    def _scan(self, *args):
+        raise AssertionError("The table was scanned.")
+
+    __iter__ = keys = values = items = __eq__ = _scan
+
+
+def test_store_writes_to_log_storage_without_scanning(tmp_path: Path):
+    configuration = {
+        "path": tmp_path / "db.json",
+        "storage": "log",
+        "storage_options": {"compaction_threshold": None},
+    }
+    g = Graph("TinyDB")
+    g.open(configuration)
+    g.store.addN(
+        (URIRef(f"https://example.com/{i}"), RDF.type, RDF.Property, g)
+        for i in range(1000)
+    )
+    storage = g.store._store.storage
+    storage._data = {
+        name: _UnscannableTable(table) for name, table in storage._data.items()
+    }
+
+    # Each write only logs and applies its own documents.
+    triple = (URIRef("https://example.com/x"), RDF.type, RDF.Property)
+    g.add(triple)
+    g.remove(triple)
+    log = Path(f"{configuration['path']}.log").read_text().splitlines()
+    assert len(json.loads(log[-2])["triples"]) == 1
+    assert len(json.loads(log[-1])["triples"]) == 1
+    g.close()
+
+
+def test_store_with_log_storage(tmp_path: Path):
+    configuration = {"path": tmp_path / "db.json", "storage": "log"}
+    g = Graph("TinyDB")
+    g.open(configuration)
+    g.add(
+        (
+            URIRef("https://example.com/person-1"),
+            RDF.type,
+            URIRef("https://schema.org/Person"),
+        )
+    )
+    g.store.compact()
+    triples = set(g)
+    g.close()
+
+    g = Graph("TinyDB")
+    g.open(configuration)
+    assert set(g) == triples
+    g.close()
@@ -1,10 +1,16 @@
+import os
+import threading
 from pathlib import Path
 
 import pytest
 from _pytest.fixtures import FixtureRequest
-from rdflib import Graph, Namespace, URIRef, BNode, Literal, RDF
+from rdflib import Graph, Namespace, URIRef, BNode, Literal, RDF, XSD
+from rdflib.exceptions import ParserError
+from rdflib.graph import ConjunctiveGraph, DATASET_DEFAULT_GRAPH_ID
 from tinydb import TinyDB
 
+from rdflib_tinydb import store as store_module
+
 
 SDO = Namespace("https://schema.org/")
 
@@ -23,6 +29,9 @@ def get_json_storage_graph():
     # Clean up
     db_file.unlink()
     assert not db_file.is_file()
+    index_file = db_file.with_suffix(".json.index")
+    if index_file.exists():
+        index_file.unlink()
 
 
 @pytest.fixture(scope="function")
@@ -57,8 +66,8 @@ def input_data():
 
 
 def query_graph(g: Graph, input_data: str):
-    spo = g.store._store.table("spo")
-    assert len(spo) > 0
+    triples = g.store._store.table("triples")
+    assert len(triples) > 0
 
     person_1 = URIRef("https://example.com/person-1")
     person_2 = URIRef("https://example.com/person-2")
@@ -234,6 +243,402 @@ def test_store(g: str, input_data: str, request: FixtureRequest):
     query_graph(g, input_data)
 
 
+def test_json_store_reopen(get_json_storage_graph: Graph, input_data: str):
+    g = get_json_storage_graph
+    g.parse(data=input_data)
+    triples = set(g)
+    g.close()
+
+    # The in-memory indexes are loaded from the snapshot written on close().
+    g = Graph("TinyDB")
+    g.open(Path.cwd() / "test.json")
+    assert set(g) == triples
+    g.close()
+
+
+@pytest.mark.parametrize("g", ["get_json_storage_graph", "get_memory_storage_graph"])
+def test_bulk_load(g: str, input_data: str, request: FixtureRequest):
+    g: Graph = request.getfixturevalue(g)
+    triples = g.store._store.table("triples")
+
+    with g.store.bulk_load():
+        g.parse(data=input_data)
+        # Triples are visible straight away but not written until the block exits.
+        assert len(g) > 0
+        assert len(triples) == 0
+    assert len(triples) == len(g)
+
+    # Store.addN() writes its quads as one batch.
+    quads = [
+        (URIRef(f"https://example.com/resource-{i}"), RDF.type, SDO.Thing, g)
+        for i in range(10)
+    ]
+    triples_count = len(g)
+    g.addN(quads + quads)
+    assert len(g) == triples_count + 10
+    assert len(triples) == len(g)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_files(tmp_path: Path, input_data: str, workers: int):
+    files = []
+    for i in range(4):
+        files.append(tmp_path / f"data-{i}.nt")
+        files[-1].write_text(
+            f"<https://example.com/person-{i}> <{SDO.name}> \"Person {i}\" .\n"
+            f"<https://example.com/person-{i}> <{RDF.type}> <{SDO.Person}> .\n"
+        )
+    files.append(tmp_path / "data.ttl")
+    files[-1].write_text(input_data)
+    files.append(tmp_path / "data.nq")
+    files[-1].write_text(
+        f"<https://example.com/person-1> <{RDF.type}> <{SDO.Person}> <https://example.com/g> .\n"
+        f"<https://example.com/person-1> <{RDF.type}> <{SDO.Thing}> .\n"
+    )
+
+    g = ConjunctiveGraph("TinyDB")
+    g.open({"path": tmp_path / "db.json", "index_snapshot": False})
+    writes = []
+    write = g.store._store.storage.write
+    g.store._store.storage.write = lambda data: writes.append(data) or write(data)
+    graph = URIRef("https://example.com/imported")
+    assert g.store.import_files(files, context=graph, workers=workers) == 19
+    assert len(writes) == 1
+    assert len(g.get_context(graph)) == 18
+    assert list(g.get_context(URIRef("https://example.com/g"))) == [
+        (URIRef("https://example.com/person-1"), RDF.type, SDO.Person)
+    ]
+    assert (URIRef("https://example.com/person-3"), SDO.name, Literal("Person 3")) in g
+
+    # A file that does not parse leaves the store unchanged.
+    files[0].write_text("not N-Triples")
+    with pytest.raises(ParserError):
+        g.store.import_files(files[:2], context=URIRef("https://example.com/other"))
+    assert len(writes) == 1
+    assert len(g) == 18
+    g.close()
+
+    g = ConjunctiveGraph("TinyDB")
+    g.open(tmp_path / "db.json")
+    assert len(g.get_context(graph)) == 18
+    g.close()
+
+
+def test_import_files_with_concurrent_writes(tmp_path: Path, monkeypatch):
+    g = ConjunctiveGraph("TinyDB")
+    g.open(tmp_path / "db.json")
+    person_1 = URIRef("https://example.com/person-1")
+    person_2 = URIRef("https://example.com/person-2")
+    terms = [
+        ("URIRef", str(person_1), "", ""),
+        ("URIRef", str(RDF.type), "", ""),
+        ("URIRef", str(SDO.Person), "", ""),
+    ]
+    writer = threading.Thread(target=g.add, args=((person_2, RDF.type, SDO.Person),))
+
+    def parse_files(*args):
+        yield terms, [(0, 1, 2, None)]
+        # A write from another thread between files waits for the import.
+        writer.start()
+        writer.join(timeout=0.5)
+        raise ParserError("The second file does not parse.")
+
+    monkeypatch.setattr(store_module, "_parse_files", parse_files)
+    with pytest.raises(ParserError):
+        g.store.import_files(["1.nt", "2.nt"])
+    writer.join()
+    assert set(g) == {(person_2, RDF.type, SDO.Person)}
+    g.close()
+
+    g = ConjunctiveGraph("TinyDB")
+    g.open({"path": tmp_path / "db.json", "index_snapshot": False})
+    assert set(g) == {(person_2, RDF.type, SDO.Person)}
+    g.close()
+
+
+@pytest.mark.parametrize("g", ["get_json_storage_graph", "get_memory_storage_graph"])
+def test_remove(g: str, input_data: str, request: FixtureRequest):
+    g: Graph = request.getfixturevalue(g)
+    g.parse(data=input_data)
+    triples_count = len(g)
+    person_1 = URIRef("https://example.com/person-1")
+    person_2 = URIRef("https://example.com/person-2")
+
+    writes = []
+    write = g.store._store.storage.write
+    g.store._store.storage.write = lambda data: writes.append(data) or write(data)
+
+    # Removing a wildcard pattern is one storage write.
+    g.remove((person_1, None, None))
+    assert len(writes) == 1
+    assert list(g.triples((person_1, None, None))) == []
+    assert len(g) == triples_count - 5
+    assert len(g.store._store.table("triples")) == len(g)
+
+    g.remove((None, RDF.type, SDO.Thing))
+    assert list(g.triples((None, None, SDO.Thing))) == []
+
+    # Unknown terms and triples are ignored.
+    g.remove((URIRef("https://example.com/unknown"), None, None))
+    g.remove((person_2, RDF.type, SDO.Organization))
+
+    g.set((person_2, SDO.name, Literal("Person Two")))
+    assert list(g.objects(person_2, SDO.name)) == [Literal("Person Two")]
+
+    g.update("DELETE WHERE { ?s a <https://schema.org/Organization> }")
+    assert list(g.triples((None, RDF.type, SDO.Organization))) == []
+    assert len(g.store._store.table("triples")) == len(g)
+
+    g.remove((None, None, None))
+    assert len(g) == 0
+    assert len(g.store._store.table("triples")) == 0
+
+
+@pytest.mark.parametrize("g", ["get_json_storage_graph", "get_memory_storage_graph"])
+def test_stats(g: str, input_data: str, request: FixtureRequest):
+    g: Graph = request.getfixturevalue(g)
+    g.parse(data=input_data)
+    other = Graph(store=g.store, identifier=URIRef("https://example.com/other"))
+    other.add((URIRef("https://example.com/person-1"), RDF.type, SDO.Person))
+
+    stats = g.store.stats()
+    assert stats["triples"] == len(g)
+    assert stats["predicate_counts"][RDF.type] == 6
+    # A graph opened without an identifier is the default graph.
+    assert stats["graph_counts"] == {
+        DATASET_DEFAULT_GRAPH_ID: len(g),
+        other.identifier: 1,
+    }
+    assert stats["subjects"] == len(set(g.subjects()))
+    assert stats["objects"] == len(set(g.objects()))
+
+    assert g.store.cardinality((None, RDF.type, None)) == 6
+    assert g.store.cardinality((None, RDF.type, SDO.Person)) == 2
+    assert g.store.cardinality((None, RDF.type, SDO.Person), other) == 1
+    assert g.store.cardinality((None, None, None), other) == 1
+    assert g.store.cardinality((URIRef("https://example.com/unknown"), None, None)) == 0
+
+    g.remove((None, RDF.type, None))
+    assert g.store.stats()["predicate_counts"].get(RDF.type) == 1
+    assert g.store.cardinality((None, RDF.type, None), g) == 0
+
+
+def test_term_cache():
+    g = Graph("TinyDBMemory")
+    g.open({"term_cache_size": 10})
+    person = URIRef("https://example.com/person-1")
+    # Equal literals, stored as distinct terms.
+    g.add((person, SDO.name, Literal("Person 1", lang="en")))
+    g.add((person, SDO.name, Literal("Person 1", lang="EN")))
+    assert len(g) == 2
+    assert {o.language for o in g.objects(person, SDO.name)} == {"en", "EN"}
+
+    list(g.triples((person, None, None)))
+    misses = g.store.term_cache_info()["decode"].misses
+    list(g.triples((person, None, None)))
+    info = g.store.term_cache_info()
+    assert info["decode"].misses == misses
+    assert info["decode"].hits > 0
+    assert info["encode"].hits > 0
+    assert info["decode"].maxsize == 10
+
+    g.close()
+
+
+def test_index_snapshot(tmp_path: Path, input_data: str):
+    db_file = tmp_path / "db.json"
+    snapshot_file = tmp_path / "db.json.index"
+    g = Graph("TinyDB")
+    g.open(db_file)
+    g.parse(data=input_data)
+    triples = set(g)
+    g.close()
+    assert snapshot_file.is_file()
+
+    # An unchanged store is opened from the snapshot without reading the
+    # TinyDB file.
+    g = Graph("TinyDB")
+    g.open(db_file)
+    assert not g.store._snapshot_stale
+    assert g.store._store.storage._handle.tell() == 0
+    assert set(g) == triples
+    assert g.store.stats()["triples"] == len(triples)
+    person = URIRef("https://example.com/person-3")
+    g.add((person, RDF.type, SDO.Person))
+    g.close()
+
+    # A snapshot left behind by a change made without it is not used.
+    g = Graph("TinyDB")
+    g.open({"path": db_file, "index_snapshot": False})
+    g.remove((person, None, None))
+    g.close()
+    g = Graph("TinyDB")
+    g.open(db_file)
+    assert g.store._snapshot_stale
+    assert set(g) == triples
+    g.close()
+
+    # A file touched but not changed still matches the change counter.
+    os.utime(db_file)
+    g = Graph("TinyDB")
+    g.open(db_file)
+    assert set(g) == triples
+    g.close()
+
+    # A corrupt snapshot is rebuilt.
+    snapshot_file.write_bytes(b"corrupt")
+    g = Graph("TinyDB")
+    g.open(db_file)
+    assert set(g) == triples
+    g.close()
+    assert snapshot_file.read_bytes() != b"corrupt"
+
+
+def test_transactions(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    g = Graph("TinyDB")
+    g.open({"path": db_file, "autocommit": False})
+    writes = []
+    write = g.store._store.storage.write
+    g.store._store.storage.write = lambda data: writes.append(data) or write(data)
+
+    person_1 = URIRef("https://example.com/person-1")
+    g.add((person_1, RDF.type, SDO.Person))
+    g.rollback()
+    assert len(g) == 0
+    assert list(g.triples((person_1, None, None))) == []
+    assert len(g.store._term_dictionary) == 0
+
+    g.add((person_1, RDF.type, SDO.Person))
+    g.add((person_1, SDO.name, Literal("Person 1")))
+    assert writes == []
+    g.commit()
+    assert len(writes) == 1
+
+    g.remove((person_1, None, None))
+    assert len(g) == 0
+    g.rollback()
+    assert len(g) == 2
+
+    # Uncommitted changes are only written when close() is asked to.
+    g.add((person_1, SDO.jobTitle, Literal("software engineer")))
+    g.close(commit_pending_transaction=True)
+    g.open({"path": db_file})
+    g.add((person_1, RDF.type, SDO.Thing))
+    g.close()
+
+    g = Graph("TinyDB")
+    g.open(db_file)
+    assert len(g) == 4
+    g.close()
+
+
+@pytest.mark.parametrize("storage", ["json", "log"])
+def test_failed_commit(tmp_path: Path, storage: str):
+    db_file = tmp_path / "db.json"
+    g = ConjunctiveGraph("TinyDB")
+    # Without the index snapshot, reopening reads the tables back.
+    configuration = {"path": db_file, "storage": storage, "index_snapshot": False}
+    g.open(configuration)
+    person_1 = URIRef("https://example.com/person-1")
+    person_2 = URIRef("https://example.com/person-2")
+    g.add((person_1, RDF.type, SDO.Person))
+
+    # The storage fails once, then the next commit writes both changes.
+    storage = g.store._store.storage
+    name = "apply" if hasattr(storage, "apply") else "write"
+    write = getattr(storage, name)
+
+    def fail(data):
+        setattr(storage, name, write)
+        raise OSError("No space left on device")
+
+    setattr(storage, name, fail)
+    with pytest.raises(OSError):
+        g.add((person_1, SDO.name, Literal("Person 1")))
+    g.add((person_2, RDF.type, SDO.Person))
+    expected = set(g.quads())
+    g.close()
+
+    g = ConjunctiveGraph("TinyDB")
+    g.open(configuration)
+    assert set(g.quads()) == expected
+    assert len(expected) == 3
+    g.close()
+
+
+def test_blank_graphs(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    person = URIRef("https://example.com/person-1")
+    g = Graph("TinyDB")
+    g.open(db_file)
+    g.add((person, RDF.type, SDO.Person))
+    # A blank node graph added to the store stays a named graph.
+    named = ConjunctiveGraph(store=g.store).get_context(BNode())
+    g.store.add_graph(named)
+    named.add((person, SDO.name, Literal("Person 1")))
+    g.close()
+
+    g = Graph("TinyDB")
+    g.open(db_file)
+    assert set(g) == {(person, RDF.type, SDO.Person)}
+    assert set(g.store.contexts()) == {
+        Graph(identifier=DATASET_DEFAULT_GRAPH_ID),
+        Graph(identifier=named.identifier),
+    }
+    g.close()
+
+    g = Graph("TinyDB")
+    g.open({"path": db_file, "blank_graphs": "named"})
+    assert len(g) == 0
+    g.close()
+
+    with pytest.raises(ValueError):
+        Graph("TinyDB").open({"path": db_file, "blank_graphs": "none"})
+
+
+def test_json_store_migrates_v1_files(tmp_path: Path):
+    db_file = tmp_path / "legacy.json"
+    s = {"type": "URIRef", "value": "https://example.com/person-1"}
+    p = {"type": "URIRef", "value": str(SDO.name)}
+    o = {"type": "Literal", "datatype": "", "lang": "en", "value": "Person 1"}
+    # The first version kept the str() of the Python value of typed literals.
+    boolean = {"type": "Literal", "datatype": str(XSD.boolean), "lang": ""}
+    date_time = {"type": "Literal", "datatype": str(XSD.dateTime), "lang": ""}
+    objects = [
+        o,
+        {**boolean, "value": "True"},
+        {**date_time, "value": "2020-01-01 10:00:00"},
+    ]
+    db = TinyDB(db_file)
+    for name in ("spo", "pos", "osp"):
+        db.table(name).insert_multiple({"s": s, "p": p, "o": o} for o in objects)
+    db.close()
+
+    # Triples written before the store was context-aware are in the default graph.
+    g = Graph("TinyDB")
+    g.open(db_file)
+    triples = {
+        (URIRef(s["value"]), SDO.name, Literal("Person 1", lang="en")),
+        (URIRef(s["value"]), SDO.name, Literal(True)),
+        (
+            URIRef(s["value"]),
+            SDO.name,
+            Literal("2020-01-01T10:00:00", datatype=XSD.dateTime),
+        ),
+    }
+    assert set(g) == triples
+    assert g.store._store.tables() == {"meta", "terms", "triples", "graphs"}
+    assert len(g.store._store.table("triples")) == 3
+    assert len(g.store._store.table("terms")) == 6
+    # Migrated literals match the ones added since.
+    for triple in triples:
+        assert triple in g
+        g.add(triple)
+    assert len(g) == 3
+    g.close()
+
+
 def test_json_store_without_providing_configuration():
     g = Graph(store="TinyDB")
 
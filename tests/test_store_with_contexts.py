@@ -2,13 +2,15 @@ from pathlib import Path
 
 import pytest
 from _pytest.fixtures import FixtureRequest
-from rdflib import Graph, ConjunctiveGraph, Dataset
+from rdflib import Graph, ConjunctiveGraph, Dataset, URIRef, Literal, RDF, Namespace
+from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+
+SDO = Namespace("https://schema.org/")
 
 
 @pytest.fixture(scope="function")
 def get_json_storage_graph():
-    # TODO: Change to ConjunctiveGraph.
-    g = Graph("TinyDB")
+    g = ConjunctiveGraph("TinyDB")
     cwd = Path.cwd()
     print(cwd)
     db_file = cwd / "test.json"
@@ -18,14 +20,17 @@ def get_json_storage_graph():
     yield g
 
     # Clean up
+    g.close()
     db_file.unlink()
     assert not db_file.is_file()
+    index_file = db_file.with_suffix(".json.index")
+    if index_file.exists():
+        index_file.unlink()
 
 
 @pytest.fixture(scope="function")
 def get_memory_storage_graph():
-    # TODO: Change to ConjunctiveGraph.
-    g = Graph("TinyDBMemory")
+    g = ConjunctiveGraph("TinyDBMemory")
     g.open(None)
 
     yield g
@@ -60,3 +65,73 @@ def test_json_store_with_context(g: str, input_data, request: FixtureRequest):
     g.parse(data=input_data)
     print(len(g))
     assert len(g) > 0
+
+
+@pytest.mark.parametrize("g", ["get_json_storage_graph", "get_memory_storage_graph"])
+def test_named_graphs(g: str, input_data, request: FixtureRequest):
+    g: ConjunctiveGraph = request.getfixturevalue(g)
+    graph_1 = g.get_context(URIRef("https://example.com/graph-1"))
+    graph_2 = g.get_context(URIRef("https://example.com/graph-2"))
+    graph_1.parse(data=input_data)
+    person_1 = URIRef("https://example.com/person-1")
+    graph_2.add((person_1, RDF.type, SDO.Person))
+    graph_2.add((person_1, RDF.type, SDO.Agent))
+
+    assert len(graph_1) == 14
+    assert len(graph_2) == 2
+    # The union counts each triple once.
+    assert len(g) == 15
+    assert {c.identifier for c in g.contexts()} == {
+        graph_1.identifier,
+        graph_2.identifier,
+    }
+    assert {c.identifier for c in g.contexts((person_1, RDF.type, SDO.Person))} == {
+        graph_1.identifier,
+        graph_2.identifier,
+    }
+    assert set(graph_2.triples((person_1, None, None))) == {
+        (person_1, RDF.type, SDO.Person),
+        (person_1, RDF.type, SDO.Agent),
+    }
+    assert {
+        c.identifier for s, p, o, c in g.quads((person_1, RDF.type, SDO.Person))
+    } == {graph_1.identifier, graph_2.identifier}
+
+    # Removing from one graph leaves the triple in the other.
+    g.remove((person_1, RDF.type, SDO.Person, graph_1))
+    assert (person_1, RDF.type, SDO.Person) not in graph_1
+    assert (person_1, RDF.type, SDO.Person) in graph_2
+    assert len(g) == 15
+
+    # Without a context the triple is removed from every graph.
+    g.remove((person_1, RDF.type, None))
+    assert len(graph_2) == 0
+    assert graph_2.identifier in {c.identifier for c in g.contexts()}
+
+    g.store.remove_graph(graph_2)
+    assert {c.identifier for c in g.contexts()} == {graph_1.identifier}
+    assert len(g.store._store.table("triples")) == len(graph_1)
+
+
+def test_dataset(tmp_path: Path):
+    db_file = tmp_path / "db.json"
+    ds = Dataset("TinyDB")
+    ds.open(db_file)
+    graph_1 = ds.graph(URIRef("https://example.com/graph-1"))
+    ds.add((URIRef("https://example.com/person-1"), RDF.type, SDO.Person))
+    graph_1.add((URIRef("https://example.com/person-1"), SDO.name, Literal("Person 1")))
+    empty = ds.graph(URIRef("https://example.com/empty"))
+    ds.close()
+
+    ds = Dataset("TinyDB")
+    ds.open(db_file)
+    assert {g.identifier for g in ds.graphs()} == {
+        DATASET_DEFAULT_GRAPH_ID,
+        graph_1.identifier,
+        empty.identifier,
+    }
+    assert len(ds.graph(graph_1.identifier)) == 1
+    assert len(ds.default_context) == 1
+    assert len(ds.store) == 2
+    assert len(list(ds.query("SELECT * WHERE { GRAPH ?g { ?s ?p ?o } }"))) == 1
+    ds.close()
@@ -0,0 +1,141 @@
+from pathlib import Path
+
+import pytest
+from rdflib import ConjunctiveGraph, Graph, Literal, URIRef
+from rdflib.plugins.sparql import prepareQuery
+
+from rdflib_tinydb import sparql
+from rdflib_tinydb.text import TextIndex
+
+EX = "https://example.com/"
+LABEL = URIRef(EX + "label")
+
+labels = [
+    "Brisbane",
+    "Brisbane River",
+    "Sydney Harbour Bridge",
+    "Ponte Vecchio",
+    "brisbane",
+    "ΟΔΟΣ",
+    "B",
+    "x" * 300 + " bridge",
+]
+
+
+def test_text_index():
+    index = TextIndex()
+    for term_id, label in enumerate(labels, 1):
+        index.add(term_id, label)
+    assert {1, 2, 5, 8} <= set(index.candidates("risb"))
+    assert 3 not in index.candidates("risb")
+    assert {1, 2, 5} <= set(index.candidates("BR", prefix=True))
+    assert 3 not in index.candidates("br", prefix=True)
+    # Too short to narrow down: every term is a candidate.
+    assert set(index.candidates("b")) == set(range(1, 9))
+
+    index = TextIndex.restore(index.snapshot())
+    index.discard(1, labels[0])
+    assert 1 not in index.candidates("brisbane")
+    assert 2 in index.candidates("brisbane")
+
+
+@pytest.fixture(scope="function")
+def graph():
+    g = Graph("TinyDBMemory", identifier=URIRef(EX + "g"))
+    g.open({"text_index": True})
+    for i, label in enumerate(labels):
+        g.add((URIRef(EX + f"s{i}"), LABEL, Literal(label)))
+    yield g
+    g.close()
+
+
+@pytest.mark.parametrize("text_index", [True, False])
+def test_search(tmp_path: Path, text_index):
+    configuration = {"path": str(tmp_path / "db.json"), "text_index": text_index}
+    g = ConjunctiveGraph("TinyDB")
+    g.open(configuration)
+    context = g.get_context(URIRef(EX + "g"))
+    for i, label in enumerate(labels):
+        context.add((URIRef(EX + f"s{i}"), LABEL, Literal(label)))
+    store = g.store
+
+    assert set(store.search("BRISBANE")) == {
+        Literal("Brisbane"),
+        Literal("Brisbane River"),
+        Literal("brisbane"),
+    }
+    assert store.search("bridge", prefix=True) == []
+    assert set(store.search("bridge")) == {Literal(labels[2]), Literal(labels[7])}
+    assert store.search("οδος") == [Literal("ΟΔΟΣ")]
+    assert len(store.search("b", prefix=True)) == 4
+    assert len(store.search("b", prefix=True, limit=2)) == 2
+    assert store.search("brisbane", context=URIRef(EX + "other")) == []
+
+    # Literals that are no longer objects are not found.
+    g.remove((URIRef(EX + "s0"), None, None))
+    assert Literal("Brisbane") not in store.search("brisbane")
+    g.close()
+
+    g = ConjunctiveGraph("TinyDB")
+    g.open(configuration)
+    assert set(g.store.search("brisbane")) == {
+        Literal("Brisbane River"),
+        Literal("brisbane"),
+    }
+    g.close()
+
+
+def test_search_rollback():
+    g = Graph("TinyDBMemory")
+    g.open({"text_index": True, "autocommit": False})
+    g.add((URIRef(EX + "s"), LABEL, Literal("Brisbane")))
+    assert g.store.search("brisbane") == [Literal("Brisbane")]
+    g.rollback()
+    assert g.store.search("brisbane") == []
+    assert len(g.store._text_index) == 0
+    g.close()
+
+
+queries = [
+    'SELECT ?s WHERE { ?s ?p ?label FILTER(CONTAINS(?label, "bane")) }',
+    'SELECT ?s WHERE { ?s ?p ?label FILTER(STRSTARTS(?label, "Bris")) }',
+    'SELECT ?s WHERE { ?s ?p ?label FILTER(REGEX(?label, "^Sydney")) }',
+    'SELECT ?s WHERE { ?s ?p ?label FILTER(REGEX(?label, "ecchi")) }',
+    'SELECT ?s WHERE { ?s ?p ?label FILTER(REGEX(?label, "bri.*e", "i")) }',
+    """
+    SELECT ?s ?label WHERE {
+        ?s <https://example.com/label> ?label
+        FILTER(CONTAINS(?label, "Bris") && CONTAINS(?label, "River"))
+    }
+    """,
+    """
+    SELECT ?s WHERE {
+        ?s <https://example.com/label> ?label
+        FILTER(CONTAINS(?label, "bri") || STRSTARTS(?label, "Ponte"))
+    }
+    """,
+    'SELECT ?s WHERE { ?s ?p ?label FILTER(CONTAINS(?label, "Nowhere")) }',
+]
+
+
+@pytest.mark.parametrize("query", queries)
+def test_sparql_filters(graph, query):
+    expected = Graph()
+    for triple in graph:
+        expected.add(triple)
+    assert sorted(graph.query(query)) == sorted(expected.query(query))
+
+
+def test_sparql_filters_use_text_index(graph, monkeypatch):
+    found = []
+    candidates_of = sparql._candidates
+
+    def spy(*args):
+        candidates = candidates_of(*args)
+        found.append(candidates)
+        return candidates
+
+    monkeypatch.setattr(sparql, "_candidates", spy)
+    query = prepareQuery(queries[0])
+    assert len(graph.query(query)) == 3
+    assert [len(terms) for candidates in found for terms in candidates.values()] == [3]